@@ -61,6 +61,7 @@ class AlertaModel(models.Model):
     # Fechas de control
     fecha_programada = models.DateTimeField(verbose_name="Fecha de Ejecución Programada")
     fecha_envio = models.DateTimeField(null=True, blank=True, verbose_name="Fecha Real de Envío")
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     
     # Para morosidad o pagos (registra el mes y año de la obligación)
     mes_obligacion = models.IntegerField(null=True, blank=True)
@@ -1,11 +1,53 @@
+import asyncio
 import json
+import time
+from collections import Counter
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.conf import settings
 import logging
 
+from . import presence
+
 logger = logging.getLogger(__name__)
 
+# Mínimo de segundos entre dos eventos "escribiendo" del mismo chat por conexión
+ESCRIBIENDO_INTERVALO = getattr(settings, "CHAT_ESCRIBIENDO_INTERVALO", 3)
+
+# Límites por conexión (ver settings.CHAT_WS_*)
+WS_MAX_FRAME_BYTES = getattr(settings, "CHAT_WS_MAX_FRAME_BYTES", 8 * 1024)
+WS_FRAMES_POR_SEGUNDO = getattr(settings, "CHAT_WS_FRAMES_POR_SEGUNDO", 5)
+WS_RAFAGA = getattr(settings, "CHAT_WS_RAFAGA", 20)
+WS_COLA_ENVIO_MAX = getattr(settings, "CHAT_WS_COLA_ENVIO_MAX", 100)
+WS_ENVIO_TIMEOUT = getattr(settings, "CHAT_WS_ENVIO_TIMEOUT", 10)
+
+# Códigos de cierre propios (rango 4000-4999 reservado para aplicaciones)
+CIERRE_FRAME_GRANDE = 1009
+CIERRE_CLIENTE_LENTO = 4008
+
+# Contadores del proceso: frames limitados, rechazados por tamaño, descartados, desconexiones
+METRICAS_WS = Counter()
+
+
+class TokenBucket:
+    """Token bucket simple: `tasa` tokens por segundo con capacidad `capacidad`."""
+
+    def __init__(self, tasa, capacidad):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.tokens = capacidad
+        self.ultimo = time.monotonic()
+
+    def consumir(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
 class UserConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         user = self.scope["user"]
@@ -15,22 +57,228 @@ class UserConsumer(AsyncWebsocketConsumer):
 
         # Canal único por usuario
         self.group_name = f"user_{user.id}"
+        self.grupos_presencia = set()
+        self.chats_cache = {}  # chat_id -> (cliente_id, agente_id)
+        self.ultimo_escribiendo = {}  # chat_id -> timestamp
+        self.limitador = TokenBucket(WS_FRAMES_POR_SEGUNDO, WS_RAFAGA)
+        self.cerrando = False
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+
+        # Cola de salida acotada: si el cliente no consume, se le desconecta
+        # en lugar de acumular mensajes en memoria.
+        self.cola_envio = asyncio.Queue(maxsize=WS_COLA_ENVIO_MAX)
+        self.tarea_envio = asyncio.create_task(self._escritor())
+
+        self.presencia_conocida = {}  # usuario_id -> en línea, de los suscritos
+        conexiones = await presence.registrar_conexion(user.id, self.channel_name)
+        self.tarea_latido = asyncio.create_task(self._latido())
+        if conexiones == 1:
+            await self._publicar_presencia(user.id, True)
         print(f"[WS conectado] Usuario {user.username} en grupo {self.group_name}")
 
     async def disconnect(self, close_code):
+        # Se cancelan y se esperan: una tarea sin esperar deja el aviso
+        # "Task was destroyed but it is pending" y su excepción sin registrar
+        tareas = [getattr(self, nombre, None) for nombre in ("tarea_envio", "tarea_latido")]
+        tareas = [tarea for tarea in tareas if tarea is not None and tarea is not asyncio.current_task()]
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+
         if hasattr(self, "group_name"):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            for grupo in self.grupos_presencia:
+                await self.channel_layer.group_discard(grupo, self.channel_name)
+
+            user = self.scope["user"]
+            conexiones = await presence.retirar_conexion(user.id, self.channel_name)
+            if conexiones == 0:
+                await self._publicar_presencia(user.id, False)
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        """Encola el frame de salida; el envío real lo hace _escritor."""
+        if not hasattr(self, "cola_envio") or close:
+            await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+            return
+        if self.cerrando:
+            return
+        try:
+            self.cola_envio.put_nowait((text_data, bytes_data))
+        except asyncio.QueueFull:
+            METRICAS_WS["descartados_cola_llena"] += 1
+            await self._desconectar_cliente_lento("cola de envío llena")
+
+    async def _escritor(self):
+        while True:
+            text_data, bytes_data = await self.cola_envio.get()
+            try:
+                await asyncio.wait_for(
+                    super().send(text_data=text_data, bytes_data=bytes_data),
+                    timeout=WS_ENVIO_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                METRICAS_WS["descartados_timeout_envio"] += 1
+                await self._desconectar_cliente_lento("timeout de envío")
+                return
+            except Exception:
+                # Socket ya cerrado u otro error de envío: sin escritor no
+                # hay salida, así que la conexión se cierra
+                METRICAS_WS["errores_envio"] += 1
+                logger.exception(f"Error enviando por WS al usuario {self.scope['user'].id}")
+                self.cerrando = True
+                try:
+                    await self.close()
+                except Exception:
+                    pass
+                return
+
+    async def _latido(self):
+        """
+        Mientras el socket está abierto renueva la presencia de esta conexión
+        y avisa al cliente los cambios de los usuarios suscritos que no llegaron
+        por el channel layer (conexiones que vencieron sin disconnect).
+        """
+        user_id = self.scope["user"].id
+        while True:
+            await asyncio.sleep(presence.PRESENCIA_LATIDO)
+            try:
+                await presence.registrar_conexion(user_id, self.channel_name)
+                if not self.presencia_conocida:
+                    continue
+                actuales = await presence.estados(self.presencia_conocida)
+                for uid, en_linea in actuales.items():
+                    if self.presencia_conocida.get(uid) != en_linea:
+                        self.presencia_conocida[uid] = en_linea
+                        await self.send(json.dumps({"tipo": "presencia", "usuario_id": uid, "en_linea": en_linea}))
+            except Exception:
+                logger.exception(f"Error en el latido de presencia del usuario {user_id}")
+
+    async def _desconectar_cliente_lento(self, motivo):
+        if self.cerrando:
+            return
+        self.cerrando = True
+        METRICAS_WS["desconexiones_cliente_lento"] += 1
+        logger.warning(f"Cerrando WS de usuario {self.scope['user'].id}: {motivo}")
+        await self.close(code=CIERRE_CLIENTE_LENTO)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if text_data is None:
+            return
+
+        if len(text_data.encode("utf-8")) > WS_MAX_FRAME_BYTES:
+            METRICAS_WS["rechazados_tamano"] += 1
+            await self.close(code=CIERRE_FRAME_GRANDE)
+            return
+
+        if not self.limitador.consumir():
+            METRICAS_WS["limitados"] += 1
+            await self.send(json.dumps({"error": "Demasiados mensajes, intenta más tarde"}))
+            return
+
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            METRICAS_WS["json_invalido"] += 1
+            await self.send(json.dumps({"error": "JSON inválido"}))
+            return
+        if not isinstance(data, dict):
+            await self.send(json.dumps({"error": "JSON inválido"}))
+            return
 
-    async def receive(self, text_data):
-        from .models import ChatModel, MensajeModel
-        from inmobiliaria.utils import NotificacionService
-        from usuario.models import Dispositivo  # Importar el modelo Dispositivo
-        
-        data = json.loads(text_data)
         user = self.scope["user"]
 
+        tipo = data.get("tipo", "mensaje")
+        if tipo == "ping":
+            await self.send(json.dumps({"tipo": "pong"}))
+        elif tipo == "escribiendo":
+            await self._procesar_escribiendo(data, user)
+        elif tipo == "suscribir_presencia":
+            await self._suscribir_presencia(data)
+        else:
+            await self._procesar_mensaje(data, user)
+
+    async def _obtener_chat(self, chat_id):
+        """Devuelve (cliente_id, agente_id) del chat, cacheado por conexión."""
+        from .models import ChatModel
+
+        if chat_id not in self.chats_cache:
+            participantes = await database_sync_to_async(
+                lambda: ChatModel.objects.filter(id=chat_id).values_list("cliente_id", "agente_id").first()
+            )()
+            if participantes is None:
+                return None
+            self.chats_cache[chat_id] = participantes
+        return self.chats_cache[chat_id]
+
+    async def _procesar_escribiendo(self, data, user):
+        """
+        Indicador de "escribiendo": no se persiste, solo se reenvía a la contraparte
+        y se limita a un evento cada ESCRIBIENDO_INTERVALO segundos por chat.
+        """
+        chat_id = data.get("chat_id")
+        if not chat_id:
+            return
+
+        ahora = time.monotonic()
+        if ahora - self.ultimo_escribiendo.get(chat_id, 0) < ESCRIBIENDO_INTERVALO:
+            return
+
+        participantes = await self._obtener_chat(chat_id)
+        if participantes is None or user.id not in participantes:
+            return
+        self.ultimo_escribiendo[chat_id] = ahora
+
+        receptor_id = participantes[0] if participantes[0] != user.id else participantes[1]
+        await self.channel_layer.group_send(
+            f"user_{receptor_id}",
+            {
+                "type": "typing",
+                "payload": {
+                    "tipo": "escribiendo",
+                    "chat_id": chat_id,
+                    "usuario_id": user.id,
+                    "escribiendo": bool(data.get("escribiendo", True)),
+                },
+            },
+        )
+
+    async def _suscribir_presencia(self, data):
+        """
+        Suscribe esta conexión a los cambios de estado de los usuarios indicados
+        y responde con su estado actual.
+        Body: {"tipo": "suscribir_presencia", "usuarios": [1, 2, ...]}
+        """
+        usuarios = [uid for uid in data.get("usuarios") or [] if isinstance(uid, int)]
+        for uid in usuarios:
+            grupo = presence.grupo_presencia(uid)
+            if grupo not in self.grupos_presencia:
+                await self.channel_layer.group_add(grupo, self.channel_name)
+                self.grupos_presencia.add(grupo)
+
+        estados = await presence.estados(usuarios)
+        self.presencia_conocida.update(estados)
+        await self.send(json.dumps({
+            "tipo": "presencia",
+            "estados": {str(uid): en_linea for uid, en_linea in estados.items()},
+        }))
+
+    async def _publicar_presencia(self, usuario_id, en_linea):
+        await self.channel_layer.group_send(
+            presence.grupo_presencia(usuario_id),
+            {
+                "type": "presence_update",
+                "payload": {
+                    "tipo": "presencia",
+                    "usuario_id": usuario_id,
+                    "en_linea": en_linea,
+                },
+            },
+        )
+
+    async def _procesar_mensaje(self, data, user):
+        from .models import ChatModel, MensajeModel
+
         chat_id = data.get("chat_id")
         mensaje_texto = data.get("mensaje")
 
@@ -84,10 +332,15 @@ class UserConsumer(AsyncWebsocketConsumer):
         # Identificar al receptor (el que NO es el remitente)
         receptor_id = chat.cliente_id if chat.cliente_id != remitente.id else chat.agente_id
         
+        # Si el receptor está conectado por websocket no hace falta push (ni consultar dispositivos)
+        receptor_en_linea = await presence.esta_conectado(receptor_id)
+
         # Verificar si el receptor tiene dispositivos registrados
-        receptor_tiene_dispositivos = await database_sync_to_async(
-            Dispositivo.objects.filter(usuario_id=receptor_id).exists
-        )()
+        receptor_tiene_dispositivos = False
+        if not receptor_en_linea:
+            receptor_tiene_dispositivos = await database_sync_to_async(
+                Dispositivo.objects.filter(usuario_id=receptor_id).exists
+            )()
 
         for uid in [chat.cliente_id, chat.agente_id]:
             # Para móvil (formato completo)
@@ -109,7 +362,7 @@ class UserConsumer(AsyncWebsocketConsumer):
                     }
                 )
         print("enviando mensaje a ambos usuarios del chat")
-        # Enviar notificación push al receptor SOLO si tiene dispositivos registrados
+        # Enviar notificación push al receptor SOLO si no está conectado y tiene dispositivos registrados
         if receptor_id != remitente.id and receptor_tiene_dispositivos:
             await self._enviar_notificacion_push(receptor_id, remitente.nombre, payload_movil["mensaje"], chat.id)
 
@@ -156,4 +409,18 @@ class UserConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps({
             "usuario": event["payload"]["usuario"],
             "mensaje": event["payload"]["mensaje"]
-        }))
\ No newline at end of file
+        }))
+
+    async def read_receipt(self, event):
+        """Confirmación de lectura agrupada por chat"""
+        await self.send(text_data=json.dumps(event["payload"]))
+
+    async def typing(self, event):
+        """Indicador de escritura de la contraparte (no persistido)"""
+        await self.send(text_data=json.dumps(event["payload"]))
+
+    async def presence_update(self, event):
+        """Cambio de estado en línea / desconectado de un usuario suscrito"""
+        payload = event["payload"]
+        self.presencia_conocida[payload["usuario_id"]] = payload["en_linea"]
+        await self.send(text_data=json.dumps(payload))
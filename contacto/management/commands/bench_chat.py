@@ -0,0 +1,202 @@
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from channels.db import database_sync_to_async
+
+
+class ContadorQueries:
+    """execute_wrapper que cuenta las sentencias SQL ejecutadas."""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga del chat: simula N parejas agente/cliente conectadas por websocket '
+        '(TokenAuthMiddleware + UserConsumer) y reporta latencia p50/p99, mensajes/seg '
+        'y queries por mensaje en un archivo JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--parejas', type=int, default=10, help='Parejas agente/cliente concurrentes')
+        parser.add_argument('--mensajes', type=int, default=20, help='Mensajes que envía cada cliente')
+        parser.add_argument('--intervalo', type=float, default=0.2,
+                            help='Segundos entre mensajes de un mismo cliente (respetar CHAT_WS_FRAMES_POR_SEGUNDO)')
+        parser.add_argument('--timeout', type=float, default=10, help='Segundos máximos de espera por mensaje')
+        parser.add_argument('--salida', default='bench_chat.json', help='Archivo JSON de resultados')
+        parser.add_argument('--conservar', action='store_true', help='No borrar los usuarios/chats de prueba')
+
+    def handle(self, *args, **options):
+        try:
+            from channels.testing import WebsocketCommunicator  # noqa: F401 (requiere daphne)
+        except ImportError as e:
+            raise CommandError(f'channels.testing no disponible ({e}). Instala daphne para ejecutar el benchmark.')
+
+        prefijo = f'bench_{uuid.uuid4().hex[:8]}'
+        parejas = self._crear_datos(prefijo, options['parejas'])
+        self.stdout.write(f'ℹ️ {len(parejas)} parejas creadas con prefijo {prefijo}')
+
+        try:
+            resultado = asyncio.run(self._ejecutar(parejas, options))
+        finally:
+            if not options['conservar']:
+                self._limpiar(prefijo)
+
+        resultado['config'] = {
+            'parejas': options['parejas'],
+            'mensajes_por_cliente': options['mensajes'],
+            'intervalo': options['intervalo'],
+            'db_vendor': connection.vendor,
+        }
+        resultado['fecha'] = timezone.now().isoformat()
+
+        with open(options['salida'], 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ p50={resultado['latencia_ms']['p50']}ms p99={resultado['latencia_ms']['p99']}ms "
+            f"{resultado['mensajes_por_segundo']} msg/s, {resultado['queries_por_mensaje']} queries/msg "
+            f"-> {options['salida']}"
+        ))
+
+    # ------------------------------------------------------------------
+    # Datos de prueba
+    # ------------------------------------------------------------------
+    def _crear_datos(self, prefijo, n):
+        from django.contrib.auth.hashers import make_password
+        from rest_framework.authtoken.models import Token
+        from usuario.models import Usuario
+        from contacto.models import ChatModel
+
+        password = make_password(None)
+        usuarios = []
+        for i in range(n):
+            for rol in ('agente', 'cliente'):
+                username = f'{prefijo}_{rol}_{i}'
+                usuarios.append(Usuario(
+                    username=username, correo=f'{username}@bench.local',
+                    nombre=username, password=password,
+                ))
+        Usuario.objects.bulk_create(usuarios)
+        usuarios = {u.username: u for u in Usuario.objects.filter(username__startswith=prefijo)}
+
+        Token.objects.bulk_create([Token(user=u, key=Token.generate_key()) for u in usuarios.values()])
+        tokens = dict(Token.objects.filter(user__in=usuarios.values()).values_list('user_id', 'key'))
+
+        parejas = []
+        for i in range(n):
+            agente = usuarios[f'{prefijo}_agente_{i}']
+            cliente = usuarios[f'{prefijo}_cliente_{i}']
+            chat = ChatModel.objects.create(agente=agente, cliente=cliente)
+            parejas.append({
+                'chat_id': chat.id,
+                'agente': (agente.id, tokens[agente.id]),
+                'cliente': (cliente.id, tokens[cliente.id]),
+            })
+        return parejas
+
+    def _limpiar(self, prefijo):
+        from usuario.models import Usuario
+        # El CASCADE elimina tokens, chats y mensajes de prueba
+        Usuario.objects.filter(username__startswith=prefijo).delete()
+
+    # ------------------------------------------------------------------
+    # Ejecución
+    # ------------------------------------------------------------------
+    async def _ejecutar(self, parejas, options):
+        from channels.testing import WebsocketCommunicator
+        from inmobiliaria.asgi import application
+        from contacto.consumers import METRICAS_WS
+
+        contador = ContadorQueries()
+
+        @database_sync_to_async
+        def instalar_contador():
+            connection.execute_wrappers.append(contador)
+
+        @database_sync_to_async
+        def quitar_contador():
+            connection.execute_wrappers.remove(contador)
+
+        conexiones = []
+        for pareja in parejas:
+            for rol in ('agente', 'cliente'):
+                uid, token = pareja[rol]
+                com = WebsocketCommunicator(application, f'/ws/user/{uid}/?token={token}')
+                conectado, _ = await com.connect()
+                if not conectado:
+                    raise CommandError(f'No se pudo conectar el usuario {uid}')
+                pareja[f'ws_{rol}'] = com
+                conexiones.append(com)
+
+        metricas_antes = Counter(METRICAS_WS)
+        await instalar_contador()
+        latencias = []
+        perdidos = 0
+        inicio = time.perf_counter()
+
+        async def conversar(pareja):
+            nonlocal perdidos
+            enviados = {}
+            agente_id = pareja['agente'][0]
+
+            async def recibir():
+                nonlocal perdidos
+                pendientes = options['mensajes']
+                while pendientes:
+                    try:
+                        payload = await pareja['ws_agente'].receive_json_from(timeout=options['timeout'])
+                    except asyncio.TimeoutError:
+                        perdidos += pendientes
+                        return
+                    # Solo el formato móvil trae fecha_envio; el formato web llega duplicado
+                    if 'fecha_envio' not in payload or payload.get('usuario_id') == agente_id:
+                        continue
+                    enviado = enviados.pop(payload['mensaje'], None)
+                    if enviado is not None:
+                        latencias.append((time.perf_counter() - enviado) * 1000)
+                        pendientes -= 1
+
+            receptor = asyncio.create_task(recibir())
+            for n in range(options['mensajes']):
+                texto = f"{pareja['chat_id']}-{n}"
+                enviados[texto] = time.perf_counter()
+                await pareja['ws_cliente'].send_json_to({'chat_id': pareja['chat_id'], 'mensaje': texto})
+                await asyncio.sleep(options['intervalo'])
+            await receptor
+
+        await asyncio.gather(*(conversar(p) for p in parejas))
+        duracion = time.perf_counter() - inicio
+        await quitar_contador()
+
+        for com in conexiones:
+            await com.disconnect()
+
+        entregados = len(latencias)
+        latencias.sort()
+        return {
+            'mensajes_entregados': entregados,
+            'mensajes_perdidos': perdidos,
+            'duracion_s': round(duracion, 3),
+            'mensajes_por_segundo': round(entregados / duracion, 2) if duracion else 0,
+            'latencia_ms': {
+                'p50': round(statistics.median(latencias), 2) if latencias else None,
+                'p99': round(latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))], 2) if latencias else None,
+                'max': round(latencias[-1], 2) if latencias else None,
+            },
+            'queries_totales': contador.total,
+            'queries_por_mensaje': round(contador.total / entregados, 2) if entregados else None,
+            'metricas_ws': dict(Counter(METRICAS_WS) - metricas_antes),
+        }
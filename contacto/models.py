@@ -3,6 +3,7 @@ from django.db import models
 
 class ChatModel(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     cliente = models.ForeignKey(
         Usuario, 
         on_delete=models.CASCADE, 
@@ -26,6 +27,7 @@ class MensajeModel(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name="mensajes")
     mensaje = models.TextField()
     fecha_envio = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     leido = models.BooleanField(default=False) 
 
     def __str__(self):
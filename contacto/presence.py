@@ -0,0 +1,114 @@
+# contacto/presence.py
+"""
+Presencia del chat (en línea / desconectado) en la caché de Django.
+
+- Cada conexión websocket tiene su propia clave con vencimiento
+  PRESENCIA_TTL: no hay lectura-modificación-escritura de una estructura
+  compartida, así que dos procesos no se pisan.
+- Un contador por usuario se mueve con incr/decr. También vence a
+  PRESENCIA_TTL y lo renueva cada latido: si un proceso muere sin
+  disconnect, el contador deja de renovarse y el usuario pasa a desconectado
+  al vencer.
+- El contador se reconstruye con las conexiones vivas: cada vez que se crea
+  (primera conexión o venció) sube la "generación" del usuario, y la clave de
+  cada conexión guarda la generación en la que se contó. En su latido, una
+  conexión contada en otra generación se vuelve a sumar; al cerrarse solo
+  resta si está contada en la actual.
+- El latido lo da el servidor (UserConsumer._latido, cada PRESENCIA_LATIDO
+  segundos) mientras el socket está abierto. En el mismo latido cada conexión
+  revisa los usuarios a los que está suscrita y avisa a su cliente los que
+  cambiaron, incluidos los que vencieron sin disconnect.
+
+Con varios workers la caché y el channel layer tienen que ser compartidos
+(REDIS_URL en settings); con LocMemCache cada proceso ve solo sus conexiones.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Segundos que una conexión se considera viva sin un latido
+PRESENCIA_TTL = getattr(settings, "CHAT_PRESENCIA_TTL", 60)
+PRESENCIA_LATIDO = getattr(settings, "CHAT_PRESENCIA_LATIDO", PRESENCIA_TTL / 3)
+
+
+def _key(usuario_id):
+    return f"chat_presencia_{usuario_id}"
+
+
+def _key_generacion(usuario_id):
+    return f"chat_presencia_{usuario_id}_generacion"
+
+
+def _key_conexion(usuario_id, channel_name):
+    return f"chat_presencia_{usuario_id}_{channel_name}"
+
+
+def grupo_presencia(usuario_id):
+    """Grupo del channel layer donde se publican los cambios de estado de un usuario."""
+    return f"presencia_{usuario_id}"
+
+
+async def _generacion_actual(usuario_id, contador_nuevo):
+    clave = _key_generacion(usuario_id)
+    await cache.aadd(clave, 0, timeout=None)
+    if contador_nuevo:
+        return await cache.aincr(clave)
+    return await cache.aget(clave, 0)
+
+
+async def registrar_conexion(usuario_id, channel_name):
+    """
+    Registra una conexión websocket del usuario, o la renueva si ya estaba
+    (latido). Retorna el número de conexiones activas del usuario.
+    """
+    clave = _key(usuario_id)
+    # Quien crea el contador abre una generación nueva: las demás conexiones
+    # vivas se vuelven a sumar en su próximo latido
+    contador_nuevo = await cache.aadd(clave, 0, timeout=PRESENCIA_TTL)
+    if not contador_nuevo:
+        await cache.atouch(clave, PRESENCIA_TTL)
+    generacion = await _generacion_actual(usuario_id, contador_nuevo)
+
+    conexion = _key_conexion(usuario_id, channel_name)
+    if await cache.aget(conexion) == generacion:
+        await cache.atouch(conexion, PRESENCIA_TTL)
+        return await contar_conexiones(usuario_id)
+
+    await cache.aset(conexion, generacion, timeout=PRESENCIA_TTL)
+    try:
+        return await cache.aincr(clave)
+    except ValueError:
+        # El contador venció o se borró entre medio: se vuelve a crear
+        return await registrar_conexion(usuario_id, channel_name)
+
+
+async def retirar_conexion(usuario_id, channel_name):
+    """Quita la conexión del registro. Retorna las conexiones que quedan activas."""
+    conexion = _key_conexion(usuario_id, channel_name)
+    generacion = await cache.aget(conexion)
+    if not await cache.adelete(conexion) or generacion != await cache.aget(_key_generacion(usuario_id)):
+        # Ya había vencido, o no está contada en el contador actual
+        return await contar_conexiones(usuario_id)
+    try:
+        cantidad = await cache.adecr(_key(usuario_id))
+    except ValueError:
+        return 0
+    if cantidad <= 0:
+        await cache.adelete(_key(usuario_id))
+        return 0
+    return cantidad
+
+
+async def contar_conexiones(usuario_id):
+    return max(await cache.aget(_key(usuario_id), 0), 0)
+
+
+async def esta_conectado(usuario_id):
+    return await contar_conexiones(usuario_id) > 0
+
+
+async def estados(usuario_ids):
+    """{usuario_id: en línea} para varios usuarios, en una sola lectura de la caché."""
+    usuario_ids = list(usuario_ids)
+    valores = await cache.aget_many([_key(uid) for uid in usuario_ids])
+    return {uid: valores.get(_key(uid), 0) > 0 for uid in usuario_ids}
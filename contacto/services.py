@@ -0,0 +1,91 @@
+# contacto/services.py
+
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import connection, transaction
+
+from .models import ChatModel, MensajeModel
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def marcar_mensajes_leidos(usuario, mensaje_ids=None, chat_id=None, hasta_id=None):
+    """
+    Marca como leídos los mensajes recibidos por `usuario` en una sola sentencia
+    UPDATE ... RETURNING, limitada a los chats donde el usuario es cliente o agente.
+
+    Dos modos:
+      - mensaje_ids=[...]          -> marca exactamente esos mensajes.
+      - chat_id=X, hasta_id=Y      -> marca todo lo no leído del chat X con id <= Y (watermark).
+
+    Solo se marcan mensajes enviados por la contraparte (nunca los propios) y que
+    aún no estaban leídos, así la respuesta contiene únicamente filas realmente cambiadas.
+    Retorna una lista de tuplas (mensaje_id, chat_id, remitente_id).
+    """
+    mensaje_table = MensajeModel._meta.db_table
+    chat_table = ChatModel._meta.db_table
+
+    condiciones = [
+        "leido = %s",
+        "usuario_id <> %s",
+        f"chat_id IN (SELECT id FROM {chat_table} WHERE cliente_id = %s OR agente_id = %s)",
+    ]
+    params = [True, False, usuario.id, usuario.id, usuario.id]
+
+    if mensaje_ids is not None:
+        condiciones.append(f"id IN ({', '.join(['%s'] * len(mensaje_ids))})")
+        params.extend(mensaje_ids)
+    else:
+        condiciones.append("chat_id = %s AND id <= %s")
+        params.extend([chat_id, hasta_id])
+
+    sql = (
+        f"UPDATE {mensaje_table} SET leido = %s "
+        f"WHERE {' AND '.join(condiciones)} "
+        f"RETURNING id, chat_id, usuario_id"
+    )
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            filas = cursor.fetchall()
+
+    if filas:
+        transaction.on_commit(lambda: notificar_leidos(usuario, filas))
+    return filas
+
+
+def notificar_leidos(lector, filas):
+    """
+    Envía a la contraparte un único evento 'read_receipt' por chat con todos
+    los IDs marcados, en lugar de un evento por mensaje.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    # (chat_id, remitente_id) -> [mensaje_ids]
+    lotes = defaultdict(list)
+    for mensaje_id, chat_id, remitente_id in filas:
+        lotes[(chat_id, remitente_id)].append(mensaje_id)
+
+    for (chat_id, remitente_id), ids in lotes.items():
+        try:
+            async_to_sync(channel_layer.group_send)(
+                f"user_{remitente_id}",
+                {
+                    "type": "read_receipt",
+                    "payload": {
+                        "tipo": "leidos",
+                        "chat_id": chat_id,
+                        "lector_id": lector.id,
+                        "mensaje_ids": sorted(ids),
+                        "hasta_id": max(ids),
+                    },
+                },
+            )
+        except Exception as e:
+            logger.error(f"Error enviando confirmación de lectura del chat {chat_id}: {e}")
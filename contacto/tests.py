@@ -1,3 +1,174 @@
+import asyncio
+from unittest import mock
+
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from usuario.models import Usuario
+
+from . import consumers, presence
+from .consumers import METRICAS_WS, UserConsumer
+from .models import ChatModel
+
+
+class Consumer(UserConsumer):
+    """UserConsumer que guarda la última instancia para revisar sus tareas."""
+    instancia = None
+
+    async def connect(self):
+        Consumer.instancia = self
+        await super().connect()
+
+
+async def envio_bloqueado(self, text_data=None, bytes_data=None, close=False):
+    # Cliente que no lee: el envío real nunca termina
+    await asyncio.Event().wait()
+
+
+class UserConsumerTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agente = Usuario.objects.create(username='agente', nombre='Agente', correo='agente@test.com')
+        cls.cliente = Usuario.objects.create(username='cliente', nombre='Cliente', correo='cliente@test.com')
+        cls.chat = ChatModel.objects.create(cliente=cls.cliente, agente=cls.agente)
+
+    def setUp(self):
+        cache.clear()
+
+    async def conectar(self, usuario):
+        communicator = WebsocketCommunicator(Consumer.as_asgi(), f'/ws/user/{usuario.id}/')
+        communicator.scope['user'] = usuario
+        conectado, _ = await communicator.connect()
+        self.assertTrue(conectado)
+        return communicator, Consumer.instancia
+
+    async def test_cola_llena_cierra_la_conexion(self):
+        antes = METRICAS_WS['descartados_cola_llena']
+        with mock.patch.object(consumers, 'WS_COLA_ENVIO_MAX', 2), \
+                mock.patch.object(AsyncWebsocketConsumer, 'send', envio_bloqueado):
+            communicator, _ = await self.conectar(self.cliente)
+            # El primero queda en el escritor, dos llenan la cola y el cuarto no entra
+            for _ in range(4):
+                await communicator.send_json_to({'tipo': 'ping'})
+            salida = await communicator.receive_output()
+            await communicator.disconnect()
+        self.assertEqual(salida, {'type': 'websocket.close', 'code': consumers.CIERRE_CLIENTE_LENTO})
+        self.assertEqual(METRICAS_WS['descartados_cola_llena'], antes + 1)
+
+    async def test_envio_lento_cierra_la_conexion(self):
+        antes = METRICAS_WS['descartados_timeout_envio']
+        with mock.patch.object(consumers, 'WS_ENVIO_TIMEOUT', 0.05), \
+                mock.patch.object(AsyncWebsocketConsumer, 'send', envio_bloqueado):
+            communicator, _ = await self.conectar(self.cliente)
+            await communicator.send_json_to({'tipo': 'ping'})
+            salida = await communicator.receive_output()
+            await communicator.disconnect()
+        self.assertEqual(salida, {'type': 'websocket.close', 'code': consumers.CIERRE_CLIENTE_LENTO})
+        self.assertEqual(METRICAS_WS['descartados_timeout_envio'], antes + 1)
+
+    async def test_limite_de_frames(self):
+        antes = METRICAS_WS['limitados']
+        with mock.patch.object(consumers, 'WS_RAFAGA', 2), \
+                mock.patch.object(consumers, 'WS_FRAMES_POR_SEGUNDO', 0.001):
+            communicator, _ = await self.conectar(self.cliente)
+            for _ in range(3):
+                await communicator.send_json_to({'tipo': 'ping'})
+            respuestas = [await communicator.receive_json_from() for _ in range(3)]
+            await communicator.disconnect()
+        self.assertEqual(respuestas[:2], [{'tipo': 'pong'}, {'tipo': 'pong'}])
+        self.assertIn('error', respuestas[2])
+        self.assertEqual(METRICAS_WS['limitados'], antes + 1)
+
+    async def test_frame_grande_cierra_la_conexion(self):
+        communicator, _ = await self.conectar(self.cliente)
+        await communicator.send_to(text_data='x' * (consumers.WS_MAX_FRAME_BYTES + 1))
+        salida = await communicator.receive_output()
+        await communicator.disconnect()
+        self.assertEqual(salida, {'type': 'websocket.close', 'code': consumers.CIERRE_FRAME_GRANDE})
+
+    async def test_disconnect_cancela_y_espera_las_tareas(self):
+        communicator, consumer = await self.conectar(self.cliente)
+        # connect() registra la presencia después de aceptar: el pong asegura que terminó
+        await communicator.send_json_to({'tipo': 'ping'})
+        await communicator.receive_json_from()
+        self.assertTrue(await presence.esta_conectado(self.cliente.id))
+        tareas = [consumer.tarea_envio, consumer.tarea_latido]
+        await communicator.disconnect()
+        self.assertTrue(all(tarea.done() and tarea.cancelled() for tarea in tareas))
+        self.assertFalse(await presence.esta_conectado(self.cliente.id))
+
+    async def test_escribiendo_llega_a_la_contraparte_una_vez_por_intervalo(self):
+        agente, _ = await self.conectar(self.agente)
+        cliente, _ = await self.conectar(self.cliente)
+        await cliente.send_json_to({'tipo': 'escribiendo', 'chat_id': self.chat.id})
+        evento = await agente.receive_json_from()
+        self.assertEqual(evento, {
+            'tipo': 'escribiendo', 'chat_id': self.chat.id, 'usuario_id': self.cliente.id, 'escribiendo': True,
+        })
+        # Dentro de ESCRIBIENDO_INTERVALO no se reenvía
+        await cliente.send_json_to({'tipo': 'escribiendo', 'chat_id': self.chat.id})
+        self.assertTrue(await agente.receive_nothing())
+        await cliente.disconnect()
+        await agente.disconnect()
+
+    async def test_presencia_de_suscritos(self):
+        cliente, _ = await self.conectar(self.cliente)
+        await cliente.send_json_to({'tipo': 'suscribir_presencia', 'usuarios': [self.agente.id]})
+        self.assertEqual(
+            await cliente.receive_json_from(),
+            {'tipo': 'presencia', 'estados': {str(self.agente.id): False}},
+        )
+        agente, _ = await self.conectar(self.agente)
+        self.assertEqual(
+            await cliente.receive_json_from(),
+            {'tipo': 'presencia', 'usuario_id': self.agente.id, 'en_linea': True},
+        )
+        await agente.disconnect()
+        self.assertEqual(
+            await cliente.receive_json_from(),
+            {'tipo': 'presencia', 'usuario_id': self.agente.id, 'en_linea': False},
+        )
+        await cliente.disconnect()
+
+    async def test_latido_avisa_cambios_sin_aviso_del_channel_layer(self):
+        with mock.patch.object(presence, 'PRESENCIA_LATIDO', 0.05):
+            cliente, _ = await self.conectar(self.cliente)
+            await cliente.send_json_to({'tipo': 'suscribir_presencia', 'usuarios': [self.agente.id]})
+            await cliente.receive_json_from()
+            # Conexión registrada en otro proceso, sin publicar en el grupo de presencia
+            await presence.registrar_conexion(self.agente.id, 'otro-proceso')
+            evento = await cliente.receive_json_from(timeout=2)
+            await cliente.disconnect()
+        self.assertEqual(evento, {'tipo': 'presencia', 'usuario_id': self.agente.id, 'en_linea': True})
+
+
+class PresenciaTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_contador_vencido_se_reconstruye_con_las_conexiones_vivas(self):
+        self.assertEqual(await presence.registrar_conexion(1, 'a'), 1)
+        self.assertEqual(await presence.registrar_conexion(1, 'b'), 2)
+        # El contador vence (latidos demorados) con los dos sockets abiertos
+        await cache.adelete(presence._key(1))
+        self.assertEqual(await presence.registrar_conexion(1, 'a'), 1)
+        self.assertEqual(await presence.registrar_conexion(1, 'b'), 2)
+        # Latidos siguientes no vuelven a sumar
+        self.assertEqual(await presence.registrar_conexion(1, 'a'), 2)
+        self.assertEqual(await presence.retirar_conexion(1, 'a'), 1)
+        self.assertTrue(await presence.esta_conectado(1))
+        self.assertEqual(await presence.retirar_conexion(1, 'b'), 0)
+        self.assertFalse(await presence.esta_conectado(1))
+
+    async def test_conexion_de_otra_generacion_no_resta(self):
+        await presence.registrar_conexion(1, 'a')
+        await presence.registrar_conexion(1, 'b')
+        await cache.adelete(presence._key(1))
+        await presence.registrar_conexion(1, 'a')
+        # 'b' se cierra antes de su latido: no estaba contada en el contador nuevo
+        self.assertEqual(await presence.retirar_conexion(1, 'b'), 1)
+        self.assertTrue(await presence.esta_conectado(1))
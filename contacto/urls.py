@@ -2,7 +2,7 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ChatViewSet, MensajeViewSet, marcar_leidos
+from .views import ChatViewSet, MensajeViewSet, marcar_leidos, marcar_leidos_hasta, metricas_ws
 # Creamos el router para manejar las rutas de DRF
 router = DefaultRouter()
 router.register(r'chats', ChatViewSet, basename='chat')
@@ -11,4 +11,6 @@ router.register(r'mensajes', MensajeViewSet, basename='mensaje')
 urlpatterns = [
     path('', include(router.urls)),
     path('mensaje/marcar-leidos/', marcar_leidos, name='marcar-leidos'),
+    path('mensaje/marcar-leidos-hasta/', marcar_leidos_hasta, name='marcar-leidos-hasta'),
+    path('ws/metricas/', metricas_ws, name='metricas-ws'),
 ]
@@ -1,17 +1,21 @@
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 from inmobiliaria.permissions import has_permission
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 
 from .models import ChatModel, MensajeModel
 from .serializer import ChatSerializer, MensajeSerializer
+from .services import marcar_mensajes_leidos
+from .consumers import METRICAS_WS
 from usuario.models import Usuario
 from suscripciones.models import Suscripcion
+from suscripciones.cuotas import reservar_cupo, LimitePlanAlcanzado
+from contextlib import nullcontext
 # --------------------------
 # CHAT
 # --------------------------
@@ -66,27 +70,6 @@ class ChatViewSet(viewsets.ModelViewSet):
         # Verificar permiso de creación en componente Chat
         usuario = self.request.user
 
-        # --- 🔒 CANDADO SAAS: Límite de Chats Activos ---
-        # Solo aplicamos el límite si es Agente (los clientes suelen ser gratis)
-        if usuario.grupo and usuario.grupo.nombre.lower() == 'agente':
-            if not (usuario.is_staff or usuario.is_superuser):
-                try:
-                    sub = usuario.suscripcion
-                    if not sub.esta_activa:
-                        raise ValidationError("Suscripción vencida. No puedes iniciar nuevos chats.")
-                    
-                    # Lógica: Si es Plan Básico, solo 5 chats simultáneos
-                    # Si tu modelo Plan no tiene 'limite_chats', podemos hardcodearlo por precio o nombre
-                    limite_chats = 5 if sub.plan.precio < 50 else 9999
-                    
-                    chats_actuales = ChatModel.objects.filter(agente=usuario).count()
-                    
-                    if chats_actuales >= limite_chats:
-                         raise ValidationError(f"Límite de chats alcanzado ({limite_chats}). Actualiza a PRO para chats ilimitados.")
-
-                except Suscripcion.DoesNotExist:
-                     raise ValidationError("Necesitas una suscripción para contactar clientes.")
-        # ------------------------------------------------
         if not has_permission(self.request.user, "Chat", "crear"):
             return Response({
                 "status": 2,
@@ -102,6 +85,7 @@ class ChatViewSet(viewsets.ModelViewSet):
             raise ValidationError("El agente seleccionado no es un agente inmobiliario válido.")
 
         # 🔍 Verificar si ya existe un chat entre cliente y agente
+        # (reabrir un chat existente no consume cupo del plan)
         existing_chat = ChatModel.objects.filter(cliente=cliente, agente=agente).first()
 
         if existing_chat:
@@ -115,8 +99,34 @@ class ChatViewSet(viewsets.ModelViewSet):
             }
             return  # No crear uno nuevo
 
+        # --- 🔒 CANDADO SAAS: Límite de Chats Activos ---
+        # Solo aplicamos el límite si es Agente (los clientes suelen ser gratis)
+        cupo = nullcontext()
+        if usuario.grupo and usuario.grupo.nombre.lower() == 'agente':
+            if not (usuario.is_staff or usuario.is_superuser):
+                try:
+                    sub = usuario.suscripcion
+                    if not sub.esta_activa:
+                        raise ValidationError("Suscripción vencida. No puedes iniciar nuevos chats.")
+                    
+                    # Lógica: Si es Plan Básico, solo 5 chats simultáneos
+                    # Si tu modelo Plan no tiene 'limite_chats', podemos hardcodearlo por precio o nombre
+                    limite_chats = 5 if sub.plan.precio < 50 else 9999
+
+                    # UPDATE condicional sobre el contador del agente en lugar de COUNT de chats
+                    cupo = reservar_cupo(usuario.id, "chats", limite_chats)
+
+                except Suscripcion.DoesNotExist:
+                     raise ValidationError("Necesitas una suscripción para contactar clientes.")
+        # ------------------------------------------------
+
         # Guardar un nuevo chat si no existe
-        chat = serializer.save()
+        try:
+            with cupo:
+                chat = serializer.save()
+        except LimitePlanAlcanzado as e:
+            raise ValidationError(f"Límite de chats alcanzado ({e.limite}). Actualiza a PRO para chats ilimitados.")
+
         self.created_chat_response = {
             "status": 1,
             "error": 0,
@@ -165,12 +175,13 @@ class MensajeViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 @api_view(['POST'])
+@permission_classes([IsAuthenticated])
 def marcar_leidos(request):
     """
     Marca como leídos los mensajes que reciban en la lista de IDs.
     Body esperado: { "mensaje_ids": [1,2,3,...] }
+    Solo afecta mensajes de chats del usuario autenticado enviados por la contraparte.
     """
-    print("llega:",request.data)
     mensaje_ids = request.data.get("mensaje_ids", [])
     if not isinstance(mensaje_ids, list) or not mensaje_ids:
         return Response({
@@ -179,14 +190,66 @@ def marcar_leidos(request):
             'error': 'No se proporcionaron IDs válidos'
         }, status=400)
 
-    mensajes = MensajeModel.objects.filter(id__in=mensaje_ids)
-    mensajes.update(leido=True)
+    try:
+        mensaje_ids = [int(i) for i in mensaje_ids]
+    except (TypeError, ValueError):
+        return Response({
+            'success': False,
+            'data': None,
+            'error': 'No se proporcionaron IDs válidos'
+        }, status=400)
+
+    filas = marcar_mensajes_leidos(request.user, mensaje_ids=mensaje_ids)
 
-    # Devolver IDs actualizados
-    datos = [{"id": m.id, "chat_id": m.chat.id, "leido": True} for m in mensajes]
+    # Devolver IDs actualizados (directo del RETURNING, sin volver a consultar)
+    datos = [{"id": mensaje_id, "chat_id": chat_id, "leido": True} for mensaje_id, chat_id, _ in filas]
 
     return Response({
         'success': True,
         'data': datos,
         'error': None
-    })
\ No newline at end of file
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def marcar_leidos_hasta(request):
+    """
+    Marca como leídos todos los mensajes recibidos en un chat hasta un ID (watermark).
+    Body esperado: { "chat_id": 5, "hasta_id": 120 }
+    """
+    try:
+        chat_id = int(request.data.get("chat_id"))
+        hasta_id = int(request.data.get("hasta_id"))
+    except (TypeError, ValueError):
+        return Response({
+            'success': False,
+            'data': None,
+            'error': 'chat_id y hasta_id son requeridos'
+        }, status=400)
+
+    filas = marcar_mensajes_leidos(request.user, chat_id=chat_id, hasta_id=hasta_id)
+
+    return Response({
+        'success': True,
+        'data': {
+            "chat_id": chat_id,
+            "hasta_id": hasta_id,
+            "mensaje_ids": [mensaje_id for mensaje_id, _, _ in filas],
+        },
+        'error': None
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metricas_ws(request):
+    """
+    Contadores del proceso actual sobre frames websocket limitados, rechazados
+    por tamaño y descartados por clientes lentos.
+    """
+    return Response({
+        'success': True,
+        'data': dict(METRICAS_WS),
+        'error': None
+    })
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ContratoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'contrato'
+
+    # Conecta las señales que invalidan los PDF generados de los contratos
+    def ready(self):
+        import contrato.signals
@@ -0,0 +1,104 @@
+# contrato/clientes.py
+"""
+Cuentas de cliente que se vinculan a un contrato por CI.
+
+Al crear un contrato, la parte contratada se busca por CI (índice parcial en
+Usuario.ci) y, si no existe, se le crea una cuenta "solo de vínculo":
+
+- contraseña inutilizable (set_unusable_password, sin calcular el hash); la
+  persona no entra con ella hasta que se le asigne una contraseña.
+- correo de relleno único (ci_<ci>@sin-correo.invalid), porque
+  Usuario.correo es único y vacío choca desde la segunda cuenta.
+
+Los ids de los grupos se guardan en la caché (se borran al guardar o eliminar
+un Grupo, ver contrato/signals.py).
+"""
+from django.core.cache import cache
+
+from usuario.models import Grupo, Usuario
+
+
+DOMINIO_SIN_CORREO = 'sin-correo.invalid'
+CLAVE_GRUPOS = 'usuarios:grupos'
+
+
+def grupo_id(nombre):
+    """Id del grupo (sin distinguir mayúsculas); Exception si no existe."""
+    grupos = cache.get(CLAVE_GRUPOS)
+    if grupos is None:
+        # Son pocos: se guardan todos juntos {nombre en minúsculas: id}
+        grupos = {n.lower(): i for i, n in Grupo.objects.values_list('id', 'nombre')}
+        cache.set(CLAVE_GRUPOS, grupos, timeout=None)
+    valor = grupos.get(nombre.lower())
+    if valor is None:
+        raise Exception(f"El grupo '{nombre}' es requerido.")
+    return valor
+
+
+def olvidar_grupos():
+    cache.delete(CLAVE_GRUPOS)
+
+
+def _nuevo_cliente(nombre, ci, domicilio, id_grupo):
+    usuario = Usuario(
+        username=f"ci_{ci}",
+        correo=f"ci_{ci}@{DOMINIO_SIN_CORREO}",
+        nombre=nombre or '',
+        ci=ci,
+        grupo_id=id_grupo,
+        ubicacion=domicilio,  # Usar domicilio ingresado
+    )
+    usuario.set_unusable_password()
+    return usuario
+
+
+def vincular_cliente(nombre, ci, domicilio, grupo_nombre='cliente'):
+    """
+    Usuario con ese CI para vincular al contrato.
+    1. Si existe, lo retorna (sin actualizar datos).
+    2. Si no existe, lo crea con el rol `grupo_nombre`.
+    """
+    if not ci:
+        return None
+    id_grupo = grupo_id(grupo_nombre)
+
+    # 🚨 REGLA CLAVE: Si ya existe, NO HACEMOS NADA más que usar su ID.
+    # Esto protege los datos de Agentes/Admins de ser sobrescritos.
+    usuario = Usuario.objects.filter(ci=ci).first()
+    if usuario:
+        return usuario
+
+    usuario = _nuevo_cliente(nombre, ci, domicilio, id_grupo)
+    usuario.save()
+    return usuario
+
+
+def vincular_clientes(personas, grupo_nombre='cliente'):
+    """
+    Versión por lote de `vincular_cliente` para muchas personas
+    (iterable de (nombre, ci, domicilio)). Una consulta para los existentes y
+    un bulk_create para los nuevos. Devuelve {ci: Usuario}.
+    """
+    por_ci = {}
+    for nombre, ci, domicilio in personas:
+        if ci and ci not in por_ci:
+            por_ci[ci] = (nombre, domicilio)
+    if not por_ci:
+        return {}
+    id_grupo = grupo_id(grupo_nombre)
+
+    usuarios = {}
+    for usuario in Usuario.objects.filter(ci__in=list(por_ci)).order_by('id'):
+        usuarios.setdefault(usuario.ci, usuario)  # Como .first(): el más antiguo
+
+    nuevos = [
+        _nuevo_cliente(nombre, ci, domicilio, id_grupo)
+        for ci, (nombre, domicilio) in por_ci.items()
+        if ci not in usuarios
+    ]
+    if nuevos:
+        Usuario.objects.bulk_create(nuevos)
+        # Se vuelven a leer: no todas las bases devuelven los ids en bulk_create
+        for usuario in Usuario.objects.filter(ci__in=[u.ci for u in nuevos], username__in=[u.username for u in nuevos]):
+            usuarios[usuario.ci] = usuario
+    return usuarios
@@ -0,0 +1,317 @@
+# contrato/comisiones.py
+"""
+Dashboard de comisiones (contrato/views.py: dashboard_comisiones) y detalle
+por agente (detalle_comisiones_agente).
+
+El dashboard sale de 4 consultas agrupadas, con funciones de Django que
+funcionan en cualquier base (TruncMonth en lugar de EXTRACT):
+
+1. Por tipo de contrato, sobre todos los contratos activos. Con agregados
+   condicionales (filter=) da a la vez las filas por tipo con los filtros
+   aplicados, los totales generales (suma de las filas) y si existen
+   contratos de servicios activos (sin filtros).
+2. Por agente.
+3. Por mes (últimos 6 meses).
+4. Top 5 contratos por comisión.
+
+El detalle por agente también se calcula en la base: el resumen y el puesto
+del agente (RANK sobre los totales de todos los agentes) en una consulta, la
+serie mensual con el acumulado (SUM ... OVER) en otra, y los contratos
+paginados por keyset (fecha_contrato, id) como en contrato/listado.py.
+
+Los resultados se guardan en la caché por combinación de filtros (los
+contratos del detalle no: cada página es una consulta por índice). Al
+guardar o borrar un Contrato (contrato/signals.py) cambia la versión y las
+entradas viejas dejan de usarse; el TTL cubre lo demás (p. ej. cambios de
+nombre del agente).
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DecimalField, F, Func, Q, Sum, Window
+from django.db.models.functions import Rank, TruncMonth
+from django.utils import timezone
+
+from .models import Contrato
+from . import listado
+
+
+TTL = getattr(settings, 'CONTRATOS_COMISIONES_TTL', 300)
+CLAVE_VERSION = 'contratos:comisiones:version'
+
+
+def version():
+    valor = cache.get(CLAVE_VERSION)
+    if valor is None:
+        # Inicia en el reloj (no en 0) para no repetir una versión si la caché la desalojó
+        cache.add(CLAVE_VERSION, time.time_ns(), timeout=None)
+        valor = cache.get(CLAVE_VERSION)
+    return valor
+
+
+def invalidar():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.add(CLAVE_VERSION, time.time_ns(), timeout=None)
+
+
+def _filtro(fecha_inicio=None, fecha_fin=None, incluir_servicios=False):
+    filtro = Q()
+    if fecha_inicio:
+        filtro &= Q(fecha_contrato__gte=fecha_inicio)
+    if fecha_fin:
+        filtro &= Q(fecha_contrato__lte=fecha_fin)
+    if not incluir_servicios:
+        filtro &= ~Q(tipo_contrato='servicios')
+    return filtro
+
+
+def _numero(valor):
+    return float(valor or 0)
+
+
+def calcular_dashboard(fecha_inicio=None, fecha_fin=None, incluir_servicios=False):
+    activos = Contrato.objects.filter(estado='activo')
+    filtro = _filtro(fecha_inicio, fecha_fin, incluir_servicios)
+    condicion = filtro or None  # Q() vacío no se puede usar como filter= de un agregado
+    contratos = activos.filter(filtro)
+
+    # 1. Por tipo (y de ahí los totales)
+    filas_tipo = list(
+        activos.values('tipo_contrato')
+        .annotate(
+            total_contratos=Count('id', filter=condicion),
+            total_comision=Sum('comision_monto', filter=condicion),
+            suma_porcentaje=Sum('comision_porcentaje', filter=condicion),
+            con_porcentaje=Count('comision_porcentaje', filter=condicion),
+            activos=Count('id'),
+        )
+        .order_by('-total_comision')
+    )
+    comisiones_tipo = [
+        {
+            'tipo_contrato': fila['tipo_contrato'],
+            'total_contratos': fila['total_contratos'],
+            'total_comision': _numero(fila['total_comision']),
+        }
+        for fila in filas_tipo
+        if fila['total_contratos']
+    ]
+    suma_porcentaje = sum(_numero(fila['suma_porcentaje']) for fila in filas_tipo)
+    con_porcentaje = sum(fila['con_porcentaje'] for fila in filas_tipo)
+    servicios = next((fila for fila in filas_tipo if fila['tipo_contrato'] == 'servicios'), None)
+
+    stats_generales = {
+        'total_contratos': sum(fila['total_contratos'] for fila in filas_tipo),
+        'total_comisiones': sum(_numero(fila['total_comision']) for fila in filas_tipo),
+        # Promedio de los porcentajes no nulos, como Avg()
+        'comision_promedio': suma_porcentaje / con_porcentaje if con_porcentaje else 0.0,
+    }
+    if incluir_servicios:
+        stats_generales['contratos_servicios'] = servicios['total_contratos'] if servicios else 0
+
+    # 2. Por agente
+    comisiones_agente = [
+        {**fila, 'total_comision': _numero(fila['total_comision']),
+         'comision_promedio': _numero(fila['comision_promedio'])}
+        for fila in contratos.values('agente__id', 'agente__nombre', 'agente__username')
+        .annotate(
+            total_contratos=Count('id'),
+            total_comision=Sum('comision_monto'),
+            comision_promedio=Avg('comision_porcentaje'),
+        )
+        .order_by('-total_comision')
+    ]
+
+    # 3. Por mes (últimos 6 meses)
+    seis_meses_atras = timezone.now().date() - timedelta(days=180)
+    comisiones_mensuales = [
+        {
+            'mes': fila['periodo'].month,
+            'ano': fila['periodo'].year,
+            'total_comision': _numero(fila['total_comision']),
+            'total_contratos': fila['total_contratos'],
+        }
+        for fila in contratos.filter(fecha_contrato__gte=seis_meses_atras)
+        .annotate(periodo=TruncMonth('fecha_contrato'))
+        .values('periodo')
+        .annotate(total_comision=Sum('comision_monto'), total_contratos=Count('id'))
+        .order_by('-periodo')[:6]
+    ]
+
+    # 4. Top 5 contratos con mayor comisión
+    top_contratos = [
+        {
+            'id': contrato.id,
+            'cliente': contrato.parte_contratante_nombre,
+            'agente': contrato.agente.nombre,
+            'inmueble': contrato.inmueble.titulo if contrato.inmueble else 'N/A',
+            'tipo_contrato': contrato.get_tipo_contrato_display(),
+            'monto_contrato': _numero(contrato.monto),
+            'comision_monto': _numero(contrato.comision_monto),
+            'comision_porcentaje': _numero(contrato.comision_porcentaje),
+            'fecha': contrato.fecha_contrato,
+        }
+        for contrato in contratos.select_related('agente', 'inmueble').order_by('-comision_monto')[:5]
+    ]
+
+    return {
+        'stats_generales': stats_generales,
+        'comisiones_agente': comisiones_agente,
+        'comisiones_tipo': comisiones_tipo,
+        'comisiones_mensuales': comisiones_mensuales,
+        'top_contratos': top_contratos,
+        'hay_contratos_servicios': bool(servicios and servicios['activos']),
+    }
+
+
+def dashboard(fecha_inicio=None, fecha_fin=None, incluir_servicios=False):
+    """Datos del dashboard, desde la caché si ya se calcularon con los mismos filtros."""
+    # El día entra en la clave porque la serie mensual depende de hoy
+    clave = (
+        f'contratos:comisiones:{fecha_inicio or ""}:{fecha_fin or ""}:{int(incluir_servicios)}'
+        f':{timezone.now().date()}:{version()}'
+    )
+    datos = cache.get(clave)
+    if datos is None:
+        datos = calcular_dashboard(fecha_inicio, fecha_fin, incluir_servicios)
+        cache.set(clave, datos, timeout=TTL)
+    return datos
+
+
+# ============================================
+# Detalle por agente
+# ============================================
+
+class _SumaVentana(Func):
+    """SUM(...) OVER sobre un agregado del GROUP BY (Window(Sum(Sum(...))) no se permite)."""
+    function = 'SUM'
+    window_compatible = True
+
+
+CAMPOS_DETALLE = (
+    'id', 'parte_contratante_nombre', 'inmueble__titulo', 'tipo_contrato', 'monto',
+    'comision_monto', 'comision_porcentaje', 'fecha_contrato', 'vigencia_dias', 'estado',
+)
+
+
+def _contratos_agente(agente_id, filtro):
+    return Contrato.objects.filter(estado='activo', agente_id=agente_id).filter(filtro)
+
+
+def calcular_resumen_agente(agente_id, fecha_inicio=None, fecha_fin=None, incluir_servicios=False):
+    filtro = _filtro(fecha_inicio, fecha_fin, incluir_servicios)
+
+    # 1. Totales de cada agente y su puesto; una fila por agente
+    resumen = {
+        'total_contratos': 0, 'total_comision': 0.0, 'comision_promedio': 0.0,
+        'monto_total_contratos': 0.0, 'ranking': None, 'total_agentes': 0,
+    }
+    por_agente = (
+        Contrato.objects.filter(estado='activo').filter(filtro)
+        .values('agente_id')
+        .annotate(
+            total_contratos=Count('id'),
+            total_comision=Sum('comision_monto'),
+            comision_promedio=Avg('comision_porcentaje'),
+            monto_total=Sum('monto'),
+        )
+        .annotate(
+            ranking=Window(Rank(), order_by=F('total_comision').desc(nulls_last=True)),
+            total_agentes=Window(Count('agente_id')),
+        )
+    )
+    for fila in por_agente:
+        resumen['total_agentes'] = fila['total_agentes']
+        if fila['agente_id'] == agente_id:
+            resumen.update(
+                total_contratos=fila['total_contratos'],
+                total_comision=_numero(fila['total_comision']),
+                comision_promedio=_numero(fila['comision_promedio']),
+                monto_total_contratos=_numero(fila['monto_total']),
+                ranking=fila['ranking'],
+            )
+
+    contratos = _contratos_agente(agente_id, filtro)
+
+    # 2. Por mes, con el acumulado hasta ese mes
+    comisiones_mensuales = [
+        {
+            'mes': fila['periodo'].month,
+            'ano': fila['periodo'].year,
+            'total_contratos': fila['total_contratos'],
+            'total_comision': _numero(fila['total_comision']),
+            'comision_acumulada': _numero(fila['comision_acumulada']),
+        }
+        for fila in contratos.annotate(periodo=TruncMonth('fecha_contrato'))
+        .values('periodo')
+        .annotate(total_comision=Sum('comision_monto'), total_contratos=Count('id'))
+        .annotate(comision_acumulada=Window(
+            _SumaVentana(Sum('comision_monto'), output_field=DecimalField()),
+            order_by=F('periodo').asc(),
+        ))
+        .order_by('periodo')
+    ]
+
+    # 3. Por tipo de contrato
+    comisiones_tipo = [
+        {
+            'tipo_contrato': fila['tipo_contrato'],
+            'total_contratos': fila['total_contratos'],
+            'total_comision': _numero(fila['total_comision']),
+            'monto_total': _numero(fila['monto_total']),
+        }
+        for fila in contratos.values('tipo_contrato')
+        .annotate(total_contratos=Count('id'), total_comision=Sum('comision_monto'), monto_total=Sum('monto'))
+        .order_by('-total_comision')
+    ]
+
+    return {
+        'resumen': resumen,
+        'comisiones_mensuales': comisiones_mensuales,
+        'comisiones_tipo': comisiones_tipo,
+    }
+
+
+def resumen_agente(agente_id, fecha_inicio=None, fecha_fin=None, incluir_servicios=False):
+    """Resumen, serie mensual y tipos del agente, desde la caché si ya se calcularon."""
+    clave = (
+        f'contratos:comisiones:agente:{agente_id}:{fecha_inicio or ""}:{fecha_fin or ""}'
+        f':{int(incluir_servicios)}:{version()}'
+    )
+    datos = cache.get(clave)
+    if datos is None:
+        datos = calcular_resumen_agente(agente_id, fecha_inicio, fecha_fin, incluir_servicios)
+        cache.set(clave, datos, timeout=TTL)
+    return datos
+
+
+def contratos_agente(agente_id, fecha_inicio=None, fecha_fin=None, incluir_servicios=False,
+                     cursor=None, cantidad=listado.LIMITE):
+    """(página de contratos del agente, cursor de la siguiente o None); ValueError si el cursor no es válido."""
+    contratos = _contratos_agente(agente_id, _filtro(fecha_inicio, fecha_fin, incluir_servicios))
+    if cursor:
+        fecha, ultimo_id = listado.leer_cursor(cursor)
+        contratos = contratos.filter(
+            Q(fecha_contrato__lt=fecha) | Q(fecha_contrato=fecha, id__lt=ultimo_id)
+        )
+    filas = list(contratos.order_by('-fecha_contrato', '-id').values(*CAMPOS_DETALLE)[:cantidad + 1])
+    siguiente = listado.crear_cursor(filas[cantidad - 1]) if len(filas) > cantidad else None
+    return [
+        {
+            'id': fila['id'],
+            'cliente': fila['parte_contratante_nombre'],
+            'inmueble': fila['inmueble__titulo'] or 'N/A',
+            'tipo_contrato': listado.TIPOS.get(fila['tipo_contrato'], fila['tipo_contrato']),
+            'monto_contrato': _numero(fila['monto']),
+            'comision_monto': _numero(fila['comision_monto']),
+            'comision_porcentaje': _numero(fila['comision_porcentaje']),
+            'fecha_contrato': fila['fecha_contrato'],
+            'vigencia_dias': fila['vigencia_dias'],
+            'estado': fila['estado'],
+        }
+        for fila in filas[:cantidad]
+    ], siguiente
@@ -0,0 +1,349 @@
+# contrato/documentos.py
+"""
+Motor único para generar los PDF de contratos.
+
+- Plantillas (.txt con {campos} de str.format): se leen y analizan una sola
+  vez por proceso. Con DEBUG (o CONTRATOS_PLANTILLAS_RECARGAR) se vuelven a
+  leer si cambió su fecha de modificación, para editar sin reiniciar.
+- Estilos de párrafo: se crean una vez por proceso y los comparten todas las
+  peticiones (los documentos solo los leen).
+- Backends: convierten el texto ya llenado en bytes de PDF. `reportlab` arma
+  el documento con el diseño del tipo de contrato; `fpdf` escribe el texto
+  plano. Se pueden agregar otros con `registrar_backend()`.
+
+Uso:
+    pdf = renderizar('alquiler', contexto)           # bytes del PDF
+    pdf = renderizar('agente', contexto, datos=request.data)
+
+`contexto` llena la plantilla; `datos` son los datos crudos de la petición
+que algunos diseños usan para firmas y pie de página.
+"""
+import hashlib
+import io
+import os
+import string
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from fpdf import FPDF
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_LEFT
+from reportlab.lib.pagesizes import LETTER
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, HRFlowable
+
+
+VACIO = "________________"
+
+# Encabezados de cláusula (se muestran con el estilo de título de cláusula)
+CLAUSULAS = (
+    "PRIMERA", "SEGUNDA", "TERCERA", "CUARTA", "QUINTA", "SEXTA",
+    "SÉPTIMA", "OCTAVA", "NOVENA", "DÉCIMA",
+)
+
+
+# ============================================
+# Plantillas
+# ============================================
+
+class _Contexto(dict):
+    """Los campos de la plantilla que no vienen en el contexto quedan en blanco para llenar a mano."""
+
+    def __missing__(self, clave):
+        return VACIO
+
+
+class Plantilla:
+    def __init__(self, ruta, texto, mtime):
+        self.ruta = ruta
+        self.texto = texto
+        self.mtime = mtime
+        # Versión del contenido (forma parte de la clave de los PDF guardados, ver contrato/pdfs.py)
+        self.huella = hashlib.sha1(texto.encode("utf-8")).hexdigest()
+        # Campos {nombre} que usa la plantilla
+        self.campos = frozenset(
+            campo for _, campo, _, _ in string.Formatter().parse(texto) if campo
+        )
+
+    def llenar(self, contexto):
+        return self.texto.format_map(_Contexto(contexto))
+
+
+_plantillas = {}
+_lock = threading.Lock()
+
+
+def _recargar():
+    return getattr(settings, 'CONTRATOS_PLANTILLAS_RECARGAR', settings.DEBUG)
+
+
+def obtener_plantilla(ruta_relativa):
+    """Plantilla (ruta relativa a BASE_DIR) leída una sola vez; FileNotFoundError si no existe."""
+    ruta = os.path.join(settings.BASE_DIR, ruta_relativa)
+    plantilla = _plantillas.get(ruta)
+    if plantilla is not None and not _recargar():
+        return plantilla
+
+    mtime = os.stat(ruta).st_mtime_ns
+    if plantilla is not None and plantilla.mtime == mtime:
+        return plantilla
+
+    with _lock:
+        plantilla = _plantillas.get(ruta)
+        if plantilla is None or plantilla.mtime != mtime:
+            with open(ruta, "r", encoding="utf-8") as f:
+                plantilla = Plantilla(ruta, f.read(), mtime)
+            _plantillas[ruta] = plantilla
+    return plantilla
+
+
+def limpiar_cache():
+    """Olvida las plantillas y los estilos (los benchmarks lo usan para medir sin caché)."""
+    with _lock:
+        _plantillas.clear()
+    _hoja_base.cache_clear()
+    Documento.estilos.fget.cache_clear()
+
+
+# ============================================
+# Diseños (reportlab)
+# ============================================
+
+@lru_cache(maxsize=None)
+def _hoja_base():
+    return getSampleStyleSheet()
+
+
+def _es_clausula(parrafo):
+    return parrafo.strip().startswith(CLAUSULAS)
+
+
+class Documento:
+    """
+    Tipo de contrato: plantilla, backend, márgenes y cómo se arma el documento.
+    Las subclases definen `crear_estilos()` y `historia()`.
+    """
+    plantilla = None
+    backend = 'reportlab'
+    margenes = {'rightMargin': 40, 'leftMargin': 40, 'topMargin': 40, 'bottomMargin': 40}
+
+    @property
+    @lru_cache(maxsize=None)
+    def estilos(self):
+        return self.crear_estilos(_hoja_base())
+
+    def crear_estilos(self, hoja):
+        return {}
+
+    def historia(self, texto, datos):
+        raise NotImplementedError
+
+
+class DocumentoServicios(Documento):
+    """Contrato privado de servicios inmobiliarios (venta o anticrético)."""
+    titulo = "CONTRATO PRIVADO DE PRESTACIÓN DE SERVICIOS INMOBILIARIOS"
+    introduccion = (
+        "Conste por el presente Contrato Privado de Servicios Inmobiliarios, que con el sólo "
+        "reconocimiento de firmas surtirá los efectos de documento público, conforme al tenor "
+        "de las siguientes cláusulas y condiciones:"
+    )
+
+    def __init__(self, plantilla):
+        self.plantilla = plantilla
+
+    def crear_estilos(self, hoja):
+        return {
+            'titulo': ParagraphStyle(
+                "Titulo", parent=hoja["Heading1"], fontSize=14, leading=18, alignment=TA_CENTER,
+                spaceAfter=20, textColor=colors.black, fontName="Helvetica-Bold",
+            ),
+            'clausula_titulo': ParagraphStyle(
+                "ClausulaTitulo", parent=hoja["Normal"], fontSize=11, leading=14, alignment=TA_LEFT,
+                spaceAfter=6, textColor=colors.black, fontName="Helvetica-Bold",
+            ),
+            'clausula': ParagraphStyle("Clausula", fontSize=10, leading=13, alignment=TA_JUSTIFY, spaceAfter=8),
+            'firma': ParagraphStyle("Firma", fontSize=10, leading=12, alignment=TA_CENTER),
+            'footer': ParagraphStyle("Footer", fontSize=8, leading=10, alignment=TA_CENTER, textColor=colors.grey),
+        }
+
+    def historia(self, texto, datos):
+        e = self.estilos
+        story = [
+            Paragraph(self.titulo, e['titulo']),
+            Spacer(1, 10),
+            Paragraph(self.introduccion, e['clausula']),
+            Spacer(1, 15),
+        ]
+
+        parrafos = texto.strip().split("\n\n")
+        for i, p in enumerate(parrafos):
+            story.append(Paragraph(p.strip(), e['clausula_titulo'] if _es_clausula(p) else e['clausula']))
+            if i != len(parrafos) - 1:
+                story.append(Spacer(1, 8))
+
+        # Fecha y lugar
+        story.append(Spacer(1, 20))
+        story.append(Paragraph(
+            f"{datos.get('ciudad', 'Trinidad')}, {datos.get('fecha', '____/____/______')}.", e['clausula_titulo']
+        ))
+        story.append(Spacer(1, 25))
+
+        story.append(Paragraph(f"""
+        __________________________<br/>
+        <b>{datos.get('empresa_representante', VACIO)}</b><br/>
+        <i>{datos.get('empresa_nombre', VACIO)}</i><br/><br/><br/>
+
+        __________________________<br/>
+        <b>{datos.get('cliente_nombre', VACIO)}</b><br/>
+        <i>PROPIETARIO/A</i><br/><br/><br/>
+
+        __________________________<br/>
+        <b>{datos.get('agente_nombre', VACIO)}</b><br/>
+        <i>AGENTE ASOCIADO</i>
+        """, e['firma']))
+
+        story.append(Spacer(1, 20))
+        story.append(Paragraph(f"""
+        {datos.get('direccion_oficina', VACIO)}<br/>
+        {datos.get('telefono_oficina', VACIO)}<br/>
+        {datos.get('email_oficina', VACIO)}<br/>
+        <i>Cada oficina es de propiedad y operación independiente</i>
+        """, e['footer']))
+        return story
+
+
+class DocumentoAlquiler(Documento):
+    plantilla = "usuario/contratoPDF/contrato_alquiler.txt"
+    margenes = {'rightMargin': 40, 'leftMargin': 40, 'topMargin': 50, 'bottomMargin': 40}
+
+    def crear_estilos(self, hoja):
+        return {
+            'normal': ParagraphStyle("Normal", fontSize=11, leading=18, alignment=TA_JUSTIFY),
+            'clausula': ParagraphStyle(
+                "Clausula", fontSize=11, leading=18, alignment=TA_JUSTIFY, spaceBefore=10, spaceAfter=5,
+            ),
+            'titulo': ParagraphStyle("Titulo", fontSize=14, alignment=TA_CENTER, spaceAfter=15, leading=20),
+        }
+
+    def historia(self, texto, datos):
+        e = self.estilos
+        story = [Paragraph("<b>CONTRATO DE ALQUILER</b>", e['titulo']), Spacer(1, 10)]
+
+        for bloque in texto.split("\n\n"):
+            lineas = bloque.strip().split("\n")
+            if not lineas or lineas == [""]:
+                story.append(Spacer(1, 8))
+                continue
+
+            if _es_clausula(lineas[0]):
+                story.append(Paragraph(f"<b>{lineas[0]}</b>", e['clausula']))
+                for linea in lineas[1:]:
+                    story.append(Paragraph(linea, e['normal']))
+            else:
+                story.append(Paragraph("<br/>".join(lineas), e['normal']))
+
+            story.append(Spacer(1, 12))
+        return story
+
+
+class DocumentoAgente(Documento):
+    """Contrato de vinculación entre la inmobiliaria y el agente."""
+    plantilla = "usuario/contratoPDF/contrato_agente.txt"
+    margenes = {'rightMargin': 50, 'leftMargin': 50, 'topMargin': 50, 'bottomMargin': 50}
+
+    def crear_estilos(self, hoja):
+        return {
+            'titulo': ParagraphStyle(
+                'Titulo', fontSize=18, leading=22, alignment=TA_CENTER, spaceAfter=20, textColor=colors.darkblue,
+            ),
+            'clausula': ParagraphStyle('Clausula', fontSize=12, leading=18, alignment=TA_JUSTIFY),
+            'firma': ParagraphStyle('Firma', fontSize=12, leading=6, alignment=TA_CENTER),
+        }
+
+    def historia(self, texto, datos):
+        e = self.estilos
+        story = [Paragraph("CONTRATO DE VINCULACIÓN INMOBILIARIA", e['titulo']), Spacer(1, 10)]
+
+        parrafos = texto.strip().split("\n\n")
+        # El último párrafo es la aceptación de las partes
+        aceptacion, clausulas = parrafos[-1], parrafos[:-1]
+
+        for i, p in enumerate(clausulas):
+            story.append(Paragraph(p.strip(), e['clausula']))
+            if i != len(clausulas) - 1:
+                story.append(Spacer(1, 6))
+                story.append(HRFlowable(width="100%", thickness=0.5, color=colors.grey))
+                story.append(Spacer(1, 6))
+
+        story.append(Spacer(1, 6))
+        story.append(Paragraph(aceptacion.strip(), e['clausula']))
+        story.append(Paragraph(f"""__________________________  <br/><br/><br/>
+        INMOBILIARIA ({datos.get('inmobiliaria_nombre','________')})<br/><br/>
+        __________________________  <br/><br/><br/>
+        AGENTE INMOBILIARIO ({datos.get('agente_nombre','________')})
+        """, e['firma']))
+        return story
+
+
+class DocumentoTexto(Documento):
+    """Texto plano de la plantilla, sin diseño (backend fpdf)."""
+    backend = 'fpdf'
+    margenes = {'izquierda': 20, 'derecha': 20, 'arriba': 20}
+    fuente = "Arial"
+    tamano = 11
+
+    def __init__(self, plantilla):
+        self.plantilla = plantilla
+
+
+# ============================================
+# Backends
+# ============================================
+
+def _backend_reportlab(documento, texto, datos):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=LETTER, **documento.margenes)
+    doc.build(documento.historia(texto, datos))
+    return buffer.getvalue()
+
+
+def _backend_fpdf(documento, texto, datos):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font(documento.fuente, size=documento.tamano)
+    pdf.set_left_margin(documento.margenes['izquierda'])
+    pdf.set_right_margin(documento.margenes['derecha'])
+    pdf.set_top_margin(documento.margenes['arriba'])
+    # Las fuentes base de fpdf solo soportan latin-1
+    pdf.multi_cell(0, 5, texto.encode("latin-1", "replace").decode("latin-1"))
+    return pdf.output(dest="S").encode("latin-1")
+
+
+BACKENDS = {
+    'reportlab': _backend_reportlab,
+    'fpdf': _backend_fpdf,
+}
+
+
+def registrar_backend(nombre, funcion):
+    """`funcion(documento, texto, datos)` debe retornar los bytes del archivo."""
+    BACKENDS[nombre] = funcion
+
+
+DOCUMENTOS = {
+    'anticretico': DocumentoTexto("contrato/templates/plantilla_anticretico.txt"),
+    'servicios_anticretico': DocumentoServicios(
+        "usuario/contratoServicioAnticreticoPDF/contrato_servicios_anticretico.txt"
+    ),
+    'servicios_inmobiliarios': DocumentoServicios("usuario/contratoPDF/contrato_servicios_inmobiliarios.txt"),
+    'alquiler': DocumentoAlquiler(),
+    'agente': DocumentoAgente(),
+}
+
+
+def renderizar(tipo, contexto, datos=None):
+    """Bytes del PDF del contrato `tipo` con la plantilla llenada con `contexto`."""
+    documento = DOCUMENTOS[tipo]
+    texto = obtener_plantilla(documento.plantilla).llenar(contexto)
+    return BACKENDS[documento.backend](documento, texto, datos or {})
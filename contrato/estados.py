@@ -0,0 +1,95 @@
+# contrato/estados.py
+"""
+Ciclo de vida de un contrato (Contrato.estado).
+
+    pendiente ──► activo ──► finalizado
+        │           │
+        └──────────►┴──────► cancelado
+
+- `transicionar(contrato, destino)`: cambio manual (aprobar, finalizar...);
+  valida que la transición esté permitida y guarda con save(), así que
+  corren las señales post_save de siempre (alertas, PDFs).
+- `vencer_contratos()`: pasa a 'finalizado' los contratos activos cuya
+  fecha_fin ya pasó. Lo corre `manage.py vencer_contratos` por cron; mueve
+  los contratos en lotes (SELECT ... FOR UPDATE y un solo UPDATE por lote).
+
+Cada cambio (manual o por lote) emite la señal `transicion` al confirmar la
+transacción, con los IDs de los contratos que cambiaron. Los receptores que
+mantienen cachés (contrato/signals.py, reportes/signals.py) la escuchan,
+porque un UPDATE por lote no dispara post_save.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Contrato
+
+
+LOTE = getattr(settings, 'CONTRATOS_VENCIMIENTO_LOTE', 500)
+
+TRANSICIONES = {
+    'pendiente': {'activo', 'cancelado'},
+    'activo': {'finalizado', 'cancelado'},
+    'finalizado': set(),
+    'cancelado': set(),
+}
+
+# Argumentos: origen, destino, ids (lista de IDs de Contrato), motivo
+transicion = Signal()
+
+
+class TransicionInvalida(ValueError):
+    pass
+
+
+def puede(origen, destino):
+    return destino in TRANSICIONES.get(origen, set())
+
+
+def _emitir(origen, destino, ids, motivo):
+    transaction.on_commit(lambda: transicion.send(
+        sender=Contrato, origen=origen, destino=destino, ids=ids, motivo=motivo,
+    ))
+
+
+def transicionar(contrato, destino, motivo='manual', campos=()):
+    """
+    Cambia el estado del contrato; TransicionInvalida si no está permitido.
+    `campos`: otros campos ya asignados en `contrato` que se guardan con el
+    cambio (p. ej. fecha_inicio al activarse por pago).
+    """
+    origen = contrato.estado
+    if not puede(origen, destino):
+        raise TransicionInvalida(
+            f"No se puede pasar un contrato de '{origen}' a '{destino}'."
+        )
+    contrato.estado = destino
+    contrato.save(update_fields=['estado', 'fecha_actualizacion', *campos])
+    _emitir(origen, destino, [contrato.pk], motivo)
+    return contrato
+
+
+def vencidos(hoy=None):
+    """Contratos activos cuya fecha_fin ya pasó (usa el índice parcial de activos)."""
+    hoy = hoy or timezone.localdate()
+    return Contrato.objects.filter(estado='activo', fecha_fin__lt=hoy)
+
+
+def vencer_contratos(hoy=None, lote=LOTE):
+    """Finaliza los contratos vencidos en lotes de `lote`; devuelve cuántos cambió."""
+    total = 0
+    while True:
+        with transaction.atomic():
+            # Bloqueados hasta el commit: nadie los cambia entre el SELECT y el
+            # UPDATE, así la señal lleva exactamente los que se finalizaron
+            ids = list(
+                vencidos(hoy).select_for_update().order_by('id').values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                return total
+            cambiados = Contrato.objects.filter(id__in=ids, estado='activo').update(
+                estado='finalizado', fecha_actualizacion=timezone.now(),
+            )
+            _emitir('activo', 'finalizado', ids, 'vencimiento')
+        total += cambiados
@@ -0,0 +1,301 @@
+# contrato/importacion.py
+"""
+Alta masiva de contratos (migraciones desde planillas).
+
+`crear_contratos(registros)` recibe dicts con los campos de Contrato
+(agente_id, inmueble_id, tipo_contrato, fecha_contrato, partes, montos...)
+y los crea con bulk_create en una transacción, junto con las cuentas de
+cliente que falten (contrato/clientes.py: vincular_clientes).
+
+`importar(archivo, nombre)` procesa una planilla CSV o XLSX (primera fila =
+nombres de columna, ver COLUMNAS):
+
+- lee fila por fila (csv.DictReader / openpyxl en modo read_only), sin
+  cargar el archivo entero;
+- valida de a CONTRATOS_IMPORTACION_LOTE filas; agentes (usuarios del
+  grupo Agente) e inmuebles se buscan con un in_bulk por lote y quedan en
+  diccionarios para los siguientes;
+- crea cada lote con `crear_contratos` (una transacción por lote). Si el
+  lote falla en la base, se reintenta fila por fila para saber cuál falló;
+- los errores se informan por número de fila y no detienen el resto;
+- los contratos creados quedan marcados con pdf_pendiente; sus PDFs los
+  genera después `manage.py generar_pdfs_pendientes` (contrato/lotes.py),
+  fuera del proceso web. La marca está en la base, así que no se pierde si
+  el proceso se reinicia.
+
+bulk_create no llama a save() ni dispara post_save: la comisión se calcula
+con Contrato.calcular_comision() y las cachés (dashboard de comisiones,
+reportes) se invalidan al confirmar. Las alertas automáticas de post_save no
+se generan; las diarias (cron) sí los incluyen.
+"""
+import csv
+import io
+import os
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from inmueble.models import InmuebleModel
+from usuario.models import Usuario
+
+from .models import Contrato
+from . import clientes, comisiones
+
+
+LOTE = getattr(settings, 'CONTRATOS_IMPORTACION_LOTE', 200)
+LOTE_BD = getattr(settings, 'CONTRATOS_IMPORTACION_LOTE_BD', 500)
+
+
+def _invalidar_caches():
+    comisiones.invalidar()
+    # Import local: reportes importa contrato al cargar sus señales
+    from reportes import planes
+    planes.invalidar_modelo(Contrato._meta.label)
+
+
+def crear_contratos(registros, creado_por=None, grupo_cliente='cliente', pdf_pendiente=False):
+    """
+    Crea los contratos de `registros` (lista de dicts); devuelve los creados.
+    Con grupo_cliente=None no se vinculan ni crean cuentas de cliente; con
+    pdf_pendiente=True quedan en la cola de `manage.py generar_pdfs_pendientes`.
+    """
+    registros = list(registros)
+    if not registros:
+        return []
+
+    with transaction.atomic():
+        vinculados = clientes.vincular_clientes(
+            ((r.get('parte_contratada_nombre'), r.get('parte_contratada_ci'), r.get('parte_contratada_domicilio'))
+             for r in registros),
+            grupo_nombre=grupo_cliente,
+        ) if grupo_cliente else {}
+
+        contratos = []
+        for registro in registros:
+            contrato = Contrato(**registro)
+            if contrato.id_cliente_id is None and contrato.parte_contratada_ci:
+                contrato.id_cliente = vinculados.get(contrato.parte_contratada_ci)
+            if creado_por is not None and contrato.creado_por_id is None:
+                contrato.creado_por = creado_por
+            contrato.calcular_comision()
+            contrato.pdf_pendiente = pdf_pendiente
+            contratos.append(contrato)
+
+        creados = Contrato.objects.bulk_create(contratos, batch_size=LOTE_BD)
+        transaction.on_commit(_invalidar_caches)
+    return creados
+
+
+# ============================================
+# Planillas CSV / XLSX
+# ============================================
+
+OBLIGATORIAS = (
+    'agente_id', 'inmueble_id', 'tipo_contrato', 'ciudad', 'fecha_contrato',
+    'parte_contratante_nombre', 'parte_contratante_ci', 'parte_contratada_nombre',
+)
+TEXTOS = (
+    'ciudad', 'parte_contratante_nombre', 'parte_contratante_ci', 'parte_contratante_domicilio',
+    'parte_contratada_nombre', 'parte_contratada_ci', 'parte_contratada_domicilio',
+)
+FECHAS = ('fecha_contrato', 'fecha_inicio', 'fecha_fin')
+DECIMALES = ('monto', 'comision_porcentaje', 'comision_monto')
+ENTEROS = ('vigencia_meses', 'vigencia_dias')
+COLUMNAS = OBLIGATORIAS + tuple(
+    c for c in TEXTOS + FECHAS + DECIMALES + ENTEROS + ('estado',) if c not in OBLIGATORIAS
+)
+
+TIPOS = dict(Contrato.TIPO_CONTRATO_CHOICES)
+ESTADOS = dict(Contrato.ESTADO_CHOICES)
+
+
+class ErrorFila(ValueError):
+    pass
+
+
+def _vacio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _texto(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)  # CI numérico en Excel: 1234567.0
+    return str(valor).strip()
+
+
+def _fecha(columna, valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(valor)
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ErrorFila(f"{columna}: fecha inválida '{texto}' (YYYY-MM-DD o DD/MM/YYYY)")
+
+
+# Rango de BigIntegerField / BigAutoField
+MAXIMO_ENTERO = 2 ** 63 - 1
+
+
+def _decimal(columna, valor):
+    try:
+        numero = Decimal(_texto(valor).replace(',', '.'))
+    except InvalidOperation:
+        raise ErrorFila(f"{columna}: número inválido '{valor}'")
+    if not numero.is_finite():
+        raise ErrorFila(f"{columna}: número inválido '{valor}'")
+    return numero
+
+
+def _entero(columna, valor):
+    # 'inf' da OverflowError, '1e999' no entra en la columna y '1.5' no es
+    # entero: error de la fila, no un 500 que corta la importación
+    try:
+        numero = Decimal(_texto(valor))
+        if numero != numero.to_integral_value() or abs(numero) > MAXIMO_ENTERO:
+            raise ValueError
+        return int(numero)
+    except (InvalidOperation, ValueError, OverflowError):
+        raise ErrorFila(f"{columna}: entero inválido '{valor}'")
+
+
+def leer_filas(archivo, nombre):
+    """(número de fila en la planilla, {columna: valor}) de un CSV o XLSX abierto en binario."""
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension == '.xlsx':
+        from openpyxl import load_workbook
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            encabezados = [_texto(c).lower() if c is not None else '' for c in next(filas, ())]
+            for numero, valores in enumerate(filas, start=2):
+                if all(_vacio(v) for v in valores):
+                    continue
+                yield numero, dict(zip(encabezados, valores))
+        finally:
+            libro.close()
+    elif extension == '.csv':
+        texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+        lector = csv.DictReader(texto)
+        lector.fieldnames = [c.strip().lower() for c in lector.fieldnames or []]
+        for numero, fila in enumerate(lector, start=2):
+            if all(_vacio(v) for v in fila.values()):
+                continue
+            yield numero, fila
+    else:
+        raise ValueError('Formato no soportado: use .csv o .xlsx')
+
+
+def validar(fila, agentes, inmuebles):
+    """Registro para Contrato a partir de una fila; ErrorFila si algo no es válido."""
+    faltan = [c for c in OBLIGATORIAS if _vacio(fila.get(c))]
+    if faltan:
+        raise ErrorFila(f"Faltan columnas obligatorias: {', '.join(faltan)}")
+
+    registro = {}
+    for columna in COLUMNAS:
+        valor = fila.get(columna)
+        if _vacio(valor):
+            continue
+        if columna in FECHAS:
+            registro[columna] = _fecha(columna, valor)
+        elif columna in DECIMALES:
+            registro[columna] = _decimal(columna, valor)
+        elif columna in ENTEROS or columna in ('agente_id', 'inmueble_id'):
+            registro[columna] = _entero(columna, valor)
+        else:
+            registro[columna] = _texto(valor)
+
+    if registro['tipo_contrato'] not in TIPOS:
+        raise ErrorFila(f"tipo_contrato inválido '{registro['tipo_contrato']}' ({', '.join(TIPOS)})")
+    if registro.get('estado', 'activo') not in ESTADOS:
+        raise ErrorFila(f"estado inválido '{registro['estado']}' ({', '.join(ESTADOS)})")
+    if registro['agente_id'] not in agentes:
+        raise ErrorFila(f"Agente con id={registro['agente_id']} no encontrado o no es agente")
+    if registro['inmueble_id'] not in inmuebles:
+        raise ErrorFila(f"Inmueble con id={registro['inmueble_id']} no encontrado")
+
+    # Como en las vistas: fin = inicio + vigencia
+    if 'fecha_fin' not in registro and registro.get('vigencia_meses'):
+        inicio = registro.setdefault('fecha_inicio', registro['fecha_contrato'])
+        try:
+            registro['fecha_fin'] = inicio + relativedelta(months=registro['vigencia_meses'])
+        except (OverflowError, ValueError):
+            raise ErrorFila(f"vigencia_meses fuera de rango '{registro['vigencia_meses']}'")
+    return registro
+
+
+def _ids(filas, columna):
+    ids = set()
+    for _, fila in filas:
+        try:
+            ids.add(_entero(columna, fila.get(columna)))
+        except ErrorFila:
+            continue
+    return ids
+
+
+def _crear_lote(validas, creado_por, errores, pdf_pendiente):
+    """Crea las filas válidas del lote; si la base rechaza el lote, una por una."""
+    try:
+        return [c.id for c in crear_contratos(
+            [r for _, r in validas], creado_por=creado_por, pdf_pendiente=pdf_pendiente,
+        )]
+    except DatabaseError:
+        ids = []
+        for numero, registro in validas:
+            try:
+                ids += [c.id for c in crear_contratos([registro], creado_por=creado_por, pdf_pendiente=pdf_pendiente)]
+            except DatabaseError as e:
+                errores.append({'fila': numero, 'error': f'Error al guardar: {e}'})
+        return ids
+
+
+def importar(archivo, nombre, creado_por=None, tamano=LOTE, generar_pdfs=True):
+    """
+    Importa la planilla. Devuelve {'creados': n, 'ids': [...], 'errores':
+    [{'fila': n, 'error': '...'}]}. Un error en una fila no detiene las demás.
+    Con generar_pdfs los contratos creados quedan marcados con pdf_pendiente.
+    """
+    agentes, inmuebles = {}, {}
+    resultado = {'creados': 0, 'ids': [], 'errores': []}
+
+    def procesar(bloque):
+        # Solo los que todavía no están en los diccionarios
+        faltan = _ids(bloque, 'agente_id') - agentes.keys()
+        if faltan:
+            agentes.update(Usuario.objects.filter(grupo__nombre='Agente').in_bulk(faltan))
+        faltan = _ids(bloque, 'inmueble_id') - inmuebles.keys()
+        if faltan:
+            inmuebles.update(InmuebleModel.objects.in_bulk(faltan))
+
+        validas = []
+        for numero, fila in bloque:
+            try:
+                validas.append((numero, validar(fila, agentes, inmuebles)))
+            except ErrorFila as e:
+                resultado['errores'].append({'fila': numero, 'error': str(e)})
+        if not validas:
+            return
+        ids = _crear_lote(validas, creado_por, resultado['errores'], generar_pdfs)
+        resultado['creados'] += len(ids)
+        resultado['ids'] += ids
+
+    bloque = []
+    for numero, fila in leer_filas(archivo, nombre):
+        bloque.append((numero, fila))
+        if len(bloque) >= tamano:
+            procesar(bloque)
+            bloque = []
+    if bloque:
+        procesar(bloque)
+
+    resultado['errores'].sort(key=lambda e: e['fila'])
+    return resultado
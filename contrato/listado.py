@@ -0,0 +1,150 @@
+# contrato/listado.py
+"""
+Listado de contratos (contrato/views.py: listar_contratos).
+
+- Se leen solo las columnas del listado con `.values()` (sin
+  detalles_adicionales ni los domicilios) y el inmueble/agente por JOIN;
+  no se crean instancias del modelo.
+- Orden (fecha_contrato, id) descendente, paginado por keyset: el cursor
+  guarda la última (fecha, id) entregada (firmado, ver utils/cursores.py)
+  y la página siguiente sigue desde ahí con WHERE, sin OFFSET. Usa los
+  índices de Contrato.Meta.
+- `json_en_bloques()` arma el JSON completo por partes para exportar todo
+  sin cargarlo en memoria (la vista lo envía con utils/flujos.py, que bajo
+  ASGI evita que Django junte todas las partes antes de responder).
+"""
+import json
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.utils.encoders import JSONEncoder
+
+from utils import cursores
+
+from .models import Contrato
+
+
+LIMITE = getattr(settings, 'CONTRATOS_LISTADO_LIMITE', 100)
+LIMITE_MAX = getattr(settings, 'CONTRATOS_LISTADO_LIMITE_MAX', 500)
+SALT_CURSOR = 'contrato.listado.cursor'
+
+CAMPOS = (
+    'id', 'tipo_contrato', 'estado', 'ciudad', 'fecha_contrato', 'fecha_inicio', 'fecha_fin',
+    'vigencia_meses', 'monto', 'comision_porcentaje', 'comision_monto',
+    'inmueble_id', 'inmueble__titulo', 'inmueble__direccion', 'inmueble__zona', 'inmueble__ciudad',
+    'agente_id', 'agente__nombre',
+    'parte_contratante_nombre', 'parte_contratante_ci', 'parte_contratada_nombre', 'parte_contratada_ci',
+    'archivo_pdf', 'fecha_creacion',
+)
+TIPOS = dict(Contrato.TIPO_CONTRATO_CHOICES)
+
+
+def filtrar(tipo=None, estado=None):
+    contratos = Contrato.objects.all()
+    if tipo:
+        contratos = contratos.filter(tipo_contrato=tipo)
+    if estado:
+        contratos = contratos.filter(estado=estado)
+    return contratos.order_by('-fecha_contrato', '-id')
+
+
+def filas(contratos):
+    return contratos.values(*CAMPOS)
+
+
+def formatear(fila):
+    """Fila de `.values(*CAMPOS)` con el formato de la respuesta."""
+    return {
+        "id": fila["id"],
+        "tipo_contrato": TIPOS.get(fila["tipo_contrato"], fila["tipo_contrato"]),
+        "estado": fila["estado"],
+        "ciudad": fila["ciudad"],
+        "fecha_contrato": fila["fecha_contrato"],
+        "fecha_inicio": fila["fecha_inicio"],
+        "fecha_fin": fila["fecha_fin"],
+        "vigencia_meses": fila["vigencia_meses"],
+        "monto": float(fila["monto"] or 0),
+        "comision_porcentaje": float(fila["comision_porcentaje"] or 0),
+        "comision_monto": float(fila["comision_monto"] or 0),
+        "inmueble": {
+            "id": fila["inmueble_id"],
+            "titulo": fila["inmueble__titulo"],
+            "direccion": fila["inmueble__direccion"],
+            "zona": fila["inmueble__zona"],
+            "ciudad": fila["inmueble__ciudad"],
+        },
+        "agente": {
+            "id": fila["agente_id"],
+            "nombre": fila["agente__nombre"],
+        },
+        "propietario": {
+            "nombre": fila["parte_contratante_nombre"],
+            "ci": fila["parte_contratante_ci"],
+        },
+        "inquilino": {
+            "nombre": fila["parte_contratada_nombre"],
+            "ci": fila["parte_contratada_ci"],
+        },
+        "pdf_url": f"/media/{fila['archivo_pdf']}" if fila["archivo_pdf"] else None,
+        "fecha_creacion": fila["fecha_creacion"],
+    }
+
+
+# ============================================
+# Paginación por keyset
+# ============================================
+
+def crear_cursor(fila):
+    """Cursor firmado (utils/cursores.py) con la (fecha_contrato, id) de `fila`."""
+    return cursores.crear({"f": fila["fecha_contrato"].isoformat(), "i": fila["id"]}, SALT_CURSOR)
+
+
+def leer_cursor(cursor):
+    """(fecha_contrato, id) de la última fila entregada; ValueError si no es válido."""
+    datos = cursores.leer(cursor, SALT_CURSOR)
+    try:
+        return date.fromisoformat(datos["f"]), int(datos["i"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Cursor inválido: {e}")
+
+
+def limite(valor):
+    if not valor:
+        return LIMITE
+    return max(1, min(int(valor), LIMITE_MAX))
+
+
+def pagina(contratos, cursor=None, cantidad=LIMITE):
+    """(contratos formateados, cursor de la página siguiente o None)."""
+    if cursor:
+        fecha, ultimo_id = leer_cursor(cursor)
+        contratos = contratos.filter(
+            Q(fecha_contrato__lt=fecha) | Q(fecha_contrato=fecha, id__lt=ultimo_id)
+        )
+    # Una fila de más para saber si hay página siguiente
+    resultado = list(filas(contratos)[:cantidad + 1])
+    siguiente = crear_cursor(resultado[cantidad - 1]) if len(resultado) > cantidad else None
+    return [formatear(fila) for fila in resultado[:cantidad]], siguiente
+
+
+# ============================================
+# Exportación completa
+# ============================================
+
+def json_en_bloques(contratos, message, tamano=500):
+    """El JSON de la respuesta del listado completo, de a `tamano` contratos por bloque."""
+    encoder = JSONEncoder(ensure_ascii=False)
+    yield json.dumps({"status": 1, "error": 0, "message": message}, ensure_ascii=False)[:-1]
+    yield ', "values": {"contratos": ['
+    bloque = []
+    primero = True
+    for fila in filas(contratos).iterator(chunk_size=tamano):
+        bloque.append(encoder.encode(formatear(fila)))
+        if len(bloque) >= tamano:
+            yield ("" if primero else ",") + ",".join(bloque)
+            primero = False
+            bloque = []
+    if bloque:
+        yield ("" if primero else ",") + ",".join(bloque)
+    yield "]}}"
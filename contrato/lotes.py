@@ -0,0 +1,223 @@
+# contrato/lotes.py
+"""
+Exportación de muchos contratos en un ZIP (auditorías).
+
+- `filtrar_contratos()` aplica los filtros (tipo, estado, rango de
+  fecha_contrato, agente).
+- `archivos_pdf()` entrega (nombre, ruta) de cada PDF a medida que está
+  listo, recorriendo la consulta una vez: los que ya existen (archivo_pdf
+  guardado o almacén por contenido de contrato/pdfs.py) salen enseguida y
+  los que faltan se van mandando a un pool de procesos (un render por
+  núcleo, con pocos pedidos en curso a la vez). Los procesos se crean con
+  'forkserver', no con fork: el pool puede abrirse desde un hilo del
+  servidor ASGI y hacer fork de un proceso con varios hilos no es seguro.
+  Pools abiertos a la vez hay como mucho CONTRATOS_LOTE_POOLS (turnos en la
+  caché); un pedido sin turno genera sus PDFs de a uno, sin pool.
+- `generar_pendientes()` genera los PDFs de los contratos importados
+  (marcados con pdf_pendiente); lo corre `manage.py generar_pdfs_pendientes`
+  fuera del proceso web.
+- `zip_en_flujo()` arma el ZIP sobre la marcha: cada archivo se comprime y
+  se entrega en bloques apenas termina, sin tener el ZIP completo en memoria
+  ni en disco. Los contratos que no se pudieron generar se listan en
+  errores.txt dentro del mismo ZIP. Bajo ASGI la vista lo envuelve en
+  utils/flujos.py (flujo_asincrono); si no, Django juntaría todo el ZIP
+  antes de enviarlo.
+"""
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Contrato
+from . import pdfs
+
+
+PROCESOS = getattr(settings, 'CONTRATOS_LOTE_PROCESOS', None) or os.cpu_count() or 1
+POOLS = getattr(settings, 'CONTRATOS_LOTE_POOLS', 1)
+# Vencimiento del turno si el proceso muere sin liberarlo; se renueva con cada PDF
+TURNO_TTL = 300
+PENDIENTES_LOTE = getattr(settings, 'CONTRATOS_PDF_PENDIENTES_LOTE', 100)
+BLOQUE = 64 * 1024
+
+
+def filtrar_contratos(tipo=None, estado=None, desde=None, hasta=None, agente_id=None):
+    contratos = Contrato.objects.select_related('inmueble', 'agente')
+    if tipo:
+        contratos = contratos.filter(tipo_contrato=tipo)
+    if estado:
+        contratos = contratos.filter(estado=estado)
+    if desde:
+        contratos = contratos.filter(fecha_contrato__gte=desde)
+    if hasta:
+        contratos = contratos.filter(fecha_contrato__lte=hasta)
+    if agente_id:
+        contratos = contratos.filter(agente_id=agente_id)
+    return contratos.order_by('id')
+
+
+def _nombre(contrato):
+    return f'contrato_{contrato.tipo_contrato}_{contrato.id}.pdf'
+
+
+def _tomar_turno():
+    """
+    Clave de caché de un turno libre para abrir un pool, o None si ya hay
+    CONTRATOS_LOTE_POOLS pools trabajando. Con la caché compartida
+    (REDIS_URL) el límite vale para todos los procesos del servidor.
+    """
+    for i in range(POOLS):
+        clave = f'contratos_lote_pool_{i}'
+        if cache.add(clave, 1, timeout=TURNO_TTL):
+            return clave
+    return None
+
+
+def _generar_aqui(contrato, contexto, ruta, errores):
+    """Render en el mismo proceso: (nombre, ruta) o None si falló."""
+    try:
+        pdfs.generar(contrato.tipo_contrato, contexto, ruta)
+    except Exception as e:
+        errores.append((contrato.id, f'error al generar: {e}'))
+        return None
+    return _nombre(contrato), ruta
+
+
+def _recoger(en_curso, errores, turno):
+    """Espera a que el pool termine al menos un PDF y entrega los que están listos."""
+    listos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+    cache.touch(turno, TURNO_TTL)
+    for futuro in listos:
+        contrato = en_curso.pop(futuro)
+        try:
+            ruta = futuro.result()
+        except Exception as e:
+            errores.append((contrato.id, f'error al generar: {e}'))
+            continue
+        yield _nombre(contrato), ruta
+
+
+def archivos_pdf(contratos, procesos=PROCESOS, errores=None):
+    """
+    Genera (nombre en el ZIP, ruta absoluta) por contrato. Los contratos sin
+    PDF posible se agregan a `errores` como (contrato_id, motivo).
+    """
+    errores = errores if errores is not None else []
+    pool = turno = None
+    paralelo = procesos > 1
+    en_curso = {}  # futuro -> contrato; a lo sumo 2 por proceso
+
+    try:
+        for contrato in contratos.iterator(chunk_size=500):
+            if contrato.archivo_pdf:
+                ruta = os.path.join(settings.MEDIA_ROOT, contrato.archivo_pdf.name)
+                if os.path.exists(ruta):
+                    yield _nombre(contrato), ruta
+                    continue
+            if contrato.tipo_contrato not in pdfs.CONTEXTOS:
+                errores.append((contrato.id, 'sin PDF guardado y su tipo no se puede generar con los datos guardados'))
+                continue
+            try:
+                contexto, relativa = pdfs.ubicar(contrato, contrato.tipo_contrato)
+            except (TypeError, ValueError, AttributeError) as e:
+                errores.append((contrato.id, f'datos incompletos: {e}'))
+                continue
+            ruta = os.path.join(settings.MEDIA_ROOT, relativa)
+            if os.path.exists(ruta):
+                yield _nombre(contrato), ruta
+                continue
+
+            if paralelo and pool is None:
+                # El pool se abre con el primer PDF que falta y solo si hay turno;
+                # si no, este pedido genera en su propio proceso, de a uno
+                turno = _tomar_turno()
+                paralelo = turno is not None
+                if paralelo:
+                    pool = ProcessPoolExecutor(
+                        max_workers=procesos,
+                        mp_context=multiprocessing.get_context('forkserver'),
+                        # El hijo arranca sin Django configurado. django.setup directo y no una
+                        # función de este módulo: importarlo carga los modelos antes del setup
+                        initializer=django.setup,
+                    )
+            if pool is None:
+                listo = _generar_aqui(contrato, contexto, ruta, errores)
+                if listo:
+                    yield listo
+                continue
+
+            en_curso[pool.submit(pdfs.generar, contrato.tipo_contrato, contexto, ruta)] = contrato
+            if len(en_curso) >= 2 * procesos:
+                yield from _recoger(en_curso, errores, turno)
+
+        # En el orden en que terminan, no en el de la consulta
+        while en_curso:
+            yield from _recoger(en_curso, errores, turno)
+    finally:
+        if pool is not None:
+            # Si el cliente corta la descarga, no seguir generando los que faltan
+            pool.shutdown(wait=True, cancel_futures=True)
+        if turno is not None:
+            cache.delete(turno)
+
+
+def generar_pendientes(procesos=PROCESOS, lote=PENDIENTES_LOTE, errores=None):
+    """
+    Genera los PDFs de hasta `lote` contratos marcados con pdf_pendiente
+    (importaciones) y les quita la marca. Devuelve cuántos se revisaron
+    (0: no queda ninguno).
+    """
+    ids = list(
+        Contrato.objects.filter(pdf_pendiente=True).order_by('id').values_list('id', flat=True)[:lote]
+    )
+    if not ids:
+        return 0
+    for _ in archivos_pdf(filtrar_contratos().filter(id__in=ids), procesos=procesos, errores=errores):
+        pass
+    # También los que fallaron (quedan en `errores`): datos incompletos no se
+    # arreglan reintentando, y se generan al descargarlos si se corrigen.
+    # update() y no save(): sin las señales de post_save
+    Contrato.objects.filter(id__in=ids).update(pdf_pendiente=False)
+    return len(ids)
+
+
+class _Salida(io.RawIOBase):
+    """Destino sin seek para ZipFile: acumula lo escrito hasta que se retira."""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def retirar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def zip_en_flujo(archivos, errores=None):
+    """Bytes del ZIP con los archivos (nombre, ruta), entregados a medida que se escriben."""
+    salida = _Salida()
+    with zipfile.ZipFile(salida, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for nombre, ruta in archivos:
+            with open(ruta, 'rb') as origen, zf.open(nombre, mode='w') as destino:
+                for bloque in iter(lambda: origen.read(BLOQUE), b''):
+                    destino.write(bloque)
+                    datos = salida.retirar()
+                    if datos:
+                        yield datos
+            # Cierre de la entrada (resto comprimido y descriptor de datos)
+            yield salida.retirar()
+        if errores:
+            zf.writestr('errores.txt', '\n'.join(f'Contrato {i}: {motivo}' for i, motivo in errores))
+    # Directorio central del ZIP
+    yield salida.retirar()
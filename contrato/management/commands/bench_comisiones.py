@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from contrato import comisiones
+
+
+# Consultas que debe hacer el dashboard sin caché (tipo, agente, mes, top 5)
+CONSULTAS_ESPERADAS = 4
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el dashboard de comisiones: consultas SQL y tiempo sin caché y con caché. '
+        'Falla si sin caché hace más de las consultas agrupadas esperadas o si con caché '
+        'toca la base de datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha-inicio', help='YYYY-MM-DD')
+        parser.add_argument('--fecha-fin', help='YYYY-MM-DD')
+        parser.add_argument('--incluir-servicios', action='store_true')
+        parser.add_argument('--repeticiones', type=int, default=20)
+
+    def handle(self, *args, **options):
+        filtros = (options['fecha_inicio'], options['fecha_fin'], options['incluir_servicios'])
+
+        with CaptureQueriesContext(connection) as sin_cache:
+            inicio = time.perf_counter()
+            for _ in range(options['repeticiones']):
+                comisiones.calcular_dashboard(*filtros)
+            ms_sin_cache = (time.perf_counter() - inicio) * 1000 / options['repeticiones']
+
+        comisiones.invalidar()
+        comisiones.dashboard(*filtros)  # llena la caché
+        with CaptureQueriesContext(connection) as con_cache:
+            inicio = time.perf_counter()
+            for _ in range(options['repeticiones']):
+                comisiones.dashboard(*filtros)
+            ms_con_cache = (time.perf_counter() - inicio) * 1000 / options['repeticiones']
+
+        consultas = len(sin_cache) // options['repeticiones']
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Sin caché: {consultas} consultas, {ms_sin_cache:.1f} ms | "
+            f"con caché: {len(con_cache)} consultas, {ms_con_cache:.2f} ms"
+        ))
+        if consultas > CONSULTAS_ESPERADAS or len(con_cache):
+            raise CommandError(
+                f'Se esperaban {CONSULTAS_ESPERADAS} consultas sin caché y 0 con caché'
+            )
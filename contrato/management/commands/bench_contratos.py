@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from contrato import documentos
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark del motor de contratos: renders por segundo de cada tipo de contrato '
+        '(plantilla y estilos en caché), y opcionalmente sin caché (como antes: leer la '
+        'plantilla y crear los estilos en cada petición).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=50, help='Renders por tipo de contrato')
+        parser.add_argument('--tipos', nargs='+', choices=sorted(documentos.DOCUMENTOS),
+                            default=sorted(documentos.DOCUMENTOS), help='Tipos de contrato a medir')
+        parser.add_argument('--sin-cache', action='store_true',
+                            help='Medir también limpiando la caché de plantillas y estilos antes de cada render')
+
+    def handle(self, *args, **options):
+        for tipo in options['tipos']:
+            plantilla = documentos.obtener_plantilla(documentos.DOCUMENTOS[tipo].plantilla)
+            # Valores de ejemplo para todos los campos de la plantilla
+            contexto = {campo: f'{campo} de ejemplo' for campo in plantilla.campos}
+            documentos.renderizar(tipo, contexto, contexto)  # calentamiento
+
+            por_segundo, kb = self._medir(tipo, contexto, options['renders'], limpiar=False)
+            linea = f"✅ {tipo}: {por_segundo:.1f} renders/s ({kb:.1f} KB por PDF)"
+            if options['sin_cache']:
+                sin_cache, _ = self._medir(tipo, contexto, options['renders'], limpiar=True)
+                linea += f" | sin caché {sin_cache:.1f} renders/s"
+            self.stdout.write(self.style.SUCCESS(linea))
+
+    def _medir(self, tipo, contexto, renders, limpiar):
+        tiempo, tamano = 0.0, 0
+        for _ in range(renders):
+            if limpiar:
+                documentos.limpiar_cache()
+            inicio = time.perf_counter()
+            pdf = documentos.renderizar(tipo, contexto, contexto)
+            tiempo += time.perf_counter() - inicio
+            tamano = len(pdf)
+        return renders / tiempo, tamano / 1024
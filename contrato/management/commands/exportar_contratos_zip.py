@@ -0,0 +1,57 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from contrato import lotes
+
+
+def _fecha(valor):
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta a un ZIP los PDFs de los contratos que cumplen los filtros. Los que '
+        'faltan se generan en paralelo (uno por núcleo) y quedan guardados para la próxima vez.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', help='tipo_contrato (anticretico, alquiler, ...)')
+        parser.add_argument('--estado', help='Estado del contrato')
+        parser.add_argument('--desde', type=_fecha, help='fecha_contrato desde (YYYY-MM-DD)')
+        parser.add_argument('--hasta', type=_fecha, help='fecha_contrato hasta (YYYY-MM-DD)')
+        parser.add_argument('--agente', type=int, help='ID del agente')
+        parser.add_argument('--procesos', type=int, default=lotes.PROCESOS,
+                            help='Procesos para generar los PDFs que faltan')
+        parser.add_argument('--salida', default='contratos.zip', help='Archivo ZIP de salida')
+
+    def handle(self, *args, **options):
+        contratos = lotes.filtrar_contratos(
+            tipo=options['tipo'],
+            estado=options['estado'],
+            desde=options['desde'],
+            hasta=options['hasta'],
+            agente_id=options['agente'],
+        )
+        errores = []
+        archivos = 0
+
+        def contar(pares):
+            nonlocal archivos
+            for par in pares:
+                archivos += 1
+                yield par
+
+        inicio = time.perf_counter()
+        with open(options['salida'], 'wb') as f:
+            pares = contar(lotes.archivos_pdf(contratos, procesos=options['procesos'], errores=errores))
+            for bloque in lotes.zip_en_flujo(pares, errores):
+                f.write(bloque)
+        segundos = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {archivos} contratos en {options['salida']} ({segundos:.1f} s)"
+        ))
+        if errores:
+            self.stdout.write(self.style.WARNING(f"⚠️ {len(errores)} sin PDF (ver errores.txt dentro del ZIP)"))
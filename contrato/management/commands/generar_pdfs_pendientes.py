@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from contrato import lotes
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera los PDFs de los contratos importados (marcados con pdf_pendiente) y les quita '
+        'la marca. Con --continuo queda corriendo como worker; sin él, pensado para cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help='No terminar: revisar la cola cada --intervalo')
+        parser.add_argument('--intervalo', type=float, default=10, help='Segundos entre revisiones con --continuo')
+        parser.add_argument('--lote', type=int, default=lotes.PENDIENTES_LOTE, help='Contratos por vuelta')
+        parser.add_argument('--procesos', type=int, default=lotes.PROCESOS,
+                            help='Procesos para generar los PDFs')
+
+    def handle(self, *args, **options):
+        while True:
+            errores = []
+            total = 0
+            while True:
+                revisados = lotes.generar_pendientes(
+                    procesos=options['procesos'], lote=options['lote'], errores=errores,
+                )
+                if not revisados:
+                    break
+                total += revisados
+
+            if total:
+                self.stdout.write(self.style.SUCCESS(f'✅ {total - len(errores)} PDFs de contratos generados'))
+            for contrato_id, motivo in errores:
+                self.stderr.write(f'❌ Contrato {contrato_id}: {motivo}')
+
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
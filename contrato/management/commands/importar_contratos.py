@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contrato import importacion, lotes
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa contratos desde una planilla CSV o XLSX (columnas en contrato/importacion.py). '
+        'Las filas con errores se listan al final y no impiden importar las demás.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del .csv o .xlsx')
+        parser.add_argument('--lote', type=int, default=importacion.LOTE, help='Filas por transacción')
+        parser.add_argument('--sin-pdfs', action='store_true', help='No generar los PDFs de los contratos creados')
+        parser.add_argument('--procesos', type=int, default=lotes.PROCESOS,
+                            help='Procesos para generar los PDFs')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importacion.importar(
+                    archivo, options['archivo'], tamano=options['lote'],
+                    generar_pdfs=not options['sin_pdfs'],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(f'❌ {e}')
+        segundos = time.perf_counter() - inicio
+
+        for error in resultado['errores']:
+            self.stderr.write(f"❌ Fila {error['fila']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {resultado['creados']} contratos importados en {segundos:.1f} s, "
+            f"{len(resultado['errores'])} filas con errores"
+        ))
+        if resultado['creados'] and not options['sin_pdfs']:
+            # Desde la consola se generan ahora (en el servidor, generar_pdfs_pendientes)
+            self.stdout.write('🖨️ Generando los PDFs...')
+            errores = []
+            while lotes.generar_pendientes(procesos=options['procesos'], errores=errores):
+                pass
+            for contrato_id, motivo in errores:
+                self.stderr.write(f'❌ Contrato {contrato_id}: {motivo}')
+            self.stdout.write(self.style.SUCCESS('✅ PDFs generados'))
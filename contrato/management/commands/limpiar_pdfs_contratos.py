@@ -0,0 +1,50 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from contrato import pdfs
+from contrato.models import Contrato
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra los PDF de contratos generados (CONTRATOS_PDF_DIR) que ya no corresponden '
+        'a ningún contrato: contratos borrados, datos modificados o plantillas cambiadas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gracia', type=int, default=60,
+                            help='No borrar archivos modificados hace menos de estos minutos')
+        parser.add_argument('--simular', action='store_true', help='Solo listar lo que se borraría')
+
+    def handle(self, *args, **options):
+        directorio = os.path.join(settings.MEDIA_ROOT, pdfs.PDF_DIR)
+        if not os.path.isdir(directorio):
+            self.stdout.write(self.style.SUCCESS('✅ No hay PDFs generados'))
+            return
+
+        contratos = Contrato.objects.select_related('inmueble', 'agente').iterator(chunk_size=500)
+        vigentes = pdfs.claves_vigentes(contratos)
+        limite = time.time() - options['gracia'] * 60
+
+        borrados = conservados = 0
+        for raiz, _, archivos in os.walk(directorio):
+            for nombre in archivos:
+                ruta = os.path.join(raiz, nombre)
+                clave, extension = os.path.splitext(nombre)
+                # Los .tmp son escrituras interrumpidas
+                if (extension == '.pdf' and clave in vigentes) or os.path.getmtime(ruta) > limite:
+                    conservados += 1
+                    continue
+                if options['simular']:
+                    self.stdout.write(f'ℹ️ {ruta}')
+                else:
+                    os.remove(ruta)
+                borrados += 1
+
+        accion = 'se borrarían' if options['simular'] else 'borrados'
+        self.stdout.write(self.style.SUCCESS(
+            f'🧹 {borrados} PDFs huérfanos {accion}, {conservados} conservados'
+        ))
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from contrato import estados
+
+
+class Command(BaseCommand):
+    help = (
+        "Pasa a 'finalizado' los contratos activos cuya fecha_fin ya pasó, en lotes "
+        "(un UPDATE por lote). Pensado para ejecutarse por cron (p. ej. una vez al día)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=estados.LOTE, help='Contratos por UPDATE')
+        parser.add_argument('--fecha', type=lambda v: datetime.strptime(v, '%Y-%m-%d').date(),
+                            help='Fecha de referencia (YYYY-MM-DD); por defecto hoy')
+        parser.add_argument('--simular', action='store_true', help='Solo contar, sin cambiar nada')
+
+    def handle(self, *args, **options):
+        if options['simular']:
+            cantidad = estados.vencidos(options['fecha']).count()
+            self.stdout.write(self.style.SUCCESS(f'🔎 {cantidad} contratos vencidos para finalizar'))
+            return
+        cantidad = estados.vencer_contratos(options['fecha'], lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {cantidad} contratos vencidos pasados a finalizado'))
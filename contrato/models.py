@@ -68,19 +68,39 @@ class Contrato(models.Model):
     # Metadata
     creado_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, related_name='contratos_creados')
     archivo_pdf = models.FileField(upload_to='contratos/', blank=True, null=True)
+    # Contratos importados cuyo PDF falta generar (manage.py generar_pdfs_pendientes)
+    pdf_pendiente = models.BooleanField(default=False)
     
     class Meta:
         db_table = 'contratos'
         verbose_name = 'Contrato'
         verbose_name_plural = 'Contratos'
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Listados y dashboards filtrados por estado/tipo y ordenados por fecha
+            models.Index(fields=['estado', 'tipo_contrato', 'fecha_contrato']),
+            # Paginación por (fecha_contrato, id) sin filtros
+            models.Index(fields=['fecha_contrato', 'id']),
+            # Contratos de un agente paginados por (fecha_contrato, id)
+            models.Index(fields=['agente', 'estado', 'fecha_contrato', 'id']),
+            # Solo los activos (los que consultan alertas, reportes y dashboards y
+            # el vencimiento por fecha_fin); los finalizados no lo agrandan
+            models.Index(fields=['fecha_fin'], condition=models.Q(estado='activo'),
+                         name='contratos_activos_fin_idx'),
+            # Cola de PDFs por generar: solo las filas marcadas
+            models.Index(fields=['id'], condition=models.Q(pdf_pendiente=True),
+                         name='contratos_pdf_pendiente_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_tipo_contrato_display()} - {self.parte_contratante_nombre} - {self.inmueble}"
 
-    def save(self, *args, **kwargs):
+    def calcular_comision(self):
         # Lógica para calcular comisión si es necesario
         if self.monto and self.comision_porcentaje and not self.comision_monto:
             self.comision_monto = (self.monto * self.comision_porcentaje) / 100
+
+    def save(self, *args, **kwargs):
+        self.calcular_comision()
         super().save(*args, **kwargs)
 
@@ -0,0 +1,144 @@
+# contrato/pdfs.py
+"""
+PDFs de contratos guardados por contenido.
+
+La clave de cada PDF es un hash del tipo de documento (diseño y backend),
+de la huella de su plantilla y de los valores con los que se llena. Un
+contrato sin cambios da siempre la misma clave: se genera una sola vez y
+después se sirve desde MEDIA_ROOT/<CONTRATOS_PDF_DIR>/<ab>/<clave>.pdf. Si
+cambian sus datos (o los del inmueble/agente que usa) o la plantilla, cambia
+la clave y se genera de nuevo.
+
+- `obtener_pdf(contrato)`: ruta absoluta del PDF (lo genera si no existe).
+- Al cambiar o borrar un contrato no se borra nada: otro contrato con los
+  mismos datos usa el mismo archivo, y el viejo ya no se sirve porque su
+  clave dejó de corresponder. `manage.py limpiar_pdfs_contratos` (cron)
+  borra los archivos que no corresponden a ningún contrato actual.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+
+from . import documentos
+
+
+PDF_DIR = getattr(settings, 'CONTRATOS_PDF_DIR', os.path.join('contratos', 'generados'))
+
+
+def contexto_anticretico(contrato):
+    """Variables de contrato/templates/plantilla_anticretico.txt (contrato con inmueble y agente)."""
+    return {
+        "ciudad": contrato.ciudad,
+        "fecha": contrato.fecha_contrato.strftime("%d de %B de %Y"),
+        "propietario_nombre": contrato.parte_contratante_nombre,
+        "propietario_ci": contrato.parte_contratante_ci,
+        "propietario_domicilio": contrato.parte_contratante_domicilio,
+        "anticresista_nombre": contrato.parte_contratada_nombre,
+        "anticresista_ci": contrato.parte_contratada_ci,
+        "anticresista_domicilio": contrato.parte_contratada_domicilio,
+        "inmueble_direccion": contrato.inmueble.direccion,
+        "inmueble_superficie": str(contrato.inmueble.superficie),
+        "monto": str(contrato.monto),
+        # (Opcional: puedes instalar 'num2words' para convertir el monto a texto)
+        "monto_literal": f"{contrato.monto:,.2f}",  # De momento usamos el número
+        "meses": str(contrato.vigencia_meses),
+        "agente_nombre": contrato.agente.nombre,
+        "agente_ci": contrato.agente.ci,
+    }
+
+
+def contexto_alquiler(contrato):
+    """Variables de usuario/contratoPDF/contrato_alquiler.txt, como las llena ContratoAlquilerView."""
+    detalles = contrato.detalles_adicionales or {}
+    inmueble = contrato.inmueble
+    return {
+        "ciudad": contrato.ciudad or "________________",
+        "fecha": contrato.fecha_contrato.strftime("%d/%m/%Y"),
+        "arrendador_nombre": contrato.parte_contratante_nombre,
+        "arrendador_ci": contrato.parte_contratante_ci or "_________",
+        "arrendador_domicilio": contrato.parte_contratante_domicilio or "_________",
+        "arrendatario_nombre": contrato.parte_contratada_nombre or "_________",
+        "arrendatario_ci": contrato.parte_contratada_ci or "_________",
+        "arrendatario_domicilio": contrato.parte_contratada_domicilio or "_________",
+        "inmueble_direccion": inmueble.direccion or "_________",
+        "inmueble_zona": inmueble.zona or "_________",
+        "inmueble_superficie": inmueble.superficie or "0",
+        "monto_alquiler": contrato.monto if contrato.monto is not None else "0",
+        "monto_garantia": detalles.get("monto_garantia") or "0",
+        "vigencia_meses": contrato.vigencia_meses if contrato.vigencia_meses is not None else "0",
+        "fecha_inicio": detalles.get("fecha_inicio") or contrato.fecha_inicio or "____/____/______",
+        "fecha_fin": detalles.get("fecha_fin") or contrato.fecha_fin or "____/____/______",
+        "agente_nombre": contrato.agente.nombre,
+    }
+
+
+# Documentos que se pueden generar solo con los datos guardados del contrato
+CONTEXTOS = {
+    'anticretico': contexto_anticretico,
+    'alquiler': contexto_alquiler,
+}
+
+
+def calcular_clave(tipo, contexto, datos=None):
+    documento = documentos.DOCUMENTOS[tipo]
+    plantilla = documentos.obtener_plantilla(documento.plantilla)
+    contenido = json.dumps(
+        [tipo, type(documento).__name__, documento.backend, plantilla.huella, contexto, datos or {}],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def ruta_relativa(clave):
+    return os.path.join(PDF_DIR, clave[:2], f'{clave}.pdf')
+
+
+def _guardar(ruta, contenido):
+    # Se escribe a un temporal y se renombra: nadie sirve un PDF a medio escribir
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def ubicar(contrato, tipo):
+    """(contexto, ruta relativa a MEDIA_ROOT) del PDF `tipo` del contrato en el almacén."""
+    contexto = CONTEXTOS[tipo](contrato)
+    return contexto, ruta_relativa(calcular_clave(tipo, contexto))
+
+
+def generar(tipo, contexto, ruta):
+    """Genera y guarda el PDF en `ruta` (absoluta). Se puede llamar desde otro proceso."""
+    _guardar(ruta, documentos.renderizar(tipo, contexto))
+    return ruta
+
+
+def obtener_pdf(contrato, tipo='anticretico'):
+    """Ruta absoluta del PDF `tipo` del contrato; lo genera y guarda solo si aún no existe."""
+    contexto, relativa = ubicar(contrato, tipo)
+    ruta = os.path.join(settings.MEDIA_ROOT, relativa)
+    if not os.path.exists(ruta):
+        generar(tipo, contexto, ruta)
+    return ruta
+
+
+def claves_vigentes(contratos):
+    """Claves que corresponden hoy a los contratos dados (con inmueble y agente)."""
+    claves = set()
+    for contrato in contratos:
+        # descargar_contrato_pdf genera el anticrético de cualquier contrato; el resto, el de su tipo
+        for tipo in {'anticretico', contrato.tipo_contrato} & CONTEXTOS.keys():
+            try:
+                claves.add(calcular_clave(tipo, CONTEXTOS[tipo](contrato)))
+            except (TypeError, ValueError, AttributeError):
+                continue  # Datos incompletos (p. ej. sin monto): no se puede generar su PDF
+    return claves
@@ -0,0 +1,33 @@
+# contrato/signals.py
+# Cambia la versión de la caché del dashboard de comisiones cuando un contrato
+# cambia, incluso cuando el estado cambia por lote sin post_save
+# (contrato/estados.py). Los PDFs generados no se tocan: van por contenido
+# (contrato/pdfs.py) y los huérfanos los borra `manage.py limpiar_pdfs_contratos`.
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from usuario.models import Grupo
+
+from .models import Contrato
+from . import comisiones, estados, clientes
+
+
+@receiver(post_save, sender=Contrato, dispatch_uid='contrato_comisiones_invalidar_save')
+@receiver(post_delete, sender=Contrato, dispatch_uid='contrato_comisiones_invalidar_delete')
+def invalidar_comisiones(sender, **kwargs):
+    transaction.on_commit(comisiones.invalidar)
+
+
+@receiver(estados.transicion, sender=Contrato, dispatch_uid='contrato_comisiones_invalidar_transicion')
+def invalidar_comisiones_transicion(sender, **kwargs):
+    # Ya se emite después del commit
+    comisiones.invalidar()
+
+
+@receiver(post_save, sender=Grupo, dispatch_uid='contrato_grupos_olvidar_save')
+@receiver(post_delete, sender=Grupo, dispatch_uid='contrato_grupos_olvidar_delete')
+def olvidar_grupos(sender, **kwargs):
+    # Ids de grupo cacheados por contrato/clientes.py (un renombre cambia cuál corresponde)
+    transaction.on_commit(clientes.olvidar_grupos)
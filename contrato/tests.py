@@ -1,3 +1,77 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from inmueble.models import InmuebleModel
+from usuario.models import Usuario
+
+from .models import Contrato
+from . import comisiones
+
+
+class DashboardComisionesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agente = Usuario.objects.create(username='agente', nombre='Agente', correo='agente@test.com')
+        inmueble = InmuebleModel.objects.create(
+            agente=cls.agente, titulo='Casa', superficie=100, precio=1000, tipo_operacion='venta',
+        )
+        datos = [
+            ('venta', date(2024, 1, 15), '100.00'),
+            ('venta', date(2024, 2, 15), '200.00'),
+            ('alquiler', date(2024, 3, 15), '50.00'),
+            ('alquiler', date(2024, 6, 15), '400.00'),
+        ]
+        # bulk_create: sin las señales de post_save (alertas, PDFs)
+        Contrato.objects.bulk_create([
+            Contrato(
+                agente=cls.agente, inmueble=inmueble, tipo_contrato=tipo, estado='activo',
+                ciudad='La Paz', fecha_contrato=fecha,
+                parte_contratante_nombre='Propietario', parte_contratante_ci='1',
+                parte_contratada_nombre='Cliente', monto=Decimal('1000.00'),
+                comision_porcentaje=Decimal('5.00'), comision_monto=Decimal(comision),
+            )
+            for tipo, fecha, comision in datos
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sin_cache_cuatro_consultas(self):
+        with self.assertNumQueries(4):
+            datos = comisiones.calcular_dashboard()
+        self.assertEqual(datos['stats_generales']['total_contratos'], 4)
+        self.assertEqual(datos['stats_generales']['total_comisiones'], 750.0)
+        self.assertEqual(len(datos['top_contratos']), 4)
+
+    def test_con_cache_sin_consultas(self):
+        esperado = comisiones.dashboard()
+        with self.assertNumQueries(0):
+            datos = comisiones.dashboard()
+        self.assertEqual(datos, esperado)
+
+    def test_invalidar_vuelve_a_calcular(self):
+        comisiones.dashboard()
+        comisiones.invalidar()
+        with self.assertNumQueries(4):
+            comisiones.dashboard()
+
+    def test_filtro_de_fechas(self):
+        datos = comisiones.dashboard(fecha_inicio=date(2024, 2, 1), fecha_fin=date(2024, 3, 31))
+        self.assertEqual(datos['stats_generales']['total_contratos'], 2)
+        self.assertEqual(datos['stats_generales']['total_comisiones'], 250.0)
+        self.assertEqual(
+            {(t['tipo_contrato'], t['total_contratos']) for t in datos['comisiones_tipo']},
+            {('venta', 1), ('alquiler', 1)},
+        )
+        self.assertEqual(
+            sorted(c['fecha'] for c in datos['top_contratos']),
+            [date(2024, 2, 15), date(2024, 3, 15)],
+        )
+        # Otro rango no usa la entrada en caché del anterior
+        datos = comisiones.dashboard(fecha_inicio=date(2024, 6, 1))
+        self.assertEqual(datos['stats_generales']['total_contratos'], 1)
+        self.assertEqual(datos['stats_generales']['total_comisiones'], 400.0)
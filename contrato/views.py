@@ -6,7 +6,7 @@ from decimal import Decimal, InvalidOperation
 
 from django.db.models import Sum, Count, Avg, Q
 from django.utils import timezone
-from django.http import HttpResponse, FileResponse
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse
 from django.conf import settings
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
@@ -14,19 +14,13 @@ from rest_framework import status
 from rest_framework.views import APIView
 from dateutil.relativedelta import relativedelta
 from datetime import datetime, date # Asegúrate de que date esté importado
-from fpdf import FPDF
-from reportlab.lib.pagesizes import LETTER
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, HRFlowable
-from reportlab.lib import colors
-from reportlab.lib.units import cm
 
 from usuario.models import Usuario,Grupo
 from inmueble.models import InmuebleModel as Inmueble
 from inmueble.models import InmuebleModel
 from inmueble.models import AnuncioModel
 from contrato.models import Contrato
+from contrato import documentos, pdfs, lotes, comisiones, listado, estados, clientes, importacion
 from contrato.serializers import ContratoSerializer, ContratoAlquilerSerializer
 from inmobiliaria.permissions import (
     requiere_actualizacion,
@@ -34,8 +28,12 @@ from inmobiliaria.permissions import (
     requiere_eliminacion,
     requiere_lectura,
     requiere_permiso,
+    puede_ver_contrato,
+    es_administrador,
 )
 from utils.encrypted_logger import registrar_accion, leer_logs
+from utils.archivos import servir_archivo
+from utils.flujos import flujo_asincrono
 
 
 from django.http import FileResponse, Http404
@@ -48,130 +46,35 @@ from suscripciones.models import Suscripcion
 def dashboard_comisiones(request):
     """
     Dashboard de control de comisiones para administradores
+    (consultas agrupadas y caché por filtros en contrato/comisiones.py)
     """
     try:
         # Filtros por fecha (opcionales)
-        fecha_inicio = request.GET.get("fecha_inicio")
-        fecha_fin = request.GET.get("fecha_fin")
-        incluir_servicios = (
-            request.GET.get("incluir_servicios", "false").lower() == "true"
-        )
-
-        # Base queryset
-        if incluir_servicios:
-            contratos = Contrato.objects.filter(estado="activo")
-        else:
-            contratos = Contrato.objects.filter(estado="activo").exclude(
-                tipo_contrato="servicios"
-            )
-
-        # Aplicar filtros de fecha si existen
-        if fecha_inicio:
-            contratos = contratos.filter(fecha_contrato__gte=fecha_inicio)
-        if fecha_fin:
-            contratos = contratos.filter(fecha_contrato__lte=fecha_fin)
-            incluir_servicios = (
-                request.GET.get("incluir_servicios", "false").lower() == "true"
-            )
-
-        hay_contratos_servicios = Contrato.objects.filter(
-            tipo_contrato="servicios", estado="activo"
-        ).exists()
-
-        # Base queryset - excluir servicios por defecto
-        if incluir_servicios:
-            contratos = Contrato.objects.filter(estado="activo")
-        else:
-            contratos = Contrato.objects.filter(estado="activo").exclude(
-                tipo_contrato="servicios"
-            )
-
-        # Estadísticas generales
-        stats_generales = {
-            "total_contratos": contratos.count(),
-            "total_comisiones": float(
-                contratos.aggregate(Sum("comision_monto"))["comision_monto__sum"] or 0
-            ),
-            "comision_promedio": float(
-                contratos.aggregate(avg=Avg("comision_porcentaje"))["avg"] or 0
-            ),
-        }
-
-        # Comisiones por agente
-        comisiones_agente = (
-            contratos.values("agente__id", "agente__nombre", "agente__username")
-            .annotate(
-                total_contratos=Count("id"),
-                total_comision=Sum("comision_monto"),
-                comision_promedio=Avg("comision_porcentaje"),
-            )
-            .order_by("-total_comision")
-        )
-
-        # Comisiones por tipo de contrato
-        comisiones_tipo = (
-            contratos.values("tipo_contrato")
-            .annotate(total_contratos=Count("id"), total_comision=Sum("comision_monto"))
-            .order_by("-total_comision")
-        )
-
-        # Comisiones mensuales (últimos 6 meses)
-        seis_meses_atras = timezone.now().date() - timedelta(days=180)
-        comisiones_mensuales = (
-            contratos.filter(fecha_contrato__gte=seis_meses_atras)
-            .extra(
+        try:
+            fecha_inicio = request.GET.get("fecha_inicio")
+            fecha_fin = request.GET.get("fecha_fin")
+            fecha_inicio = date.fromisoformat(fecha_inicio) if fecha_inicio else None
+            fecha_fin = date.fromisoformat(fecha_fin) if fecha_fin else None
+        except ValueError:
+            return Response(
                 {
-                    "mes": "EXTRACT(month FROM fecha_contrato)",
-                    "ano": "EXTRACT(year FROM fecha_contrato)",
-                }
+                    "status": 0,
+                    "error": 1,
+                    "message": "Fechas en formato YYYY-MM-DD",
+                    "values": {},
+                },
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            .values("mes", "ano")
-            .annotate(total_comision=Sum("comision_monto"), total_contratos=Count("id"))
-            .order_by("-ano", "-mes")[:6]
+        incluir_servicios = (
+            request.GET.get("incluir_servicios", "false").lower() == "true"
         )
 
-        # Top 5 contratos con mayor comisión
-        top_contratos = contratos.select_related("agente", "inmueble").order_by(
-            "-comision_monto"
-        )[:5]
-        top_contratos = contratos.select_related("agente", "inmueble").order_by(
-            "-comision_monto"
-        )[:5]
-        top_contratos_data = []
-        for contrato in top_contratos:
-            top_contratos_data.append(
-                {
-                    "id": contrato.id,
-                    "cliente": contrato.parte_contratante_nombre,
-                    "agente": contrato.agente.nombre,
-                    "inmueble": (
-                        contrato.inmueble.titulo if contrato.inmueble else "N/A"
-                    ),
-                    "tipo_contrato": contrato.get_tipo_contrato_display(),
-                    "monto_contrato": float(contrato.monto or 0),  # ✅ NUEVO
-                    "comision_monto": float(contrato.comision_monto or 0),
-                    "comision_porcentaje": float(contrato.comision_porcentaje or 0),
-                    "fecha": contrato.fecha_contrato,
-                }
-            )
-        if incluir_servicios:
-            stats_generales["contratos_servicios"] = contratos.filter(
-                tipo_contrato="servicios"
-            ).count()
-
         return Response(
             {
                 "status": 1,
                 "error": 0,
                 "message": "DASHBOARD DE CONTROL DE COMISIONES",
-                "values": {
-                    "stats_generales": stats_generales,
-                    "comisiones_agente": comisiones_agente,
-                    "comisiones_tipo": comisiones_tipo,
-                    "comisiones_mensuales": comisiones_mensuales,
-                    "top_contratos": top_contratos_data,
-                    "hay_contratos_servicios": hay_contratos_servicios,
-                },
+                "values": comisiones.dashboard(fecha_inicio, fecha_fin, incluir_servicios),
             }
         )
 
@@ -192,81 +95,47 @@ def dashboard_comisiones(request):
 # @requiere_permiso("Comision", "leer")
 def detalle_comisiones_agente(request, agente_id):
     """
-    Detalle de comisiones de un agente específico
+    Detalle de comisiones de un agente específico.
+    El resumen (con el puesto del agente), la serie mensual con el acumulado y
+    los tipos se calculan en la base y se cachean (contrato/comisiones.py);
+    los contratos vienen paginados:
+        ?limite=N             contratos por página (por defecto CONTRATOS_LISTADO_LIMITE)
+        ?cursor=...           página siguiente (values.siguiente)
     """
     try:
         agente = Usuario.objects.get(id=agente_id, grupo__nombre="agente")
 
         # Filtros
-        fecha_inicio = request.GET.get("fecha_inicio")
-        fecha_fin = request.GET.get("fecha_fin")
-        incluir_servicios = (
-            request.GET.get("incluir_servicios", "false").lower() == "true"
-        )
+        try:
+            fecha_inicio = request.GET.get("fecha_inicio")
+            fecha_fin = request.GET.get("fecha_fin")
+            fecha_inicio = date.fromisoformat(fecha_inicio) if fecha_inicio else None
+            fecha_fin = date.fromisoformat(fecha_fin) if fecha_fin else None
+            incluir_servicios = (
+                request.GET.get("incluir_servicios", "false").lower() == "true"
+            )
+            filtros = (fecha_inicio, fecha_fin, incluir_servicios)
 
-        # Base queryset - aplicar filtro de servicios
-        if incluir_servicios:
-            contratos_agente = Contrato.objects.filter(agente=agente, estado="activo")
-        else:
-            contratos_agente = Contrato.objects.filter(
-                agente=agente, estado="activo"
-            ).exclude(tipo_contrato="servicios")
+            contratos_data, siguiente = comisiones.contratos_agente(
+                agente.id, *filtros,
+                cursor=request.GET.get("cursor"),
+                cantidad=listado.limite(request.GET.get("limite")),
+            )
+        except ValueError as e:
+            return Response(
+                {"status": 0, "error": 1, "message": f"Parámetros inválidos: {str(e)}", "values": {}},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        if fecha_inicio:
-            contratos_agente = contratos_agente.filter(fecha_contrato__gte=fecha_inicio)
-        if fecha_fin:
-            contratos_agente = contratos_agente.filter(fecha_contrato__lte=fecha_fin)
+        datos = comisiones.resumen_agente(agente.id, *filtros)
 
         # Estadísticas del agente
         stats_agente = {
             "agente_nombre": agente.nombre,
             "agente_username": agente.username,
-            "total_contratos": contratos_agente.count(),
-            "total_comision": float(
-                contratos_agente.aggregate(Sum("comision_monto"))["comision_monto__sum"]
-                or 0
-            ),
-            "comision_promedio": float(
-                contratos_agente.aggregate(avg=Avg("comision_porcentaje"))["avg"] or 0
-            ),
-            "monto_total_contratos": float(
-                contratos_agente.aggregate(Sum("monto"))["monto__sum"] or 0
-            ),
+            **datos["resumen"],
         }
 
-        # Contratos del agente
-        contratos_data = []
-        for contrato in contratos_agente.select_related("inmueble").order_by(
-            "-fecha_contrato"
-        ):
-            contratos_data.append(
-                {
-                    "id": contrato.id,
-                    "cliente": contrato.parte_contratante_nombre,
-                    "inmueble": (
-                        contrato.inmueble.titulo if contrato.inmueble else "N/A"
-                    ),
-                    "tipo_contrato": contrato.get_tipo_contrato_display(),
-                    "monto_contrato": float(contrato.monto or 0),
-                    "comision_monto": float(contrato.comision_monto or 0),
-                    "comision_porcentaje": float(contrato.comision_porcentaje or 0),
-                    "fecha_contrato": contrato.fecha_contrato,
-                    "vigencia_dias": contrato.vigencia_dias,
-                    "estado": contrato.estado,
-                }
-            )
-
-        # Comisiones por tipo de contrato
-        comisiones_tipo = (
-            contratos_agente.values("tipo_contrato")
-            .annotate(
-                total_contratos=Count("id"),
-                total_comision=Sum("comision_monto"),
-                monto_total=Sum("monto"),
-            )
-            .order_by("-total_comision")
-        )
-
         return Response(
             {
                 "status": 1,
@@ -275,7 +144,9 @@ def detalle_comisiones_agente(request, agente_id):
                 "values": {
                     "stats_agente": stats_agente,
                     "contratos": contratos_data,
-                    "comisiones_tipo": comisiones_tipo,
+                    "siguiente": siguiente,
+                    "comisiones_tipo": datos["comisiones_tipo"],
+                    "comisiones_mensuales": datos["comisiones_mensuales"],
                 },
             }
         )
@@ -305,35 +176,10 @@ def _get_or_create_cliente_only_link(nombre: str, ci: str, domicilio: str, grupo
     """
     Busca un Usuario por CI para vincular al contrato. 
     1. Si existe, lo retorna (sin actualizar datos). 
-    2. Si no existe, lo crea y lo asigna al rol 'cliente'.
+    2. Si no existe, lo crea y lo asigna al rol 'cliente' (cuenta solo de
+       vínculo, sin contraseña utilizable; ver contrato/clientes.py).
     """
-    if not ci: return None
-    
-    # 1. Buscar el grupo 'cliente'
-    try:
-        grupo_cliente = Grupo.objects.get(nombre__iexact=grupo_nombre)
-    except Grupo.DoesNotExist:
-        raise Exception(f"El grupo '{grupo_nombre}' es requerido.")
-
-    # 2. Buscar usuario existente por CI
-    cliente_usuario = Usuario.objects.filter(ci=ci).first()
-
-    if cliente_usuario:
-        # 🚨 REGLA CLAVE: Si ya existe, NO HACEMOS NADA más que usar su ID.
-        # Esto protege los datos de Agentes/Admins de ser sobrescritos.
-        return cliente_usuario
-        
-    else:
-        # 3. Si no existe, crear la cuenta como 'Cliente'
-        usuario_creado = Usuario.objects.create_user(
-            username=f"ci_{ci}",
-            password=ci,  # Contraseña temporal
-            nombre=nombre,
-            ci=ci,
-            grupo=grupo_cliente,
-            ubicacion=domicilio # Usar domicilio ingresado
-        )
-        return usuario_creado
+    return clientes.vincular_cliente(nombre, ci, domicilio, grupo_nombre)
 
 @api_view(["POST"])
 # @requiere_permiso("Contrato", "crear")
@@ -501,7 +347,9 @@ def crear_contrato_anticretico(request):
 # @requiere_permiso("Contrato", "leer")
 def descargar_contrato_pdf(request, contrato_id):
     """
-    Genera un PDF profesional usando un .txt y fpdf.
+    Genera un PDF profesional usando un .txt y fpdf. El PDF se guarda por
+    contenido (contrato/pdfs.py): mientras el contrato no cambie, se sirve el
+    archivo ya generado.
     """
     try:
         # 1. Buscar el contrato y sus relaciones
@@ -510,62 +358,19 @@ def descargar_contrato_pdf(request, contrato_id):
         contrato = Contrato.objects.select_related("inmueble", "agente").get(
             id=contrato_id
         )
+        if not puede_ver_contrato(request.user, contrato):
+            return Response(
+                {"error": "No tiene permisos para ver este contrato."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
 
-        # 2. Cargar la plantilla .txt
-        # (Usamos la ruta corregida que apunta a la carpeta 'templates')
-        template_path = os.path.join(
-            settings.BASE_DIR, "contrato", "templates", "plantilla_anticretico.txt"
-        )
-
-        with open(template_path, "r", encoding="utf-8") as f:
-            template_string = f.read()
-
-        # 3. Preparar los datos y rellenar la plantilla
-        # (Añadimos más datos de los modelos relacionados)
-        contexto = {
-            "ciudad": contrato.ciudad,
-            "fecha": contrato.fecha_contrato.strftime("%d de %B de %Y"),
-            "propietario_nombre": contrato.parte_contratante_nombre,
-            "propietario_ci": contrato.parte_contratante_ci,
-            "propietario_domicilio": contrato.parte_contratante_domicilio,
-            "anticresista_nombre": contrato.parte_contratada_nombre,
-            "anticresista_ci": contrato.parte_contratada_ci,
-            "anticresista_domicilio": contrato.parte_contratada_domicilio,
-            "inmueble_direccion": contrato.inmueble.direccion,
-            "inmueble_superficie": str(contrato.inmueble.superficie),
-            "monto": str(contrato.monto),
-            # (Opcional: puedes instalar 'num2words' para convertir el monto a texto)
-            "monto_literal": f"{contrato.monto:,.2f}",  # De momento usamos el número
-            "meses": str(contrato.vigencia_meses),
-            "agente_nombre": contrato.agente.nombre,
-            "agente_ci": contrato.agente.ci,
-        }
-
-        # Llenamos los {placeholders} en el texto
-        texto_final = template_string.format(**contexto)
-
-        # 4. Generar el PDF
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=11)
-
-        # Añadimos un margen
-        pdf.set_left_margin(20)
-        pdf.set_right_margin(20)
-        pdf.set_top_margin(20)
-
-        # Usar multi_cell para que el texto se ajuste
-        pdf.multi_cell(0, 5, texto_final.encode("latin-1", "replace").decode("latin-1"))
-
-        # Convertir el PDF a bytes
-        pdf_output = pdf.output(dest="S").encode("latin-1")
+        # 2. PDF de la plantilla contrato/templates/plantilla_anticretico.txt
+        # llenada con los datos del contrato (se genera solo si cambió algo)
+        pdf_path = pdfs.obtener_pdf(contrato, "anticretico")
 
-        # 5. Crear la respuesta HTTP
+        # 3. Crear la respuesta HTTP (ETag, Range y entrega por el proxy, ver utils/archivos.py)
         nombre_archivo = f"contrato_anticretico_{contrato.id}.pdf"
-        response = HttpResponse(pdf_output, content_type="application/pdf")
-        response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
-
-        return response
+        return servir_archivo(request, pdf_path, nombre_archivo, content_type="application/pdf")
 
     except Contrato.DoesNotExist:
         return Response(
@@ -591,6 +396,94 @@ def descargar_contrato_pdf(request, contrato_id):
         )
 
 
+@api_view(["GET"])
+def exportar_contratos_zip(request):
+    """
+    Descarga un ZIP con los PDFs de los contratos que cumplen los filtros
+    (tipo, estado, desde, hasta = fecha_contrato, agente_id). Los PDFs que ya
+    existen se envían primero y los que faltan se generan en paralelo; el ZIP
+    se va enviando a medida que cada archivo queda listo (contrato/lotes.py).
+    """
+    if not es_administrador(request.user):
+        return Response(
+            {"error": "Solo administración puede exportar contratos."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    try:
+        desde = request.GET.get("desde")
+        hasta = request.GET.get("hasta")
+        desde = datetime.strptime(desde, "%Y-%m-%d").date() if desde else None
+        hasta = datetime.strptime(hasta, "%Y-%m-%d").date() if hasta else None
+        agente_id = request.GET.get("agente_id")
+        agente_id = int(agente_id) if agente_id else None
+    except ValueError:
+        return Response(
+            {"error": "Fechas en formato YYYY-MM-DD y agente_id numérico."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    contratos = lotes.filtrar_contratos(
+        tipo=request.GET.get("tipo"),
+        estado=request.GET.get("estado"),
+        desde=desde,
+        hasta=hasta,
+        agente_id=agente_id,
+    )
+    # Se llena mientras se generan los PDFs y termina como errores.txt dentro del ZIP
+    errores = []
+    response = StreamingHttpResponse(
+        flujo_asincrono(lotes.zip_en_flujo(lotes.archivos_pdf(contratos, errores=errores), errores)),
+        content_type="application/zip",
+    )
+    response["Content-Disposition"] = f'attachment; filename="contratos_{timezone.now():%Y%m%d_%H%M}.zip"'
+    return response
+
+
+@api_view(["POST"])
+def importar_contratos(request):
+    """
+    Alta masiva de contratos desde una planilla CSV o XLSX (campo 'archivo').
+    Columnas en contrato/importacion.py (COLUMNAS). Las filas con errores se
+    informan por número de fila y no impiden crear las demás; los PDFs los
+    genera después `manage.py generar_pdfs_pendientes`.
+    """
+    if not es_administrador(request.user):
+        return Response(
+            {"error": "Solo administración puede importar contratos."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    archivo = request.FILES.get("archivo")
+    if not archivo:
+        return Response(
+            {"status": 0, "error": 1, "message": "Falta el archivo (campo 'archivo').", "values": {}},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        resultado = importacion.importar(archivo, archivo.name, creado_por=request.user)
+    except ValueError as e:
+        return Response(
+            {"status": 0, "error": 1, "message": str(e), "values": {}},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    except Exception as e:
+        return Response(
+            {"status": 0, "error": 1, "message": f"Error al importar contratos: {str(e)}", "values": {}},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    return Response(
+        {
+            "status": 1,
+            "error": 0,
+            "message": f"{resultado['creados']} contratos importados, {len(resultado['errores'])} filas con errores",
+            "values": resultado,
+        }
+    )
+
+
 @api_view(["GET"])
 # @requiere_permiso("Contrato", "leer")
 def detalle_contrato(request, contrato_id):
@@ -632,8 +525,7 @@ def aprobar_contrato(request, contrato_id):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        contrato.estado = "activo"
-        contrato.save()
+        estados.transicionar(contrato, "activo", motivo="aprobacion")
 
         serializer = ContratoSerializer(contrato, context={"request": request})
         return Response(
@@ -670,10 +562,9 @@ def finalizar_contrato(request, contrato_id):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        contrato.estado = "finalizado"
         # (Aquí podrías añadir lógica para la garantía si la tuvieras en el modelo)
         # ej: contrato.garantia_devuelta = True
-        contrato.save()
+        estados.transicionar(contrato, "finalizado", motivo="finalizacion")
 
         # (AC 5) Mensaje de éxito
         return Response(
@@ -935,16 +826,8 @@ class ContratoServiciosAnticreticoView(APIView):
                 {"error": f"Error al procesar contrato: {str(e)}"}, status=500
             )
 
-        # Ruta del archivo de plantilla
-        plantilla_path = os.path.join(
-            settings.BASE_DIR,
-            "usuario/contratoServicioAnticreticoPDF/contrato_servicios_anticretico.txt",
-        )
-        with open(plantilla_path, "r", encoding="utf-8") as f:
-            contrato_text = f.read()
-
-        # Reemplazar variables
-        contrato_text = contrato_text.format(
+        # Variables de la plantilla
+        contexto = dict(
             ciudad=data.get("ciudad", "________________"),
             fecha=data.get("fecha", "____/____/______"),
             empresa_nombre=data.get("empresa_nombre", "________________"),
@@ -975,145 +858,10 @@ class ContratoServiciosAnticreticoView(APIView):
             email_oficina=data.get("email_oficina", "________________"),
         )
 
-        # Crear buffer en memoria
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=LETTER,
-            rightMargin=40,
-            leftMargin=40,
-            topMargin=40,
-            bottomMargin=40,
-        )
-
-        # Estilos
-        styles = getSampleStyleSheet()
-        titulo_style = ParagraphStyle(
-            "Titulo",
-            parent=styles["Heading1"],
-            fontSize=14,
-            leading=18,
-            alignment=TA_CENTER,
-            spaceAfter=20,
-            textColor=colors.black,
-            fontName="Helvetica-Bold",
-        )
-        clausula_titulo_style = ParagraphStyle(
-            "ClausulaTitulo",
-            parent=styles["Normal"],
-            fontSize=11,
-            leading=14,
-            alignment=TA_LEFT,
-            spaceAfter=6,
-            textColor=colors.black,
-            fontName="Helvetica-Bold",
-        )
-        clausula_style = ParagraphStyle(
-            "Clausula",
-            fontSize=10,
-            leading=13,
-            alignment=TA_JUSTIFY,
-            spaceAfter=8,
-        )
-        firma_style = ParagraphStyle(
-            "Firma",
-            fontSize=10,
-            leading=12,
-            alignment=TA_CENTER,
-        )
-        footer_style = ParagraphStyle(
-            "Footer",
-            fontSize=8,
-            leading=10,
-            alignment=TA_CENTER,
-            textColor=colors.grey,
-        )
-
-        story = []
-
-        # Título
-        story.append(
-            Paragraph(
-                "CONTRATO PRIVADO DE PRESTACIÓN DE SERVICIOS INMOBILIARIOS",
-                titulo_style,
-            )
-        )
-        story.append(Spacer(1, 10))
-
-        # Introducción
-        intro_text = f"""Conste por el presente Contrato Privado de Servicios Inmobiliarios, que con el sólo reconocimiento de firmas surtirá los efectos de documento público, conforme al tenor de las siguientes cláusulas y condiciones:"""
-        story.append(Paragraph(intro_text, clausula_style))
-        story.append(Spacer(1, 15))
-
-        # Separar por párrafos usando doble salto de línea
-        lineas = contrato_text.strip().split("\n\n")
-
-        # Agregar cláusulas
-        for i, p in enumerate(lineas):
-            if (
-                p.strip().startswith("PRIMERA:")
-                or p.strip().startswith("SEGUNDA:")
-                or p.strip().startswith("TERCERA:")
-                or p.strip().startswith("CUARTA:")
-                or p.strip().startswith("QUINTA:")
-                or p.strip().startswith("SEXTA:")
-                or p.strip().startswith("SÉPTIMA:")
-                or p.strip().startswith("OCTAVA:")
-                or p.strip().startswith("NOVENA:")
-                or p.strip().startswith("DÉCIMA:")
-                or p.strip().startswith("DÉCIMA PRIMERA:")
-                or p.strip().startswith("DÉCIMA SEGUNDA:")
-                or p.strip().startswith("DÉCIMA TERCERA:")
-                or p.strip().startswith("DÉCIMA CUARTA:")
-            ):
-                story.append(Paragraph(p.strip(), clausula_titulo_style))
-            else:
-                story.append(Paragraph(p.strip(), clausula_style))
-
-            if i != len(lineas) - 1:
-                story.append(Spacer(1, 8))
-
-        # Fecha y lugar
-        story.append(Spacer(1, 20))
-        fecha_lugar = Paragraph(
-            f"{data.get('ciudad', 'Trinidad')}, {data.get('fecha', '____/____/______')}.",
-            clausula_titulo_style,
-        )
-        story.append(fecha_lugar)
-        story.append(Spacer(1, 25))
-
-        # Firmas
-        firmas_texto = f"""
-        __________________________<br/>
-        <b>{data.get('empresa_representante', '________________')}</b><br/>
-        <i>{data.get('empresa_nombre', '________________')}</i><br/><br/><br/>
-
-        __________________________<br/>
-        <b>{data.get('cliente_nombre', '________________')}</b><br/>
-        <i>PROPIETARIO/A</i><br/><br/><br/>
-
-        __________________________<br/>
-        <b>{data.get('agente_nombre', '________________')}</b><br/>
-        <i>AGENTE ASOCIADO</i>
-        """
-        story.append(Paragraph(firmas_texto, firma_style))
-
-        # Footer
-        story.append(Spacer(1, 20))
-        footer_text = f"""
-        {data.get('direccion_oficina', '________________')}<br/>
-        {data.get('telefono_oficina', '________________')}<br/>
-        {data.get('email_oficina', '________________')}<br/>
-        <i>Cada oficina es de propiedad y operación independiente</i>
-        """
-        story.append(Paragraph(footer_text, footer_style))
-
-        # Generar PDF
-        doc.build(story)
-        buffer.seek(0)
+        pdf = documentos.renderizar("servicios_anticretico", contexto, datos=data)
 
         # Devolver PDF
-        response = HttpResponse(buffer, content_type="application/pdf")
+        response = HttpResponse(pdf, content_type="application/pdf")
         response["Content-Disposition"] = (
             f'attachment; filename="contrato_servicios_anticretico_inmobiliarios_{data.get("cliente_nombre","cliente")}.pdf"'
         )
@@ -1245,115 +993,42 @@ class ContratoAlquilerView(APIView):
             except Exception as e:
                 print(f"⚠️ No se registró en bitácora: {e}")
 
-            # 5️⃣ Generar PDF
-            plantilla_path = os.path.join(
-                settings.BASE_DIR, "usuario/contratoPDF/contrato_alquiler.txt"
-            )
-            print("📂 Cargando plantilla desde:", plantilla_path)
-
-            with open(plantilla_path, "r", encoding="utf-8") as f:
-                contrato_texto = f.read().format(
-                    **{
-                        "ciudad": data.get("ciudad", "________________"),
-                        "fecha": fecha_contrato.strftime("%d/%m/%Y"),
-                        "arrendador_nombre": arrendador.nombre,
-                        "arrendador_ci": arrendador.ci or "_________",
-                        "arrendador_domicilio": data.get(
-                            "arrendador_domicilio", "_________"
-                        ),
-                        "arrendatario_nombre": data.get(
-                            "arrendatario_nombre", "_________"
-                        ),
-                        "arrendatario_ci": data.get("arrendatario_ci", "_________"),
-                        "arrendatario_domicilio": data.get(
-                            "arrendatario_domicilio", "_________"
-                        ),
-                        "inmueble_direccion": inmueble.direccion or "_________",
-                        "inmueble_zona": inmueble.zona or "_________",
-                        "inmueble_superficie": inmueble.superficie or "0",
-                        "monto_alquiler": data.get("monto_alquiler", "0"),
-                        "monto_garantia": data.get("monto_garantia", "0"),
-                        "vigencia_meses": data.get("vigencia_meses", "0"),
-                        "fecha_inicio": data.get("fecha_inicio", "____/____/______"),
-                        "fecha_fin": data.get("fecha_fin", "____/____/______"),
-                        "agente_nombre": agente.nombre,
-                    }
-                )
-
-            buffer = io.BytesIO()
-            doc = SimpleDocTemplate(
-                buffer,
-                pagesize=LETTER,
-                rightMargin=40,
-                leftMargin=40,
-                topMargin=50,
-                bottomMargin=40,
-            )
-
-            styles = getSampleStyleSheet()
-
-            style_normal = ParagraphStyle(
-                "Normal", fontSize=11, leading=18, alignment=TA_JUSTIFY
-            )
-
-            style_clausula = ParagraphStyle(
-                "Clausula",
-                fontSize=11,
-                leading=18,
-                alignment=TA_JUSTIFY,
-                spaceBefore=10,
-                spaceAfter=5,
-            )
-
-            style_titulo = ParagraphStyle(
-                "Titulo", fontSize=14, alignment=TA_CENTER, spaceAfter=15, leading=20
+            # 5️⃣ Generar PDF (usuario/contratoPDF/contrato_alquiler.txt)
+            pdf = documentos.renderizar(
+                "alquiler",
+                {
+                    "ciudad": data.get("ciudad", "________________"),
+                    "fecha": fecha_contrato.strftime("%d/%m/%Y"),
+                    "arrendador_nombre": arrendador.nombre,
+                    "arrendador_ci": arrendador.ci or "_________",
+                    "arrendador_domicilio": data.get(
+                        "arrendador_domicilio", "_________"
+                    ),
+                    "arrendatario_nombre": data.get(
+                        "arrendatario_nombre", "_________"
+                    ),
+                    "arrendatario_ci": data.get("arrendatario_ci", "_________"),
+                    "arrendatario_domicilio": data.get(
+                        "arrendatario_domicilio", "_________"
+                    ),
+                    "inmueble_direccion": inmueble.direccion or "_________",
+                    "inmueble_zona": inmueble.zona or "_________",
+                    "inmueble_superficie": inmueble.superficie or "0",
+                    "monto_alquiler": data.get("monto_alquiler", "0"),
+                    "monto_garantia": data.get("monto_garantia", "0"),
+                    "vigencia_meses": data.get("vigencia_meses", "0"),
+                    "fecha_inicio": data.get("fecha_inicio", "____/____/______"),
+                    "fecha_fin": data.get("fecha_fin", "____/____/______"),
+                    "agente_nombre": agente.nombre,
+                },
             )
 
-            story = []
-            story.append(Paragraph("<b>CONTRATO DE ALQUILER</b>", style_titulo))
-            story.append(Spacer(1, 10))
-
-            for bloque in contrato_texto.split("\n\n"):
-                lineas = bloque.strip().split("\n")
-                if not lineas or lineas == [""]:
-                    story.append(Spacer(1, 8))
-                    continue
-
-                if (
-                    lineas[0]
-                    .strip()
-                    .startswith(
-                        (
-                            "PRIMERA",
-                            "SEGUNDA",
-                            "TERCERA",
-                            "CUARTA",
-                            "QUINTA",
-                            "SEXTA",
-                            "SÉPTIMA",
-                            "OCTAVA",
-                            "NOVENA",
-                            "DÉCIMA",
-                        )
-                    )
-                ):
-                    story.append(Paragraph(f"<b>{lineas[0]}</b>", style_clausula))
-                    for linea in lineas[1:]:
-                        story.append(Paragraph(linea, style_normal))
-                else:
-                    story.append(Paragraph("<br/>".join(lineas), style_normal))
-
-                story.append(Spacer(1, 12))
-
-            doc.build(story)
-            buffer.seek(0)
-
             # 6️⃣ Guardar PDF
             pdf_filename = f"contrato_alquiler_{contrato.id}.pdf"
             pdf_path = os.path.join(settings.MEDIA_ROOT, "contratos", pdf_filename)
             os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
             with open(pdf_path, "wb") as f:
-                f.write(buffer.getbuffer())
+                f.write(pdf)
 
             contrato.archivo_pdf = f"contratos/{pdf_filename}"
             contrato.save()
@@ -1411,6 +1086,27 @@ class ContratoAlquilerView(APIView):
             )
 
 
+def _ruta_pdf_contrato(contrato):
+    """
+    Ruta del PDF del contrato: el archivo guardado al crearlo o, si no existe y
+    el tipo se puede generar con los datos del contrato, el del almacén por
+    contenido (contrato/pdfs.py). None si no hay ninguno.
+    """
+    if contrato.archivo_pdf:
+        pdf_path = os.path.join(settings.MEDIA_ROOT, contrato.archivo_pdf.name)
+        if os.path.exists(pdf_path):
+            return pdf_path
+    if contrato.tipo_contrato in pdfs.CONTEXTOS:
+        return pdfs.obtener_pdf(contrato, contrato.tipo_contrato)
+    return None
+
+
+def _nombre_pdf_contrato(contrato):
+    if contrato.archivo_pdf:
+        return os.path.basename(contrato.archivo_pdf.name)
+    return f"contrato_{contrato.tipo_contrato}_{contrato.id}.pdf"
+
+
 class ContratoViewPdf(APIView):
     """
     Permite visualizar o descargar el contrato PDF por ID de contrato.
@@ -1420,25 +1116,29 @@ class ContratoViewPdf(APIView):
 
     def get(self, request, contrato_id):
         try:
-            contrato = Contrato.objects.get(id=contrato_id)
-            if not contrato.archivo_pdf:
+            contrato = Contrato.objects.select_related("inmueble", "agente").get(id=contrato_id)
+            if not puede_ver_contrato(request.user, contrato):
                 return Response(
                     {
                         "status": 0,
                         "error": 1,
-                        "message": "El contrato no tiene archivo PDF asociado.",
+                        "message": "No tiene permisos para ver este contrato.",
                         "values": {},
                     },
-                    status=404,
+                    status=403,
                 )
 
-            pdf_path = os.path.join(settings.MEDIA_ROOT, contrato.archivo_pdf.name)
-            if not os.path.exists(pdf_path):
+            pdf_path = _ruta_pdf_contrato(contrato)
+            if pdf_path is None:
                 return Response(
                     {
                         "status": 0,
                         "error": 1,
-                        "message": "El archivo PDF no se encuentra en el servidor.",
+                        "message": (
+                            "El archivo PDF no se encuentra en el servidor."
+                            if contrato.archivo_pdf
+                            else "El contrato no tiene archivo PDF asociado."
+                        ),
                         "values": {},
                     },
                     status=404,
@@ -1446,17 +1146,11 @@ class ContratoViewPdf(APIView):
 
             # 📦 Si viene ?descargar=true, forzamos descarga
             descargar = request.GET.get("descargar", "false").lower() == "true"
-            response = FileResponse(
-                open(pdf_path, "rb"), content_type="application/pdf"
+            return servir_archivo(
+                request, pdf_path, _nombre_pdf_contrato(contrato),
+                descargar=descargar, content_type="application/pdf",
             )
 
-            if descargar:
-                response["Content-Disposition"] = (
-                    f'attachment; filename="{os.path.basename(pdf_path)}"'
-                )
-
-            return response
-
         except Contrato.DoesNotExist:
             return Response(
                 {
@@ -1486,65 +1180,46 @@ def listar_contratos(request):
     Puedes filtrar por tipo o estado:
         ?tipo=alquiler|venta|anticretico|servicios
         ?estado=activo|finalizado|cancelado|pendiente
+    Paginado (por fecha_contrato e id, más recientes primero):
+        ?limite=N                 primera página; en values.siguiente viene el cursor
+        ?limite=N&cursor=...      página siguiente
+    Sin limite ni cursor devuelve todos; con ?exportar=true se envía por partes.
     """
     try:
         tipo = request.GET.get("tipo")
         estado = request.GET.get("estado")
+        cursor = request.GET.get("cursor")
+        mensaje = "LISTADO DE CONTRATOS REGISTRADOS"
 
-        # 🔍 Base queryset
-        contratos = Contrato.objects.select_related("agente", "inmueble")
+        # 🔍 Base queryset (solo las columnas del listado, ver contrato/listado.py)
+        contratos = listado.filtrar(tipo=tipo, estado=estado)
 
-        # Aplicar filtros opcionales
-        if tipo:
-            contratos = contratos.filter(tipo_contrato=tipo)
-        if estado:
-            contratos = contratos.filter(estado=estado)
-
-        data = []
-        for c in contratos.order_by("-fecha_contrato"):
-            data.append(
-                {
-                    "id": c.id,
-                    "tipo_contrato": c.get_tipo_contrato_display(),
-                    "estado": c.estado,
-                    "ciudad": c.ciudad,
-                    "fecha_contrato": c.fecha_contrato,
-                    "fecha_inicio": c.fecha_inicio,
-                    "fecha_fin": c.fecha_fin,
-                    "vigencia_meses": c.vigencia_meses,
-                    "monto": float(c.monto or 0),
-                    "comision_porcentaje": float(c.comision_porcentaje or 0),
-                    "comision_monto": float(c.comision_monto or 0),
-                    "inmueble": {
-                        "id": c.inmueble.id if c.inmueble else None,
-                        "titulo": c.inmueble.titulo if c.inmueble else None,
-                        "direccion": c.inmueble.direccion if c.inmueble else None,
-                        "zona": c.inmueble.zona if c.inmueble else None,
-                        "ciudad": c.inmueble.ciudad if c.inmueble else None,
-                    },
-                    "agente": {
-                        "id": c.agente.id if c.agente else None,
-                        "nombre": c.agente.nombre if c.agente else None,
-                    },
-                    "propietario": {
-                        "nombre": c.parte_contratante_nombre,
-                        "ci": c.parte_contratante_ci,
-                    },
-                    "inquilino": {
-                        "nombre": c.parte_contratada_nombre,
-                        "ci": c.parte_contratada_ci,
-                    },
-                    "pdf_url": f"/media/{c.archivo_pdf}" if c.archivo_pdf else None,
-                    "fecha_creacion": c.fecha_creacion,
-                }
+        if request.GET.get("exportar", "false").lower() == "true":
+            return StreamingHttpResponse(
+                flujo_asincrono(listado.json_en_bloques(contratos, mensaje)),
+                content_type="application/json",
             )
 
+        if cursor or request.GET.get("limite"):
+            try:
+                data, siguiente = listado.pagina(
+                    contratos, cursor=cursor, cantidad=listado.limite(request.GET.get("limite"))
+                )
+            except ValueError as e:
+                return Response(
+                    {"status": 0, "error": 1, "message": str(e), "values": {}},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            values = {"contratos": data, "siguiente": siguiente}
+        else:
+            values = {"contratos": [listado.formatear(fila) for fila in listado.filas(contratos)]}
+
         return Response(
             {
                 "status": 1,
                 "error": 0,
-                "message": "LISTADO DE CONTRATOS REGISTRADOS",
-                "values": {"contratos": data},
+                "message": mensaje,
+                "values": values,
             }
         )
 
@@ -1576,37 +1251,37 @@ def detalle_contrato_pdf(request, contrato_id):
 
         # 📦 Si se pide descarga directa del PDF
         if request.GET.get("descargar", "false").lower() == "true":
-            if not contrato.archivo_pdf:
+            if not puede_ver_contrato(request.user, contrato):
                 return Response(
                     {
                         "status": 0,
                         "error": 1,
-                        "message": "El contrato no tiene archivo PDF asociado.",
+                        "message": "No tiene permisos para ver este contrato.",
                         "values": {},
                     },
-                    status=404,
+                    status=403,
                 )
 
-            pdf_path = os.path.join(settings.MEDIA_ROOT, contrato.archivo_pdf.name)
-            if not os.path.exists(pdf_path):
+            pdf_path = _ruta_pdf_contrato(contrato)
+            if pdf_path is None:
                 return Response(
                     {
                         "status": 0,
                         "error": 1,
-                        "message": "El archivo PDF no existe en el servidor.",
+                        "message": (
+                            "El archivo PDF no existe en el servidor."
+                            if contrato.archivo_pdf
+                            else "El contrato no tiene archivo PDF asociado."
+                        ),
                         "values": {},
                     },
                     status=404,
                 )
 
             # 📥 Responder como archivo descargable
-            response = FileResponse(
-                open(pdf_path, "rb"), content_type="application/pdf"
-            )
-            response["Content-Disposition"] = (
-                f'attachment; filename="{os.path.basename(pdf_path)}"'
+            return servir_archivo(
+                request, pdf_path, _nombre_pdf_contrato(contrato), content_type="application/pdf"
             )
-            return response
 
         # 📄 Si no se pide descarga → devolver datos JSON completos
         data = {
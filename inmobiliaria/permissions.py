@@ -72,4 +72,33 @@ def has_permission(usuario, componente_nombre, accion):
 requiere_lectura = lambda componente: requiere_permiso(componente, "leer")
 requiere_creacion = lambda componente: requiere_permiso(componente, "crear")
 requiere_actualizacion = lambda componente: requiere_permiso(componente, "actualizar")
-requiere_eliminacion = lambda componente: requiere_permiso(componente, "eliminar")
\ No newline at end of file
+requiere_eliminacion = lambda componente: requiere_permiso(componente, "eliminar")
+
+# Permisos por objeto (descarga de archivos de contratos y comprobantes)
+
+def es_administrador(usuario):
+    return bool(
+        usuario.is_authenticated and (
+            usuario.is_staff or usuario.is_superuser
+            or (getattr(usuario, "grupo", None) and usuario.grupo.nombre.lower() == "administrador")
+        )
+    )
+
+def puede_ver_contrato(usuario, contrato):
+    """Administración, el agente del contrato, su cliente o quien lo creó."""
+    if not usuario.is_authenticated:
+        return False
+    return es_administrador(usuario) or usuario.id in (
+        contrato.agente_id, contrato.id_cliente_id, contrato.creado_por_id
+    )
+
+def puede_ver_comprobante(usuario, comprobante):
+    """Administración, el cliente del pago, quien subió el comprobante o quien puede ver el contrato."""
+    if not usuario.is_authenticated:
+        return False
+    pago = comprobante.pago
+    return (
+        es_administrador(usuario)
+        or usuario.id in (pago.cliente_id, comprobante.usuario_registro_id)
+        or puede_ver_contrato(usuario, pago.contrato)
+    )
@@ -90,13 +90,42 @@ TEMPLATES = [
 # WSGI_APPLICATION = 'inmobiliaria.wsgi.application'
 ASGI_APPLICATION = "inmobiliaria.asgi.application" #chat en tiempo real
 
+# Con varios procesos (workers ASGI) la caché y el channel layer tienen que ser
+# compartidos: REDIS_URL=redis://host:6379/0 usa Redis para ambos (paquetes redis y
+# channels-redis). Sin REDIS_URL quedan en memoria de cada proceso (un solo worker).
+REDIS_URL = config("REDIS_URL", default="")
+
 #chat en tiempo real
 CHANNEL_LAYERS = {
     "default": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {"hosts": [REDIS_URL]},
+    } if REDIS_URL else {
         "BACKEND": "channels.layers.InMemoryChannelLayer",
     },
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+    } if REDIS_URL else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+# Presencia del chat (claves por conexión en la caché compartida, ver contacto/presence.py)
+CHAT_PRESENCIA_TTL = 60  # segundos sin latido para considerar desconectada una conexión
+CHAT_PRESENCIA_LATIDO = 20  # cada cuántos segundos el servidor renueva las conexiones abiertas
+CHAT_ESCRIBIENDO_INTERVALO = 3  # mínimo de segundos entre eventos "escribiendo" por chat
+
+# Límites por conexión websocket
+CHAT_WS_MAX_FRAME_BYTES = 8 * 1024  # frames más grandes cierran la conexión (1009)
+CHAT_WS_FRAMES_POR_SEGUNDO = 5  # tasa sostenida del token bucket
+CHAT_WS_RAFAGA = 20  # capacidad del token bucket
+CHAT_WS_COLA_ENVIO_MAX = 100  # frames pendientes antes de desconectar al cliente lento (4008)
+CHAT_WS_ENVIO_TIMEOUT = 10  # segundos máximos para entregar un frame
+
  #Database
 #https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 DATABASES = {
@@ -160,6 +189,9 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Archivos generados y subidos (PDFs de contratos, comprobantes, exportaciones)
+MEDIA_ROOT = config("MEDIA_ROOT", default=str(BASE_DIR / "media"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -173,6 +205,8 @@ CORS_ALLOWED_ORIGINS = [
     "https://inmueble-front.vercel.app",
     "https://inmueble-front-production.up.railway.app"
 ]
+# Cursor de la página siguiente de los reportes dinámicos
+CORS_EXPOSE_HEADERS = ["X-Cursor-Siguiente"]
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication",
@@ -200,6 +234,74 @@ EMAIL_TIMEOUT = 30
 
 ALERTAS_AUTO_DELETE_INVALID_DEVICE = True # o False (por defecto)
 
+# Plantillas .txt de contratos: se leen una vez por proceso; con True se vuelven a
+# leer si cambia el archivo (para editarlas sin reiniciar)
+CONTRATOS_PLANTILLAS_RECARGAR = DEBUG
+# PDFs de contratos generados con los datos guardados (carpeta dentro de MEDIA_ROOT);
+# los huérfanos se borran con `manage.py limpiar_pdfs_contratos`
+CONTRATOS_PDF_DIR = "contratos/generados"
+# Exportación de contratos en ZIP: procesos que generan PDFs en paralelo (None = uno por núcleo)
+# y pools abiertos a la vez en el servidor (el resto de los pedidos genera de a uno)
+CONTRATOS_LOTE_PROCESOS = None
+CONTRATOS_LOTE_POOLS = 1
+# Segundos que se cachea el dashboard de comisiones por combinación de filtros
+# (se invalida al guardar o borrar contratos)
+CONTRATOS_COMISIONES_TTL = 300
+# Listado de contratos paginado: contratos por página por defecto y máximo
+CONTRATOS_LISTADO_LIMITE = 100
+CONTRATOS_LISTADO_LIMITE_MAX = 500
+# Contratos que `manage.py vencer_contratos` pasa a 'finalizado' por cada UPDATE
+CONTRATOS_VENCIMIENTO_LOTE = 500
+# Alta masiva de contratos (contrato/importacion.py): filas que se validan y
+# guardan por transacción y filas por INSERT
+CONTRATOS_IMPORTACION_LOTE = 200
+CONTRATOS_IMPORTACION_LOTE_BD = 500
+# Contratos importados cuyo PDF genera `manage.py generar_pdfs_pendientes` por vuelta
+CONTRATOS_PDF_PENDIENTES_LOTE = 100
+# Descarga de archivos de MEDIA_ROOT (contratos, comprobantes): "x-accel" (nginx envía
+# el archivo: location interna en ARCHIVOS_X_ACCEL_PREFIJO que apunta a MEDIA_ROOT),
+# "x-sendfile" (Apache/lighttpd con mod_xsendfile) o "django" (el worker ASGI lee y
+# envía el archivo por bloques, sin sendfile). En producción conviene un proxy.
+ARCHIVOS_ENTREGA = config("ARCHIVOS_ENTREGA", default="django")
+ARCHIVOS_X_ACCEL_PREFIJO = "/protegido/"
+
+# Dashboard de reportes: segundos de caché fresca, ventana en la que se sirve
+# el valor viejo mientras se recalcula, y consultas en paralelo
+REPORTES_DASHBOARD_TTL = 60
+REPORTES_DASHBOARD_STALE = 300
+REPORTES_DASHBOARD_HILOS = 4
+# Máximo de períodos por consulta en reporte_comparativo
+REPORTES_COMPARATIVO_MAX_PERIODOS = 24
+# Exportación Excel: bytes que se mantienen en memoria antes de pasar a un archivo temporal
+REPORTES_EXCEL_SPOOL_BYTES = 5 * 1024 * 1024
+# PDF de reportes: filas por bloque de tabla (None = las que entran en una página) y
+# filas de muestra para calcular el ancho de las columnas
+REPORTES_PDF_FILAS_POR_BLOQUE = None
+REPORTES_PDF_MUESTRA_ANCHOS = 200
+# Exportación desde consulta (ExportarDatosView): filas por bloque del cursor y tope de filas
+REPORTES_EXPORT_CHUNK_SIZE = 2000
+REPORTES_EXPORT_MAX_ROWS = 200000
+# Exportaciones en segundo plano: carpeta dentro de MEDIA_ROOT, vigencia de los archivos,
+# tiempo máximo de un trabajo, cada cuántas filas se guarda el avance e hilos del pool.
+# Las procesa `manage.py procesar_exportaciones --continuo`; con REPORTES_EXPORT_EN_HILO
+# = True también hilos del proceso web (desarrollo: se pierden al reiniciar).
+REPORTES_EXPORT_DIR = "exportaciones"
+REPORTES_EXPORT_TTL_HORAS = 24
+REPORTES_EXPORT_TIMEOUT_MINUTOS = 30
+REPORTES_EXPORT_PROGRESO = 500
+REPORTES_EXPORT_HILOS = 2
+REPORTES_EXPORT_EN_HILO = False
+# Reportes dinámicos: planes de consulta compilados y resultados cacheados por proceso
+# (LRU); los resultados además vencen a los REPORTES_RESULTADOS_TTL segundos
+REPORTES_PLANES_MAX = 256
+REPORTES_RESULTADOS_MAX = 128
+REPORTES_RESULTADOS_TTL = 120
+REPORTES_RESULTADO_MAX_BYTES = 2 * 1024 * 1024
+# Reportes dinámicos en pantalla: filas por página (el resto se pide con el cursor
+# del header X-Cursor-Siguiente) y filas por bloque de la respuesta JSON
+REPORTES_MAX_ROWS = 1000
+REPORTES_JSON_CHUNK_SIZE = 500
+
 # Stripe Keys
 STRIPE_SECRET_KEY = config("STRIPE_SECRET_KEY", default="")
 STRIPE_PUBLIC_KEY = config("STRIPE_PUBLIC_KEY", default="")
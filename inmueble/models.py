@@ -44,6 +44,8 @@ class InmuebleModel(models.Model):
     latitud = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitud = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # Nulo en los inmuebles registrados antes de agregar el campo
+    fecha_creacion = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     def __str__(self):
         return f"{self.titulo or 'Inmueble sin título'} - {self.tipo_operacion} ({self.estado})"
     
@@ -12,6 +12,8 @@ from inmobiliaria.permissions import requiere_permiso
 from datetime import date
 from django.db.models import Q, Count
 from suscripciones.models import Suscripcion
+from suscripciones.cuotas import reservar_cupo, LimitePlanAlcanzado
+from contextlib import nullcontext
 # Create your views here.
 #TIPO DE INMUEBLES
 
@@ -123,21 +125,7 @@ def agente_registrar_inmueble(request):
                     "message": "Tu suscripción ha vencido. Por favor renueva tu plan para seguir publicando."
                 }, status=403)
             
-            # Contar cuántos inmuebles activos tiene ya este agente
-            cantidad_actual = InmuebleModel.objects.filter(
-                agente=usuario, 
-                is_active=True
-            ).count()
-            
             limite = suscripcion.plan.limite_inmuebles
-            
-            # 2. Comparar con el límite del plan
-            if cantidad_actual >= limite:
-                return Response({
-                    "status": 0, 
-                    "error": 1, 
-                    "message": f"Has alcanzado tu límite de {limite} inmuebles. Mejora tu plan a PRO para publicar más."
-                }, status=403)
                 
         except Suscripcion.DoesNotExist:
             # Si no tiene suscripción registrada
@@ -152,7 +140,20 @@ def agente_registrar_inmueble(request):
 
     serializer = InmuebleSerializer(data=data)
     if serializer.is_valid():
-        inmueble = serializer.save()
+        # El cupo se reserva con un UPDATE condicional sobre el contador del agente
+        # (sin COUNT de inmuebles); staff/admin no tienen límite.
+        cupo = nullcontext()
+        if not (usuario.is_staff or usuario.is_superuser):
+            cupo = reservar_cupo(usuario.id, "inmuebles", limite)
+        try:
+            with cupo:
+                inmueble = serializer.save()
+        except LimitePlanAlcanzado:
+            return Response({
+                "status": 0, 
+                "error": 1, 
+                "message": f"Has alcanzado tu límite de {limite} inmuebles. Mejora tu plan a PRO para publicar más."
+            }, status=403)
 
         # 👇 CAMBIO MÍNIMO: crear fotos desde URLs si vinieron
         urls = request.data.get('fotos_urls', [])
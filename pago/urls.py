@@ -14,8 +14,8 @@ from .views import (
     ListarPagosPorContrato,
     ObtenerDetallePago,
     simular_webhook_stripe,
-    verificar_estado_pago
-    
+    verificar_estado_pago,
+    descargar_comprobante,
 )
 
 urlpatterns = [
@@ -36,6 +36,9 @@ urlpatterns = [
     
     # GET: Detalle de un pago
     path('detalle/<int:pago_id>/', ObtenerDetallePago.as_view(), name='pago-detalle'),
+
+    # GET: Archivo del comprobante de un pago (cliente del pago, agente del contrato o admin)
+    path('comprobante/<int:pago_id>/archivo/', descargar_comprobante, name='pago-comprobante-archivo'),
     
     # ------------------ RUTAS DE GESTIÓN (ADMIN EXCLUSIVO) ------------------
     # PATCH: Confirma o rechaza un pago manual pendiente
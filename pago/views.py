@@ -22,6 +22,10 @@ from .models import Pago, ComprobantePago
 from .serializers import PagoSerializer, PagoGestionSerializer,ComprobantePagoSerializer
 # Asumo que Contrato tiene el campo 'id_cliente' que apunta a 'Usuario'
 from contrato.models import Contrato 
+from contrato import estados
+from inmobiliaria.permissions import puede_ver_comprobante
+from utils.archivos import servir_archivo
+import os
 
 import stripe #
 # -------------------------------------------------------------
@@ -191,9 +195,8 @@ def webhook_pasarela_confirmacion(request):
 
                 # Si el total pagado cubre el monto total del contrato Y el contrato está pendiente
                 if monto_pagado_total >= contrato.monto and contrato.estado == 'pendiente':
-                    contrato.estado = 'activo'
-                    contrato.fecha_inicio = timezone.now().date() 
-                    contrato.save()
+                    contrato.fecha_inicio = timezone.now().date()
+                    estados.transicionar(contrato, 'activo', motivo='pago', campos=['fecha_inicio'])
                 
                 return Response({'message': 'Pago y Contrato actualizados'}, status=status.HTTP_200_OK)
 
@@ -559,4 +562,32 @@ def simular_webhook_stripe(request, pago_id):
             "status": 0,
             "error": 1,
             "message": f"Error en simulación: {str(e)}"
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def descargar_comprobante(request, pago_id):
+    """
+    Descarga (o muestra con ?descargar=false) el archivo del comprobante de un pago.
+    Solo para administración, el cliente del pago, quien lo subió o quien puede
+    ver el contrato. Soporta Range y ETag (ver utils/archivos.py).
+    """
+    comprobante = (
+        ComprobantePago.objects.select_related("pago__contrato")
+        .filter(pago_id=pago_id)
+        .first()
+    )
+    if comprobante is None:
+        return Response({"error": "Comprobante no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+    if not puede_ver_comprobante(request.user, comprobante):
+        return Response({"error": "No tienes permisos para ver este comprobante"}, status=status.HTTP_403_FORBIDDEN)
+    if not comprobante.archivo_comprobante:
+        return Response({"error": "El comprobante no tiene archivo"}, status=status.HTTP_404_NOT_FOUND)
+
+    ruta = os.path.join(settings.MEDIA_ROOT, comprobante.archivo_comprobante.name)
+    if not os.path.exists(ruta):
+        return Response({"error": "El archivo no se encuentra en el servidor"}, status=status.HTTP_404_NOT_FOUND)
+
+    descargar = request.GET.get("descargar", "true").lower() == "true"
+    return servir_archivo(request, ruta, descargar=descargar)
@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import TrabajoExportacion
+
+
+@admin.register(TrabajoExportacion)
+class TrabajoExportacionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'usuario', 'formato', 'estado', 'filas_procesadas', 'filas_totales', 'creado_en', 'expira_en')
+    list_filter = ('estado', 'formato')
+    readonly_fields = ('spec_hash',)
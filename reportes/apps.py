@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ReportesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reportes'
+
+    # Conecta las señales que invalidan la caché de resultados de los reportes
+    def ready(self):
+        import reportes.signals
@@ -0,0 +1,52 @@
+# reportes/cache.py
+"""
+Caché de resultados de reportes con semántica stale-while-revalidate:
+
+- Dentro de `ttl` segundos el valor se sirve tal cual.
+- Entre `ttl` y `ttl + stale` se sirve el valor viejo y se recalcula en un
+  hilo en segundo plano (solo un hilo por clave, con un lock en la caché).
+- Pasado ese tiempo (o sin valor) se calcula en la misma petición.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _guardar(clave, valor, ttl, stale):
+    cache.set(clave, {'valor': valor, 'creado': time.time()}, timeout=ttl + stale)
+
+
+def _recalcular_en_segundo_plano(clave, calcular, ttl, stale):
+    lock = f'{clave}:recalculando'
+    if not cache.add(lock, True, timeout=max(ttl, 30)):
+        return  # Otro proceso/hilo ya lo está recalculando
+
+    def tarea():
+        try:
+            _guardar(clave, calcular(), ttl, stale)
+        except Exception:
+            logger.exception(f'Error recalculando la caché {clave}')
+        finally:
+            cache.delete(lock)
+            connections.close_all()
+
+    threading.Thread(target=tarea, daemon=True).start()
+
+
+def obtener_o_calcular(clave, calcular, ttl=60, stale=300):
+    """Devuelve el valor cacheado de `clave` o lo calcula con `calcular()`."""
+    entrada = cache.get(clave)
+    if entrada is not None:
+        edad = time.time() - entrada['creado']
+        if edad >= ttl:
+            _recalcular_en_segundo_plano(clave, calcular, ttl, stale)
+        return entrada['valor']
+
+    valor = calcular()
+    _guardar(clave, valor, ttl, stale)
+    return valor
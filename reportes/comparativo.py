@@ -0,0 +1,167 @@
+# reportes/comparativo.py
+"""
+Comparación de N períodos (semanas, meses o rangos arbitrarios).
+
+Cada tabla se consulta UNA sola vez para todos los períodos: se filtra por el
+rango total y se agrupa por una etiqueta de período calculada con CASE/WHEN,
+así que agregar períodos no agrega consultas.
+"""
+from datetime import date, timedelta
+
+from django.db import models
+from django.db.models import Count, Sum, Case, When, Value, DecimalField
+from django.db.models.functions import Coalesce
+
+from usuario.models import Usuario
+from inmueble.models import InmuebleModel, AnuncioModel
+from contrato.models import Contrato
+from cita.models import Cita
+
+
+# (modelo, campo de fecha, {métrica: agregado}): una consulta por entrada
+CONSULTAS = [
+    (InmuebleModel, 'fecha_creacion', {'inmuebles': Count('id')}),
+    (Contrato, 'fecha_creacion', {
+        'contratos': Count('id'),
+        'ingresos': Coalesce(Sum('comision_monto'), 0, output_field=DecimalField()),
+    }),
+    (Usuario, 'date_joined', {'usuarios_nuevos': Count('id')}),
+    (AnuncioModel, 'fecha_publicacion', {'anuncios': Count('id')}),
+    (Cita, 'fecha_cita', {'citas': Count('id')}),
+]
+
+METRICAS = [nombre for _, _, agregados in CONSULTAS for nombre in agregados]
+
+
+class PeriodosInvalidos(ValueError):
+    pass
+
+
+# ============================================
+# Construcción de períodos
+# ============================================
+
+def _inicio_mes(dia, meses_atras=0):
+    mes = dia.year * 12 + dia.month - 1 - meses_atras
+    return date(mes // 12, mes % 12 + 1, 1)
+
+
+def periodos_consecutivos(granularidad, cantidad, hasta):
+    """Los últimos `cantidad` períodos ('dia', 'semana' o 'mes') que terminan en `hasta`."""
+    periodos = []
+    for i in range(cantidad - 1, -1, -1):
+        if granularidad == 'mes':
+            inicio = _inicio_mes(hasta, i)
+            fin = _inicio_mes(hasta, i - 1) - timedelta(days=1)
+            etiqueta = inicio.strftime('%Y-%m')
+        elif granularidad == 'semana':
+            inicio = hasta - timedelta(days=hasta.weekday(), weeks=i)
+            fin = inicio + timedelta(days=6)
+            anio, semana, _ = inicio.isocalendar()
+            etiqueta = f'{anio}-W{semana:02d}'
+        elif granularidad == 'dia':
+            inicio = fin = hasta - timedelta(days=i)
+            etiqueta = inicio.isoformat()
+        else:
+            raise PeriodosInvalidos(f"Granularidad no soportada: {granularidad}")
+        periodos.append({'etiqueta': etiqueta, 'inicio': inicio, 'fin': min(fin, hasta)})
+    return periodos
+
+
+def periodo_rango(inicio, fin, etiqueta=None):
+    return {'etiqueta': etiqueta or f'{inicio.isoformat()} a {fin.isoformat()}', 'inicio': inicio, 'fin': fin}
+
+
+def validar_cantidad(cantidad, maximo):
+    """Antes de construir los períodos: entre 1 y `maximo`."""
+    if cantidad < 1:
+        raise PeriodosInvalidos("Debe indicar al menos un período")
+    if cantidad > maximo:
+        raise PeriodosInvalidos(f"Se permiten como máximo {maximo} períodos")
+
+
+def validar_periodos(periodos, maximo):
+    if not periodos:
+        raise PeriodosInvalidos("Debe indicar al menos un período")
+    if len(periodos) > maximo:
+        raise PeriodosInvalidos(f"Se permiten como máximo {maximo} períodos")
+    for p in periodos:
+        if p['inicio'] > p['fin']:
+            raise PeriodosInvalidos(f"Período inválido: {p['etiqueta']}")
+    # Cada fila cae en un solo bucket del CASE: los períodos no pueden solaparse
+    ordenados = sorted(periodos, key=lambda p: p['inicio'])
+    for anterior, siguiente in zip(ordenados, ordenados[1:]):
+        if siguiente['inicio'] <= anterior['fin']:
+            raise PeriodosInvalidos(
+                f"Los períodos {anterior['etiqueta']} y {siguiente['etiqueta']} se solapan"
+            )
+
+
+# ============================================
+# Cálculo
+# ============================================
+
+def _lookup_dia(modelo, campo):
+    es_datetime = isinstance(modelo._meta.get_field(campo), models.DateTimeField)
+    return f'{campo}__date' if es_datetime else campo
+
+
+def _metricas_por_periodo(modelo, campo, agregados, periodos):
+    lookup = _lookup_dia(modelo, campo)
+    bucket = Case(
+        *[
+            When(**{f'{lookup}__gte': p['inicio'], f'{lookup}__lte': p['fin']}, then=Value(i))
+            for i, p in enumerate(periodos)
+        ],
+        default=None,
+        output_field=models.IntegerField(),
+    )
+    filas = (
+        modelo.objects.filter(**{
+            f'{lookup}__gte': min(p['inicio'] for p in periodos),
+            f'{lookup}__lte': max(p['fin'] for p in periodos),
+        })
+        .annotate(r_periodo=bucket)
+        .order_by()
+        .values('r_periodo')
+        .annotate(**agregados)
+    )
+    return {fila.pop('r_periodo'): fila for fila in filas}
+
+
+def calcular_variacion(valor, base):
+    if base == 0:
+        return 0 if valor == 0 else 100
+    return ((valor - base) / base) * 100
+
+
+def variaciones(actual, anterior):
+    return {
+        nombre: round(calcular_variacion(actual[nombre], anterior[nombre]), 2)
+        for nombre in METRICAS
+    }
+
+
+def comparar_periodos(periodos):
+    """
+    Métricas de cada período (en el orden recibido) y su variación porcentual
+    respecto al período anterior de la lista.
+    """
+    resultados = [{nombre: 0 for nombre in METRICAS} for _ in periodos]
+    for modelo, campo, agregados in CONSULTAS:
+        for indice, valores in _metricas_por_periodo(modelo, campo, agregados, periodos).items():
+            if indice is None:
+                continue  # Dentro del rango total pero entre dos períodos
+            resultados[indice].update(valores)
+
+    salida = []
+    for i, (periodo, metricas) in enumerate(zip(periodos, resultados)):
+        metricas['ingresos'] = float(metricas['ingresos'])
+        salida.append({
+            'etiqueta': periodo['etiqueta'],
+            'inicio': periodo['inicio'].isoformat(),
+            'fin': periodo['fin'].isoformat(),
+            'metricas': metricas,
+            'variaciones_porcentuales': variaciones(metricas, resultados[i - 1]) if i else None,
+        })
+    return salida
@@ -0,0 +1,214 @@
+# reportes/exportaciones.py
+"""
+Exportaciones asíncronas de reportes (PDF, Excel, CSV).
+
+- `encolar()` crea un TrabajoExportacion a partir de la especificación
+  (builder o interpretación, como ExportarDatosView). Si el mismo usuario
+  ya tiene un trabajo idéntico en curso o terminado y vigente, se reutiliza.
+- `ejecutar()` arma el archivo en MEDIA_ROOT/<REPORTES_EXPORT_DIR> e informa
+  el avance (filas procesadas / totales) cada REPORTES_EXPORT_PROGRESO filas.
+  Lo ejecuta el worker `manage.py procesar_exportaciones --continuo`: la cola
+  es la tabla de trabajos, así que sobrevive a reinicios. Con
+  REPORTES_EXPORT_EN_HILO también se puede ejecutar en un pool de hilos del
+  proceso web (solo para desarrollo: un reinicio deja el trabajo pendiente
+  hasta que lo tome el worker).
+- `limpiar()` borra los archivos vencidos y marca como error los trabajos
+  que quedaron colgados.
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import TrabajoExportacion
+from .generators import escribir_pdf, escribir_excel, escribir_csv
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+EXPORT_DIR = getattr(settings, 'REPORTES_EXPORT_DIR', 'exportaciones')
+EXPORT_TTL = timedelta(hours=getattr(settings, 'REPORTES_EXPORT_TTL_HORAS', 24))
+EXPORT_TIMEOUT = timedelta(minutes=getattr(settings, 'REPORTES_EXPORT_TIMEOUT_MINUTOS', 30))
+EXPORT_PROGRESO = getattr(settings, 'REPORTES_EXPORT_PROGRESO', 500)
+EXPORT_HILOS = getattr(settings, 'REPORTES_EXPORT_HILOS', 2)
+# True: además del worker, un pool de hilos del proceso web (desarrollo)
+EXPORT_EN_HILO = getattr(settings, 'REPORTES_EXPORT_EN_HILO', False)
+
+EXTENSIONES = {'pdf': 'pdf', 'excel': 'xlsx', 'csv': 'csv'}
+EN_CURSO = ('pendiente', 'procesando')
+
+_pool = ThreadPoolExecutor(max_workers=EXPORT_HILOS, thread_name_prefix='exportacion') if EXPORT_EN_HILO else None
+
+
+def calcular_hash(formato, titulo, spec, usuario_id=None):
+    # Con el usuario: cada trabajo (y su archivo) es solo de quien lo pidió
+    contenido = json.dumps([formato, titulo, spec, usuario_id], sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def ruta_absoluta(trabajo):
+    return os.path.join(settings.MEDIA_ROOT, trabajo.archivo)
+
+
+def _vigente(spec_hash):
+    """Trabajo idéntico en curso, o terminado y con su archivo aún disponible."""
+    return (
+        TrabajoExportacion.objects.filter(spec_hash=spec_hash, estado__in=EN_CURSO).first()
+        or TrabajoExportacion.objects.filter(
+            spec_hash=spec_hash, estado='completado', expira_en__gt=timezone.now()
+        ).first()
+    )
+
+
+def encolar(usuario, formato, titulo, spec):
+    """
+    Crea (o reutiliza) el trabajo de exportación. Retorna (trabajo, creado).
+    """
+    spec_hash = calcular_hash(formato, titulo, spec, usuario.pk)
+    existente = _vigente(spec_hash)
+    if existente:
+        return existente, False
+
+    try:
+        with transaction.atomic():
+            trabajo = TrabajoExportacion.objects.create(
+                usuario=usuario, formato=formato, titulo=titulo, spec=spec, spec_hash=spec_hash,
+            )
+    except IntegrityError:
+        # Otro pedido idéntico lo creó en paralelo (restricción única en curso)
+        existente = _vigente(spec_hash)
+        if existente:
+            return existente, False
+        raise
+
+    if EXPORT_EN_HILO:
+        transaction.on_commit(lambda: _pool.submit(_ejecutar_en_hilo, trabajo.id))
+    return trabajo, True
+
+
+def _ejecutar_en_hilo(trabajo_id):
+    try:
+        ejecutar(trabajo_id)
+    except Exception:
+        logger.exception(f'Error procesando la exportación {trabajo_id}')
+    finally:
+        connections.close_all()
+
+
+def _contar_progreso(filas, trabajo_id):
+    procesadas = 0
+    for fila in filas:
+        yield fila
+        procesadas += 1
+        if procesadas % EXPORT_PROGRESO == 0:
+            TrabajoExportacion.objects.filter(pk=trabajo_id).update(filas_procesadas=procesadas)
+    TrabajoExportacion.objects.filter(pk=trabajo_id).update(filas_procesadas=procesadas)
+
+
+def ejecutar(trabajo_id):
+    """
+    Genera el archivo del trabajo. Solo lo procesa quien logra pasarlo de
+    'pendiente' a 'procesando', así el hilo y el comando no se pisan.
+    Retorna True si lo procesó.
+    """
+    tomado = TrabajoExportacion.objects.filter(pk=trabajo_id, estado='pendiente').update(
+        estado='procesando', iniciado_en=timezone.now()
+    )
+    if not tomado:
+        return False
+
+    # Import diferido: views importa este módulo
+    from .views import ExportarDatosView, EXPORT_CHUNK_SIZE
+
+    trabajo = TrabajoExportacion.objects.get(pk=trabajo_id)
+    relativa = os.path.join(
+        EXPORT_DIR, f"reporte_{trabajo.id}_{trabajo.spec_hash[:12]}.{EXTENSIONES[trabajo.formato]}"
+    )
+    ruta = os.path.join(settings.MEDIA_ROOT, relativa)
+
+    try:
+        queryset = ExportarDatosView()._queryset_desde_spec(
+            trabajo.spec.get('builder'), trabajo.spec.get('interpretacion')
+        )
+        total = queryset.count()
+        TrabajoExportacion.objects.filter(pk=trabajo.id).update(filas_totales=total)
+
+        filas = _contar_progreso(queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE), trabajo.id)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+        if trabajo.formato == 'excel':
+            escribir_excel(filas, trabajo.titulo, ruta)
+        elif trabajo.formato == 'csv':
+            with open(ruta, 'w', encoding='utf-8', newline='') as destino:
+                escribir_csv(filas, destino)
+        else:
+            escribir_pdf(filas, trabajo.titulo, ruta)
+    except Exception as e:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        TrabajoExportacion.objects.filter(pk=trabajo.id).update(
+            estado='error', error=str(e), finalizado_en=timezone.now()
+        )
+        raise
+
+    ahora = timezone.now()
+    TrabajoExportacion.objects.filter(pk=trabajo.id).update(
+        estado='completado', archivo=relativa, finalizado_en=ahora, expira_en=ahora + EXPORT_TTL
+    )
+    return True
+
+
+def limpiar():
+    """
+    Borra los archivos vencidos (el trabajo queda como 'expirado') y marca
+    como error los trabajos que superaron REPORTES_EXPORT_TIMEOUT_MINUTOS:
+    los pendientes desde que se crearon y los que se están procesando desde
+    que empezaron (el tiempo en cola no cuenta). Retorna (expirados, colgados).
+    """
+    ahora = timezone.now()
+
+    vencidos = TrabajoExportacion.objects.filter(estado='completado', expira_en__lte=ahora)
+    expirados = 0
+    for trabajo in vencidos.only('id', 'archivo'):
+        ruta = ruta_absoluta(trabajo)
+        if trabajo.archivo and os.path.exists(ruta):
+            os.remove(ruta)
+        expirados += TrabajoExportacion.objects.filter(pk=trabajo.id, estado='completado').update(
+            estado='expirado', archivo=''
+        )
+
+    limite = ahora - EXPORT_TIMEOUT
+    colgados = TrabajoExportacion.objects.filter(
+        Q(estado='pendiente', creado_en__lte=limite) | Q(estado='procesando', iniciado_en__lte=limite)
+    ).update(estado='error', error='Tiempo de procesamiento agotado', finalizado_en=ahora)
+
+    return expirados, colgados
+
+
+def a_dict(trabajo):
+    """Representación para la API (estado y avance)."""
+    porcentaje = None
+    if trabajo.filas_totales:
+        porcentaje = round(trabajo.filas_procesadas * 100 / trabajo.filas_totales, 1)
+    elif trabajo.estado == 'completado':
+        porcentaje = 100.0
+    return {
+        'id': trabajo.id,
+        'formato': trabajo.formato,
+        'titulo': trabajo.titulo,
+        'estado': trabajo.estado,
+        'filas_procesadas': trabajo.filas_procesadas,
+        'filas_totales': trabajo.filas_totales,
+        'porcentaje': porcentaje,
+        'error': trabajo.error or None,
+        'creado_en': trabajo.creado_en.isoformat() if trabajo.creado_en else None,
+        'finalizado_en': trabajo.finalizado_en.isoformat() if trabajo.finalizado_en else None,
+        'expira_en': trabajo.expira_en.isoformat() if trabajo.expira_en else None,
+    }
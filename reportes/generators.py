@@ -1,15 +1,24 @@
 # reportes/generators.py
+import csv
 import datetime
+import itertools
+import tempfile
 from decimal import Decimal
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
 from openpyxl.utils import get_column_letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Flowable
 from reportlab.lib.pagesizes import letter, landscape
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from utils.flujos import flujo_asincrono, leer_archivo
 
 def _limpiar_valor(valor):
     """Convierte valores especiales (Decimal, Fecha, None) a strings legibles."""
@@ -22,130 +31,339 @@ def _limpiar_valor(valor):
     return str(valor)
 
 # ===================================================================
-# --- GENERADOR DE REPORTE EXCEL (OPENPYXL) ---
+# --- GENERADOR DE REPORTE EXCEL (OPENPYXL, MODO WRITE-ONLY) ---
 # ===================================================================
-def generar_reporte_excel(data, interpretacion):
+EXCEL_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Hasta este tamaño el archivo se arma en memoria; por encima se pasa a disco
+EXCEL_SPOOL_BYTES = getattr(settings, 'REPORTES_EXCEL_SPOOL_BYTES', 5 * 1024 * 1024)
+
+
+def _estilos_excel():
+    """Estilos con nombre: se registran una vez por libro y las celdas solo los referencian."""
+    borde = Side(style='thin')
+    border_thin = Border(left=borde, right=borde, top=borde, bottom=borde)
+
+    titulo = NamedStyle(name='titulo')
+    titulo.font = Font(bold=True, size=14)
+    titulo.alignment = Alignment(horizontal='left')
+
+    encabezado = NamedStyle(name='encabezado')
+    encabezado.font = Font(bold=True, color="FFFFFF")
+    encabezado.fill = PatternFill(start_color='004A99', end_color='004A99', fill_type='solid')  # Azul corporativo
+    encabezado.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    encabezado.border = border_thin
+
+    celda = NamedStyle(name='celda')
+    celda.border = border_thin
+
+    numero = NamedStyle(name='numero')
+    numero.border = border_thin
+    numero.number_format = '#,##0.00'
+
+    fecha = NamedStyle(name='fecha')
+    fecha.border = border_thin
+    fecha.number_format = 'yyyy-mm-dd'
+
+    return [titulo, encabezado, celda, numero, fecha]
+
+
+def _celda_excel(ws, valor):
+    """Celda de datos con el estilo según el tipo del valor (números y fechas quedan nativos)."""
+    if isinstance(valor, bool) or valor is None:
+        cell = WriteOnlyCell(ws, value=_limpiar_valor(valor))
+        cell.style = 'celda'
+    elif isinstance(valor, (int, float, Decimal)):
+        cell = WriteOnlyCell(ws, value=valor)
+        cell.style = 'numero'
+    elif isinstance(valor, (datetime.date, datetime.datetime)):
+        cell = WriteOnlyCell(ws, value=valor.date() if isinstance(valor, datetime.datetime) else valor)
+        cell.style = 'fecha'
+    else:
+        cell = WriteOnlyCell(ws, value=str(valor))
+        cell.style = 'celda'
+    return cell
+
+
+def escribir_excel(filas, titulo, destino):
     """
-    Genera un archivo Excel (xlsx) en memoria a partir de una lista de diccionarios.
+    Escribe un xlsx en `destino` (ruta o archivo) a partir de un iterable de
+    diccionarios, sin cargar todas las filas en memoria: openpyxl en modo
+    write_only vuelca cada fila al disco apenas se agrega. Retorna la
+    cantidad de filas escritas.
     """
-    prompt_titulo = interpretacion.get('prompt', 'Reporte')
-    
-    # --- Configuración de la Respuesta HTTP ---
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    )
-    response['Content-Disposition'] = f'attachment; filename="reporte_{datetime.date.today()}.xlsx"'
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Datos"
-
-    if not data:
-        ws['A1'] = "No se encontraron datos para este reporte."
-        wb.save(response)
-        return response
-
-    # --- Estilos ---
-    font_titulo = Font(bold=True, size=14)
-    font_header = Font(bold=True, color="FFFFFF")
-    fill_header = colors.Color(rgb='004A99') # Un azul corporativo
-    alignment_center = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    border_thin = Border(left=Side(style='thin'), 
-                         right=Side(style='thin'), 
-                         top=Side(style='thin'), 
-                         bottom=Side(style='thin'))
+    wb = Workbook(write_only=True)
+    for estilo in _estilos_excel():
+        wb.add_named_style(estilo)
+    ws = wb.create_sheet("Datos")
+
+    filas = iter(filas)
+    primera = next(filas, None)
+
+    if primera is None:
+        ws.append(["No se encontraron datos para este reporte."])
+        wb.save(destino)
+        return 0
+
+    headers = list(primera.keys())
+
+    # Anchos fijos: en write_only no hay autoajuste (se definen antes de escribir filas)
+    for col_num, header in enumerate(headers, 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = max(12, len(header) + 4)
 
     # --- Título ---
-    ws['A1'] = prompt_titulo
-    ws.merge_cells('A1:F1')
-    ws['A1'].font = font_titulo
-    ws['A1'].alignment = Alignment(horizontal='left')
+    cell = WriteOnlyCell(ws, value=titulo)
+    cell.style = 'titulo'
+    ws.append([cell])
+    ws.append([])
 
     # --- Encabezados (Headers) ---
-    headers = list(data[0].keys())
-    for col_num, header_title in enumerate(headers, 1):
-        cell = ws.cell(row=3, column=col_num, value=header_title.replace("_", " ").title())
-        cell.font = font_header
-        cell.fill = colors.PatternFill(start_color=fill_header, end_color=fill_header, fill_type="solid")
-        cell.alignment = alignment_center
-        cell.border = border_thin
+    encabezados = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header.replace("_", " ").title())
+        cell.style = 'encabezado'
+        encabezados.append(cell)
+    ws.append(encabezados)
 
     # --- Escribir Datos ---
-    row_num = 4
-    for row_data in data:
-        for col_num, header in enumerate(headers, 1):
-            valor = row_data.get(header)
-            cell = ws.cell(row=row_num, column=col_num, value=_limpiar_valor(valor))
-            cell.border = border_thin
-        row_num += 1
-
-    # --- Ajustar Ancho de Columnas (Auto-fit) ---
-    for col_num, header in enumerate(headers, 1):
-        column_letter = get_column_letter(col_num)
-        ws.column_dimensions[column_letter].autosize = True
+    total = 0
+    for fila in itertools.chain([primera], filas):
+        ws.append([_celda_excel(ws, fila.get(header)) for header in headers])
+        total += 1
+
+    wb.save(destino)
+    return total
+
 
-    # Guardar y devolver
-    wb.save(response)
+def generar_reporte_excel(data, interpretacion):
+    """
+    Genera un archivo Excel (xlsx) a partir de un iterable de diccionarios
+    (lista, generador o queryset.values().iterator()).
+    El archivo se arma en un SpooledTemporaryFile y se envía por bloques
+    (utils/flujos.py): el xlsx es un zip que openpyxl cierra al final, así
+    que no se puede emitir antes de terminar, pero la memoria no crece con
+    las filas.
+    """
+    prompt_titulo = interpretacion.get('prompt', 'Reporte')
+
+    archivo = tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_BYTES)
+    escribir_excel(data, prompt_titulo, archivo)
+    largo = archivo.tell()
+    archivo.seek(0)
+
+    # --- Configuración de la Respuesta HTTP ---
+    # leer_archivo cierra el archivo temporal al terminar de enviarlo
+    response = StreamingHttpResponse(flujo_asincrono(leer_archivo(archivo)), content_type=EXCEL_CONTENT_TYPE)
+    response['Content-Length'] = str(largo)
+    response['Content-Disposition'] = content_disposition_header(True, f"reporte_{datetime.date.today()}.xlsx")
+    return response
+
+# ===================================================================
+# --- GENERADOR DE REPORTE CSV (STREAMING) ---
+# ===================================================================
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+    def write(self, valor):
+        return valor
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, (datetime.date, datetime.datetime, datetime.time)):
+        return valor.isoformat()
+    return valor
+
+
+def _lineas_csv(filas):
+    writer = csv.writer(_Eco())
+    filas = iter(filas)
+    primera = next(filas, None)
+    # BOM para que Excel detecte UTF-8 al abrir el archivo
+    yield "\ufeff"
+    if primera is None:
+        return
+    headers = list(primera.keys())
+    yield writer.writerow([h.replace("_", " ").title() for h in headers])
+    for fila in itertools.chain([primera], filas):
+        yield writer.writerow([_valor_csv(fila.get(h)) for h in headers])
+
+
+def escribir_csv(data, destino):
+    """Escribe el CSV de un iterable de diccionarios en un archivo de texto abierto."""
+    for linea in _lineas_csv(data):
+        destino.write(linea)
+
+
+def generar_reporte_csv(data, interpretacion):
+    """
+    Genera un CSV a partir de un iterable de diccionarios. Las filas se
+    consumen a medida que se envía la respuesta; bajo ASGI las líneas pasan
+    por utils/flujos.py para que Django no las junte antes de enviarlas.
+    """
+    response = StreamingHttpResponse(flujo_asincrono(_lineas_csv(data)), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="reporte_{datetime.date.today()}.csv"'
     return response
 
 # ===================================================================
 # --- GENERADOR DE REPORTE PDF (REPORTLAB) ---
 # ===================================================================
-def generar_reporte_pdf(data, interpretacion):
+# La tabla se arma en bloques de filas de alto fijo que llenan una página, con
+# anchos de columna calculados una vez sobre una muestra: reportlab no tiene que
+# medir ni partir una tabla gigante, y el costo crece lineal con las filas.
+# Los bloques se arman recién cuando el documento llega a ellos (_Bloques): en
+# memoria queda una página de filas, no el documento entero.
+PDF_FILAS_POR_BLOQUE = getattr(settings, 'REPORTES_PDF_FILAS_POR_BLOQUE', None)  # None: una página
+PDF_MUESTRA_ANCHOS = getattr(settings, 'REPORTES_PDF_MUESTRA_ANCHOS', 200)
+
+FUENTE_ENCABEZADO = ('Helvetica-Bold', 10)
+FUENTE_CUERPO = ('Helvetica', 8)
+ALTO_ENCABEZADO = 22
+ALTO_FILA = 12
+PADDING_CELDA = 6
+ANCHO_MAX_COLUMNA = 3 * inch
+
+ESTILO_BLOQUE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#004A99')),  # Header azul
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), FUENTE_ENCABEZADO[0]),  # Header en negrita
+    ('FONTSIZE', (0, 0), (-1, 0), FUENTE_ENCABEZADO[1]),
+    ('FONTNAME', (0, 1), (-1, -1), FUENTE_CUERPO[0]),
+    ('FONTSIZE', (0, 1), (-1, -1), FUENTE_CUERPO[1]),  # Fuente de datos más pequeña
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('TOPPADDING', (0, 1), (-1, -1), 1),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 1),
+    # Cuerpo liviano: solo líneas horizontales finas y el contorno
+    ('LINEBELOW', (0, 1), (-1, -2), 0.25, colors.lightgrey),
+    ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
+])
+
+
+def _anchos_columnas(encabezados, muestra, ancho_disponible):
+    """Ancho natural de cada columna según la muestra, escalado al ancho de la página."""
+    anchos = []
+    for i, encabezado in enumerate(encabezados):
+        ancho = stringWidth(encabezado, *FUENTE_ENCABEZADO)
+        for fila in muestra:
+            ancho = max(ancho, stringWidth(fila[i], *FUENTE_CUERPO))
+        anchos.append(min(ancho + 2 * PADDING_CELDA, ANCHO_MAX_COLUMNA))
+    escala = ancho_disponible / sum(anchos)
+    return [ancho * escala for ancho in anchos]
+
+
+def _recortar(texto, ancho):
+    """Recorta el texto para que entre en una celda de alto fijo (una línea)."""
+    if stringWidth(texto, *FUENTE_CUERPO) <= ancho:
+        return texto
+    while texto and stringWidth(texto + '…', *FUENTE_CUERPO) > ancho:
+        texto = texto[:max(1, int(len(texto) * 0.9))] if len(texto) > 20 else texto[:-1]
+    return texto + '…'
+
+
+def _bloque(encabezados, filas, anchos):
+    return Table(
+        [encabezados] + filas,
+        colWidths=anchos,
+        rowHeights=[ALTO_ENCABEZADO] + [ALTO_FILA] * len(filas),
+        style=ESTILO_BLOQUE,
+    )
+
+
+class _Bloques(Flowable):
     """
-    Genera un archivo PDF en memoria a partir de una lista de diccionarios.
+    Flowable que entrega las tablas de un iterador de a una. Nunca entra
+    entero en el frame, así que reportlab llama a split() y recibe el bloque
+    siguiente más otro _Bloques con el resto del iterador.
     """
-    prompt_titulo = interpretacion.get('prompt', 'Reporte')
 
-    # --- Configuración de la Respuesta HTTP ---
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="reporte_{datetime.date.today()}.pdf"'
+    def __init__(self, bloques, siguiente=None):
+        super().__init__()
+        self._bloques = bloques
+        self._siguiente = siguiente if siguiente is not None else next(bloques, None)
+
+    def wrap(self, ancho, alto):
+        if self._siguiente is None:
+            return 0, 0
+        return ancho, alto + 1
+
+    def split(self, ancho, alto):
+        bloque = self._siguiente
+        if bloque is None or bloque.wrap(ancho, alto)[1] > alto:
+            # No entra en lo que queda del frame: sigue en la página siguiente
+            return []
+        resto = next(self._bloques, None)
+        return [bloque] if resto is None else [bloque, _Bloques(self._bloques, resto)]
 
+    def draw(self):
+        pass
+
+
+def escribir_pdf(data, prompt_titulo, destino):
+    """
+    Escribe el PDF de un iterable de diccionarios en `destino` (ruta o archivo).
+    """
     # --- Configuración del Documento ---
     # Usamos landscape (horizontal) para que quepan más columnas
-    doc = SimpleDocTemplate(response, pagesize=landscape(letter), topMargin=0.5*inch, bottomMargin=0.5*inch)
+    doc = SimpleDocTemplate(destino, pagesize=landscape(letter), topMargin=0.5*inch, bottomMargin=0.5*inch)
     story = []
     styles = getSampleStyleSheet()
 
-    if not data:
+    filas = iter(data)
+    muestra_dicts = list(itertools.islice(filas, PDF_MUESTRA_ANCHOS))
+
+    if not muestra_dicts:
         story.append(Paragraph("No se encontraron datos para este reporte.", styles['Normal']))
         doc.build(story)
-        return response
+        return
 
     # --- Título ---
     story.append(Paragraph(prompt_titulo, styles['h1']))
     story.append(Paragraph(f"Generado el: {datetime.date.today()}", styles['Normal']))
     story.append(Spacer(1, 0.25*inch))
 
-    # --- Preparar Datos de la Tabla ---
-    headers = list(data[0].keys())
+    # --- Columnas ---
+    headers = list(muestra_dicts[0].keys())
     # Limpiamos los headers para mostrarlos
     clean_headers = [h.replace("_", " ").title() for h in headers]
-    
-    # Convertimos todos los datos a strings usando el helper
-    table_data = [clean_headers] + [
-        [_limpiar_valor(row.get(header)) for header in headers] for row in data
-    ]
-
-    # --- Crear Tabla ---
-    t = Table(table_data, repeatRows=1) # Repetir headers en cada página
-
-    # --- Estilo de la Tabla ---
-    style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#004A99')), # Header azul
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'), # Header en negrita
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('FONTSIZE', (0, 1), (-1, -1), 8), # Fuente de datos más pequeña
-        ('GRID', (0, 0), (-1, -1), 1, colors.black), # Bordes
-    ])
-    
-    t.setStyle(style)
-    story.append(t)
-
-    # Construir y devolver
+    muestra = [[_limpiar_valor(row.get(h)) for h in headers] for row in muestra_dicts]
+    anchos = _anchos_columnas(clean_headers, muestra, doc.width)
+    limites = [ancho - 2 * PADDING_CELDA for ancho in anchos]
+
+    # --- Bloques de una página (el primero descuenta el título) ---
+    alto_util = doc.height - 2 * PADDING_CELDA  # padding del Frame
+    por_pagina = PDF_FILAS_POR_BLOQUE or max(1, int((alto_util - ALTO_ENCABEZADO) // ALTO_FILA))
+    alto_titulo = sum(
+        f.wrap(doc.width, alto_util)[1] + f.getSpaceBefore() + f.getSpaceAfter() for f in story
+    )
+    tamano = PDF_FILAS_POR_BLOQUE or max(1, int((alto_util - alto_titulo - ALTO_ENCABEZADO) // ALTO_FILA))
+
+    def bloques():
+        nonlocal tamano
+        bloque = []
+        for fila in itertools.chain(
+            muestra,
+            ([_limpiar_valor(row.get(h)) for h in headers] for row in filas),
+        ):
+            bloque.append([_recortar(valor, limite) for valor, limite in zip(fila, limites)])
+            if len(bloque) == tamano:
+                yield _bloque(clean_headers, bloque, anchos)
+                bloque, tamano = [], por_pagina
+        if bloque:
+            yield _bloque(clean_headers, bloque, anchos)
+
+    story.append(_Bloques(bloques()))
     doc.build(story)
-    return response
\ No newline at end of file
+
+
+def generar_reporte_pdf(data, interpretacion):
+    """
+    Genera un archivo PDF en memoria a partir de un iterable de diccionarios.
+    """
+    prompt_titulo = interpretacion.get('prompt', 'Reporte')
+
+    # --- Configuración de la Respuesta HTTP ---
+    response = HttpResponse(content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="reporte_{datetime.date.today()}.pdf"'
+
+    escribir_pdf(data, prompt_titulo, response)
+    return response
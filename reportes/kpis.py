@@ -0,0 +1,172 @@
+# reportes/kpis.py
+"""
+KPIs del dashboard general: una consulta con agregados condicionales por
+tabla, ejecutadas en paralelo en un pool de hilos pequeño (cada hilo usa su
+propia conexión a la BD).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Sum, Q, DecimalField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from usuario.models import Usuario, SolicitudAgente
+from inmueble.models import InmuebleModel, AnuncioModel
+from contrato.models import Contrato
+from contacto.models import MensajeModel
+from cita.models import Cita
+from alertas.models import AlertaModel
+
+
+DASHBOARD_HILOS = getattr(settings, 'REPORTES_DASHBOARD_HILOS', 4)
+
+ESTADOS_INMUEBLE = [valor for valor, _ in InmuebleModel._meta.get_field('estado').choices]
+
+
+def _en_hilo(funcion):
+    """Ejecuta la consulta y libera la conexión propia del hilo."""
+    def envoltura(*args):
+        try:
+            return funcion(*args)
+        finally:
+            connections.close_all()
+    return envoltura
+
+
+def _kpis_inmuebles(hoy, hace_30_dias):
+    conteos = InmuebleModel.objects.filter(is_active=True).aggregate(
+        total=Count('id'),
+        sin_estado=Count('id', filter=Q(estado__isnull=True)),
+        **{f'estado_{e}': Count('id', filter=Q(estado=e)) for e in ESTADOS_INMUEBLE}
+    )
+    por_estado = [
+        {'estado': e, 'total': conteos[f'estado_{e}']}
+        for e in ESTADOS_INMUEBLE if conteos[f'estado_{e}']
+    ]
+    if conteos['sin_estado']:
+        por_estado.append({'estado': None, 'total': conteos['sin_estado']})
+    return {'total': conteos['total'], 'por_estado': por_estado}
+
+
+def _kpis_anuncios(hoy, hace_30_dias):
+    return AnuncioModel.objects.aggregate(
+        activos=Count('id', filter=Q(is_active=True, estado='disponible'))
+    )
+
+
+def _kpis_contratos(hoy, hace_30_dias):
+    decimal = DecimalField()
+    return Contrato.objects.aggregate(
+        activos=Count('id', filter=Q(estado='activo')),
+        nuevos_mes=Count('id', filter=Q(fecha_creacion__gte=hace_30_dias)),
+        ingresos_mes=Coalesce(
+            Sum('comision_monto', filter=Q(fecha_creacion__gte=hace_30_dias, estado='activo')),
+            0, output_field=decimal
+        ),
+        ingresos_total=Coalesce(
+            Sum('comision_monto', filter=Q(estado__in=['activo', 'finalizado'])),
+            0, output_field=decimal
+        ),
+    )
+
+
+def _kpis_usuarios(hoy, hace_30_dias):
+    return Usuario.objects.filter(is_active=True).aggregate(
+        agentes_activos=Count('id', filter=Q(grupo__nombre='Agente')),
+        clientes_activos=Count('id', filter=Q(grupo__nombre='Cliente')),
+    )
+
+
+def _kpis_solicitudes(hoy, hace_30_dias):
+    return SolicitudAgente.objects.aggregate(
+        pendientes=Count('idSolicitud', filter=Q(estado='pendiente'))
+    )
+
+
+def _kpis_alertas(hoy, hace_30_dias):
+    return AlertaModel.objects.aggregate(
+        pendientes=Count('id', filter=Q(estado_envio='pendiente')),
+        no_vistas=Count('id', filter=Q(estado_visto='no_visto')),
+    )
+
+
+def _kpis_citas(hoy, hace_30_dias):
+    return Cita.objects.filter(
+        fecha_cita__gte=hoy,
+        fecha_cita__lte=hoy + timedelta(days=7)
+    ).aggregate(
+        hoy=Count('id', filter=Q(fecha_cita=hoy)),
+        proxima_semana=Count('id'),
+    )
+
+
+def _kpis_comunicacion(hoy, hace_30_dias):
+    return MensajeModel.objects.filter(leido=False).aggregate(
+        chats_sin_leer=Count('chat_id', distinct=True)
+    )
+
+
+CONSULTAS = {
+    'inmuebles': _kpis_inmuebles,
+    'anuncios': _kpis_anuncios,
+    'contratos': _kpis_contratos,
+    'usuarios': _kpis_usuarios,
+    'solicitudes': _kpis_solicitudes,
+    'alertas': _kpis_alertas,
+    'citas': _kpis_citas,
+    'comunicacion': _kpis_comunicacion,
+}
+
+
+def calcular_dashboard_general():
+    hoy = timezone.now().date()
+    hace_30_dias = hoy - timedelta(days=30)
+
+    with ThreadPoolExecutor(max_workers=DASHBOARD_HILOS) as pool:
+        futuros = {
+            nombre: pool.submit(_en_hilo(consulta), hoy, hace_30_dias)
+            for nombre, consulta in CONSULTAS.items()
+        }
+        r = {nombre: futuro.result() for nombre, futuro in futuros.items()}
+
+    por_estado = r['inmuebles']['por_estado']
+    return {
+        'fecha_reporte': hoy.isoformat(),
+        'periodo': f'{hace_30_dias.isoformat()} a {hoy.isoformat()}',
+        'inmuebles': {
+            'total': r['inmuebles']['total'],
+            'por_estado': por_estado,
+            'pendientes': next((i['total'] for i in por_estado if i['estado'] == 'pendiente'), 0),
+            'aprobados': next((i['total'] for i in por_estado if i['estado'] == 'aprobado'), 0),
+        },
+        'anuncios': {
+            'activos': r['anuncios']['activos'],
+        },
+        'contratos': {
+            'activos': r['contratos']['activos'],
+            'nuevos_mes': r['contratos']['nuevos_mes'],
+        },
+        'ingresos': {
+            'mes_actual': float(r['contratos']['ingresos_mes']),
+            'total': float(r['contratos']['ingresos_total']),
+        },
+        'usuarios': {
+            'agentes_activos': r['usuarios']['agentes_activos'],
+            'clientes_activos': r['usuarios']['clientes_activos'],
+            'solicitudes_pendientes': r['solicitudes']['pendientes'],
+        },
+        'alertas': {
+            'pendientes': r['alertas']['pendientes'],
+            'no_vistas': r['alertas']['no_vistas'],
+        },
+        'citas': {
+            'hoy': r['citas']['hoy'],
+            'proxima_semana': r['citas']['proxima_semana'],
+        },
+        'comunicacion': {
+            'chats_con_mensajes_sin_leer': r['comunicacion']['chats_sin_leer'],
+        }
+    }
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reportes.rollups import FUENTES, actualizar_metrica
+
+
+class Command(BaseCommand):
+    help = (
+        'Actualiza los resúmenes diarios de los reportes gerenciales (MetricaDiaria). '
+        'Solo reprocesa los días nuevos o con filas modificadas desde la última ejecución. '
+        'Pensado para ejecutarse por cron (p. ej. cada hora).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metrica', action='append', choices=sorted(FUENTES),
+                            help='Métrica a actualizar (por defecto todas). Se puede repetir.')
+        parser.add_argument('--reconstruir', action='store_true',
+                            help='Borra y recalcula todo el historial (p. ej. tras eliminar registros).')
+
+    def handle(self, *args, **options):
+        metricas = options['metrica'] or list(FUENTES)
+        for nombre in metricas:
+            try:
+                dias = actualizar_metrica(nombre, reconstruir=options['reconstruir'])
+            except Exception as e:
+                raise CommandError(f'❌ Error actualizando la métrica "{nombre}": {e}')
+            self.stdout.write(self.style.SUCCESS(f'✅ {nombre}: {dias} días procesados'))
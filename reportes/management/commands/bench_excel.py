@@ -0,0 +1,96 @@
+import datetime
+import resource
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from openpyxl import Workbook
+
+from reportes.generators import escribir_excel
+
+
+def _filas_sinteticas(n, columnas):
+    """Generador de filas con tipos mezclados (texto, enteros, Decimal, fechas)."""
+    hoy = datetime.date.today()
+    for i in range(n):
+        fila = {
+            'id': i,
+            'nombre': f'Inmueble {i}',
+            'monto': Decimal(i % 10000) / 3,
+            'fecha': hoy - datetime.timedelta(days=i % 365),
+        }
+        for c in range(len(fila), columnas):
+            fila[f'campo_{c}'] = f'valor {i}-{c}'
+        yield fila
+
+
+def _rss_mb():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark del exportador Excel: escribe N filas sintéticas con escribir_excel '
+        '(openpyxl write_only) y reporta tiempo, RSS máximo y opcionalmente el pico de memoria Python.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=100000, help='Filas a escribir')
+        parser.add_argument('--columnas', type=int, default=10, help='Columnas por fila')
+        parser.add_argument('--comparar', action='store_true',
+                            help='Medir también un Workbook normal en memoria (después, por el RSS máximo)')
+        parser.add_argument('--tracemalloc', action='store_true',
+                            help='Medir el pico de memoria Python (hace la escritura varias veces más lenta)')
+
+    def handle(self, *args, **options):
+        filas, columnas = options['filas'], options['columnas']
+        rss_inicial = _rss_mb()
+
+        resultado = self._medir(
+            lambda destino: escribir_excel(_filas_sinteticas(filas, columnas), 'Benchmark', destino),
+            options['tracemalloc'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ write_only: {filas} filas x {columnas} columnas en {resultado['segundos']}s, "
+            f"pico Python {resultado['pico_mb']} MB, RSS máximo {_rss_mb():.1f} MB "
+            f"(inicial {rss_inicial:.1f} MB), archivo {resultado['archivo_mb']} MB"
+        ))
+
+        if options['comparar']:
+            resultado = self._medir(
+                lambda destino: self._workbook_normal(filas, columnas, destino), options['tracemalloc']
+            )
+            self.stdout.write(
+                f"ℹ️ Workbook normal: {resultado['segundos']}s, pico Python {resultado['pico_mb']} MB, "
+                f"RSS máximo {_rss_mb():.1f} MB"
+            )
+
+    def _medir(self, escribir, medir_python):
+        pico = None
+        with tempfile.TemporaryFile() as destino:
+            if medir_python:
+                tracemalloc.start()
+            inicio = time.perf_counter()
+            escribir(destino)
+            segundos = time.perf_counter() - inicio
+            if medir_python:
+                _, pico = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            tamano = destino.seek(0, 2)
+        return {
+            'segundos': round(segundos, 2),
+            'pico_mb': round(pico / 1024 / 1024, 1) if pico is not None else '-',
+            'archivo_mb': round(tamano / 1024 / 1024, 1),
+        }
+
+    def _workbook_normal(self, filas, columnas, destino):
+        wb = Workbook()
+        ws = wb.active
+        for i, fila in enumerate(_filas_sinteticas(filas, columnas)):
+            if i == 0:
+                ws.append(list(fila.keys()))
+            ws.append(list(fila.values()))
+        wb.save(destino)
@@ -0,0 +1,95 @@
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.lib.units import inch
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+from reportes.generators import escribir_pdf, _limpiar_valor
+from reportes.management.commands.bench_excel import _filas_sinteticas
+
+
+def _pdf_tabla_unica(filas, destino):
+    """Render anterior: una sola Table con todas las filas y GRID global (para comparar)."""
+    filas = list(filas)
+    headers = list(filas[0].keys())
+    t = Table([headers] + [[_limpiar_valor(f.get(h)) for h in headers] for f in filas], repeatRows=1)
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#004A99')),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    SimpleDocTemplate(destino, pagesize=landscape(letter), topMargin=0.5*inch, bottomMargin=0.5*inch).build([t])
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark del PDF de reportes: tiempo y pico de memoria Python (tracemalloc) de '
+        'escribir_pdf (bloques por página) frente a la tabla única anterior, para varios tamaños. '
+        '"documento" es lo que reportlab guarda de las páginas ya dibujadas hasta save() y save() '
+        'serializa de una vez (crece con el archivo); "armado" es el pico antes de save() sin el '
+        'documento, que con los bloques perezosos no depende de las filas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, nargs='+', default=[1000, 10000, 50000],
+                            help='Tamaños a medir')
+        parser.add_argument('--columnas', type=int, default=8, help='Columnas por fila')
+        parser.add_argument('--legado-hasta', type=int, default=10000,
+                            help='Medir la tabla única solo hasta esta cantidad de filas (0 = nunca)')
+
+    def handle(self, *args, **options):
+        columnas = options['columnas']
+        for n in options['filas']:
+            resultado = self._medir(
+                lambda destino: escribir_pdf(_filas_sinteticas(n, columnas), 'Benchmark', destino)
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ bloques: {n} filas en {resultado['segundos']}s, pico {resultado['pico_mb']} MB "
+                f"(armado {resultado['armado_mb']} MB, documento {resultado['documento_mb']} MB), "
+                f"archivo {resultado['archivo_mb']} MB"
+            ))
+            if n <= options['legado_hasta']:
+                resultado = self._medir(lambda destino: _pdf_tabla_unica(_filas_sinteticas(n, columnas), destino))
+                self.stdout.write(
+                    f"ℹ️ tabla única: {n} filas en {resultado['segundos']}s, pico {resultado['pico_mb']} MB"
+                )
+
+    def _medir(self, escribir):
+        documento, armado = [0], [0]
+        guardar = Canvas.save
+
+        def save(canvas):
+            # Páginas que reportlab retiene hasta escribir el archivo
+            filtro = [
+                tracemalloc.Filter(True, '*/reportlab/pdfbase/*'),
+                tracemalloc.Filter(True, '*/reportlab/pdfgen/*'),
+            ]
+            documento[0] = sum(s.size for s in tracemalloc.take_snapshot().filter_traces(filtro).statistics('filename'))
+            armado[0] = tracemalloc.get_traced_memory()[1] - documento[0]
+            guardar(canvas)
+
+        with tempfile.TemporaryFile() as destino:
+            Canvas.save = save
+            tracemalloc.start()
+            try:
+                inicio = time.perf_counter()
+                escribir(destino)
+                segundos = time.perf_counter() - inicio
+                _, pico = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+                Canvas.save = guardar
+            tamano = destino.seek(0, 2)
+        mb = lambda b: round(b / 1024 / 1024, 1)
+        return {
+            'segundos': round(segundos, 2),
+            'pico_mb': mb(pico),
+            'armado_mb': mb(armado[0]),
+            'documento_mb': mb(documento[0]),
+            'archivo_mb': mb(tamano),
+        }
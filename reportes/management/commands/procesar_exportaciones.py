@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reportes import exportaciones
+from reportes.models import TrabajoExportacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Procesa los trabajos de exportación pendientes y limpia los archivos vencidos. '
+        'Con --continuo queda corriendo como worker (el que procesa las exportaciones en '
+        'producción); sin él, pensado para ejecutarse por cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help='No terminar: revisar la cola cada --intervalo')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre revisiones con --continuo')
+        parser.add_argument('--solo-limpiar', action='store_true', help='Solo borrar archivos vencidos')
+
+    def handle(self, *args, **options):
+        while True:
+            if not options['solo_limpiar']:
+                self._procesar_pendientes()
+
+            expirados, colgados = exportaciones.limpiar()
+            if expirados or colgados:
+                self.stdout.write(self.style.SUCCESS(
+                    f'🧹 {expirados} archivos vencidos eliminados, {colgados} trabajos colgados marcados con error'
+                ))
+
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
+
+    def _procesar_pendientes(self):
+        pendientes = TrabajoExportacion.objects.filter(estado='pendiente').order_by('creado_en')
+        for trabajo_id in pendientes.values_list('id', flat=True):
+            try:
+                if exportaciones.ejecutar(trabajo_id):
+                    self.stdout.write(self.style.SUCCESS(f'✅ Exportación {trabajo_id} generada'))
+            except Exception as e:
+                self.stderr.write(f'❌ Error en la exportación {trabajo_id}: {e}')
@@ -0,0 +1,66 @@
+# reportes/metricas.py
+"""
+Motor de métricas por entidad para los reportes gerenciales.
+
+En lugar de recorrer entidades (agentes, inmuebles, ...) y lanzar varias
+consultas por cada una, cada tabla se agrupa UNA vez por la columna de la
+entidad usando agregados condicionales (Count/Sum con filter=Q(...)) y los
+resultados se combinan en memoria:
+
+    metricas = MetricasPorEntidad(ids_agentes)
+    metricas.agregar(
+        InmuebleModel.objects.filter(is_active=True), 'agente_id',
+        publicados=Count('id'),
+        aprobados=Count('id', filter=Q(estado='aprobado')),
+    )
+    metricas.agregar(Cita.objects.filter(...), 'agente_id', citas=Count('id'))
+    metricas.obtener(agente.id)  # {'publicados': 3, 'aprobados': 2, 'citas': 5}
+
+El número de consultas depende solo de cuántas tablas se agregan, no de
+cuántas entidades hay.
+"""
+
+
+class MetricasPorEntidad:
+    def __init__(self, ids=None):
+        # ids=None: no se restringe el conjunto de entidades
+        self.ids = list(ids) if ids is not None else None
+        self.valores = {}
+        self.defaults = {}
+
+    def agregar(self, queryset, campo_entidad, **agregados):
+        """
+        Ejecuta una consulta agrupada por `campo_entidad` con todos los
+        `agregados` y guarda el resultado por entidad.
+        """
+        if self.ids is not None:
+            if not self.ids:
+                for nombre in agregados:
+                    self.defaults[nombre] = 0
+                return self
+            queryset = queryset.filter(**{f'{campo_entidad}__in': self.ids})
+
+        filas = (
+            queryset.order_by()
+            .values(campo_entidad)
+            .annotate(**agregados)
+        )
+        for fila in filas:
+            entidad = fila.pop(campo_entidad)
+            self.valores.setdefault(entidad, {}).update(fila)
+
+        for nombre in agregados:
+            self.defaults[nombre] = 0
+        return self
+
+    def obtener(self, entidad_id):
+        """Métricas de una entidad; las que no aparecieron en la consulta valen 0."""
+        datos = dict(self.defaults)
+        for nombre, valor in self.valores.get(entidad_id, {}).items():
+            datos[nombre] = 0 if valor is None else valor
+        return datos
+
+
+def a_float(valor):
+    """Convierte Decimal/None a float para la respuesta JSON."""
+    return float(valor or 0)
@@ -1,3 +1,113 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+# --------------------------
+# Resúmenes diarios para reportes gerenciales
+# --------------------------
+class MetricaDiaria(models.Model):
+    """
+    Conteos y sumas por día y dimensiones (agente, tipo, estado, ciudad) de
+    cada métrica ('contratos', 'mensajes', 'citas', ...). Se llena de forma
+    incremental con `manage.py actualizar_metricas_diarias` (ver reportes/rollups.py).
+    Las dimensiones que no aplican a una métrica quedan en '' / NULL.
+    """
+    metrica = models.CharField(max_length=30)
+    dia = models.DateField()
+    agente_id = models.IntegerField(null=True, blank=True)
+    tipo = models.CharField(max_length=50, blank=True, default='')
+    estado = models.CharField(max_length=30, blank=True, default='')
+    ciudad = models.CharField(max_length=150, blank=True, default='')
+
+    cantidad = models.PositiveIntegerField(default=0)
+    # Filas con monto no nulo (para promedios equivalentes a Avg)
+    cantidad_monto = models.PositiveIntegerField(default=0)
+    monto = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = "metrica_diaria"
+        indexes = [
+            models.Index(fields=["metrica", "dia"]),
+            models.Index(fields=["metrica", "agente_id", "dia"]),
+        ]
+
+    def __str__(self):
+        return f"{self.metrica} {self.dia}: {self.cantidad}"
+
+
+class MarcaMetrica(models.Model):
+    """Marca de agua por métrica: hasta dónde se procesó el resumen diario."""
+    metrica = models.CharField(max_length=30, unique=True)
+    # Último día completo guardado en MetricaDiaria (días posteriores se leen en crudo)
+    ultimo_dia = models.DateField()
+    # Momento de la última ejecución; se reprocesan los días con filas modificadas después
+    procesado_hasta = models.DateTimeField()
+
+    class Meta:
+        db_table = "metrica_marca"
+
+    def __str__(self):
+        return f"{self.metrica} hasta {self.ultimo_dia}"
+
+
+# --------------------------
+# Exportaciones asíncronas
+# --------------------------
+class TrabajoExportacion(models.Model):
+    """
+    Exportación (PDF/Excel/CSV) generada en segundo plano a partir de una
+    especificación de reporte (builder o interpretación). El archivo queda en
+    MEDIA_ROOT hasta `expira_en` (ver reportes/exportaciones.py).
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+        ('expirado', 'Expirado'),
+    ]
+    FORMATOS = [
+        ('pdf', 'PDF'),
+        ('excel', 'Excel'),
+        ('csv', 'CSV'),
+    ]
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="trabajos_exportacion"
+    )
+    formato = models.CharField(max_length=10, choices=FORMATOS)
+    titulo = models.CharField(max_length=255, default='Reporte')
+    spec = models.JSONField(default=dict)
+    # sha256 de (formato, titulo, spec) normalizados: deduplica pedidos idénticos
+    spec_hash = models.CharField(max_length=64)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+
+    filas_procesadas = models.PositiveIntegerField(default=0)
+    filas_totales = models.PositiveIntegerField(null=True, blank=True)
+    # Ruta relativa a MEDIA_ROOT
+    archivo = models.CharField(max_length=255, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    finalizado_en = models.DateTimeField(null=True, blank=True)
+    expira_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "trabajo_exportacion"
+        ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=["spec_hash", "estado"]),
+            models.Index(fields=["estado", "expira_en"]),
+        ]
+        constraints = [
+            # Un solo trabajo en curso por especificación
+            models.UniqueConstraint(
+                fields=["spec_hash"],
+                condition=models.Q(estado__in=['pendiente', 'procesando']),
+                name="trabajo_exportacion_unico_en_curso",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Exportación {self.id} ({self.formato}) - {self.estado}"
@@ -0,0 +1,128 @@
+# reportes/planes.py
+"""
+Cachés de los reportes dinámicos (GenerarReporteView / ReporteDirectoView).
+
+- Planes: el queryset ya validado y armado por `_build_queryset` (filtros
+  convertidos, Q, values/annotate y orden), por interpretación canónica. Un
+  queryset sin evaluar se puede reutilizar clonándolo con `.all()`.
+- Resultados: el JSON de la respuesta, por interpretación + versión de los
+  datos, con TTL y desalojo LRU.
+- Versiones: un contador por modelo en la caché de Django que se incrementa
+  al guardar/borrar filas (reportes/signals.py). Cambia la clave de los
+  resultados, así que los viejos dejan de usarse y salen por LRU/TTL.
+  Los `queryset.update()`/`bulk_create` no disparan señales: ahí manda el TTL.
+
+Los planes y resultados viven en memoria de cada proceso; las versiones en la
+caché compartida (si CACHES apunta a Redis/Memcached, la invalidación llega a
+todos los procesos).
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+PLANES_MAX = getattr(settings, 'REPORTES_PLANES_MAX', 256)
+RESULTADOS_MAX = getattr(settings, 'REPORTES_RESULTADOS_MAX', 128)
+RESULTADOS_TTL = getattr(settings, 'REPORTES_RESULTADOS_TTL', 120)
+# Respuestas más grandes no se guardan (acotan la memoria de la caché)
+RESULTADO_MAX_BYTES = getattr(settings, 'REPORTES_RESULTADO_MAX_BYTES', 2 * 1024 * 1024)
+
+# Modelos cuyos cambios afectan a cada tipo de reporte (modelo base + relaciones proyectadas)
+DEPENDENCIAS = {
+    'inmuebles': ['inmueble.InmuebleModel', 'inmueble.AnuncioModel', 'inmueble.TipoInmuebleModel', 'usuario.Usuario'],
+    'contratos': ['contrato.Contrato', 'inmueble.InmuebleModel', 'usuario.Usuario'],
+    'agentes': ['usuario.Usuario', 'usuario.Grupo'],
+    'clientes': ['usuario.Usuario', 'usuario.Grupo'],
+    'citas': ['cita.Cita', 'usuario.Usuario'],
+    'anuncios': ['inmueble.AnuncioModel', 'inmueble.InmuebleModel', 'usuario.Usuario'],
+}
+MODELOS_OBSERVADOS = sorted({label for labels in DEPENDENCIAS.values() for label in labels})
+
+
+class CacheLRU:
+    """Diccionario en memoria con tamaño máximo (desaloja el menos usado) y TTL opcional."""
+
+    def __init__(self, maximo, ttl=None):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            valor, expira = entrada
+            if expira is not None and expira < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            expira = time.monotonic() + self.ttl if self.ttl else None
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+planes = CacheLRU(PLANES_MAX)
+resultados = CacheLRU(RESULTADOS_MAX, ttl=RESULTADOS_TTL)
+
+
+def clave_spec(interpretacion):
+    """Hash de la interpretación canónica (solo lo que define la consulta)."""
+    canonica = {
+        campo: interpretacion.get(campo)
+        for campo in ('tipo_reporte', 'filtros', 'agrupacion', 'calculos', 'orden')
+    }
+    contenido = json.dumps(canonica, sort_keys=True, default=str)
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+
+# ============================================
+# Versiones de datos
+# ============================================
+
+def _clave_version(label):
+    return f'reportes:version:{label}'
+
+
+def version_datos(tipo_reporte):
+    """Versión combinada de los modelos de los que depende el tipo de reporte."""
+    claves = [_clave_version(label) for label in DEPENDENCIAS.get(tipo_reporte, [])]
+    valores = cache.get_many(claves)
+    for clave in claves:
+        if clave not in valores:
+            # Inicia en el reloj (no en 0) para no repetir una versión si la caché la desalojó
+            cache.add(clave, time.time_ns(), timeout=None)
+            valores[clave] = cache.get(clave)
+    return '-'.join(str(valores[clave]) for clave in claves)
+
+
+def invalidar_modelo(label):
+    clave = _clave_version(label)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, time.time_ns(), timeout=None)
+
+
+def clave_resultado(interpretacion, limite):
+    tipo = interpretacion.get('tipo_reporte')
+    return f"{clave_spec(interpretacion)}:{limite}:{version_datos(tipo)}"
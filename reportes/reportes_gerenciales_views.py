@@ -2,9 +2,11 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework import status
 from django.db.models import Count, Sum, Avg, Q, F, Max, Min, DecimalField
 from django.db.models.functions import TruncMonth, TruncWeek, TruncDay, Coalesce
 from datetime import datetime, timedelta
+from decimal import Decimal
 from django.utils import timezone
 
 from usuario.models import Usuario, Grupo, SolicitudAgente
@@ -13,6 +15,11 @@ from contrato.models import Contrato
 from contacto.models import ChatModel, MensajeModel
 from cita.models import Cita
 from alertas.models import AlertaModel
+from .metricas import MetricasPorEntidad, a_float
+from .kpis import calcular_dashboard_general
+from .cache import obtener_o_calcular
+from . import rollups, comparativo
+from django.conf import settings
 
 
 
@@ -40,6 +47,14 @@ def parsear_fechas(request):
     return fecha_inicio, fecha_fin
 
 
+def nombres_usuarios(ids):
+    """{id: nombre} para los IDs dados en una sola consulta."""
+    ids = [i for i in ids if i is not None]
+    if not ids:
+        return {}
+    return dict(Usuario.objects.filter(id__in=ids).values_list('id', 'nombre'))
+
+
 # ============================================
 # 1. DASHBOARD GENERAL
 # ============================================
@@ -53,112 +68,13 @@ def dashboard_general(request):
     """
     
     try:
-        hoy = timezone.now().date()
-        hace_30_dias = hoy - timedelta(days=30)
-        
-        # Inmuebles
-        inmuebles_total = InmuebleModel.objects.filter(is_active=True).count()
-        inmuebles_por_estado = list(
-            InmuebleModel.objects.filter(is_active=True)
-            .values('estado')
-            .annotate(total=Count('id'))
+        # KPIs en una consulta por tabla (en paralelo), cacheados con stale-while-revalidate
+        data = obtener_o_calcular(
+            'reportes:dashboard_general',
+            calcular_dashboard_general,
+            ttl=getattr(settings, 'REPORTES_DASHBOARD_TTL', 60),
+            stale=getattr(settings, 'REPORTES_DASHBOARD_STALE', 300),
         )
-        
-        # Anuncios
-        anuncios_activos = AnuncioModel.objects.filter(
-            is_active=True, 
-            estado='disponible'
-        ).count()
-        
-        # Contratos
-        contratos_activos = Contrato.objects.filter(estado='activo').count()
-        contratos_mes = Contrato.objects.filter(
-            fecha_creacion__gte=hace_30_dias
-        ).count()
-        
-        # Ingresos (comisiones)
-        ingresos_mes = Contrato.objects.filter(
-            fecha_creacion__gte=hace_30_dias,
-            estado='activo'
-        ).aggregate(total=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField()))['total']
-        
-        ingresos_totales = Contrato.objects.filter(
-            estado__in=['activo', 'finalizado']
-        ).aggregate(total=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField()))['total']
-        
-        # Usuarios
-        agentes_activos = Usuario.objects.filter(
-            grupo__nombre='Agente',
-            is_active=True
-        ).count()
-        
-        clientes_activos = Usuario.objects.filter(
-            grupo__nombre='Cliente',
-            is_active=True
-        ).count()
-        
-        solicitudes_pendientes = SolicitudAgente.objects.filter(
-            estado='pendiente'
-        ).count()
-        
-        # Alertas
-        alertas_pendientes = AlertaModel.objects.filter(
-            estado_envio='pendiente'
-        ).count()
-        
-        alertas_no_vistas = AlertaModel.objects.filter(
-            estado_visto='no_visto'
-        ).count()
-        
-        # Citas
-        citas_hoy = Cita.objects.filter(fecha_cita=hoy).count()
-        citas_semana = Cita.objects.filter(
-            fecha_cita__gte=hoy,
-            fecha_cita__lte=hoy + timedelta(days=7)
-        ).count()
-        
-        # Chats activos
-        chats_activos = ChatModel.objects.filter(
-            mensajes__leido=False
-        ).distinct().count()
-        
-        data = {
-            'fecha_reporte': hoy.isoformat(),
-            'periodo': f'{hace_30_dias.isoformat()} a {hoy.isoformat()}',
-            'inmuebles': {
-                'total': inmuebles_total,
-                'por_estado': inmuebles_por_estado,
-                'pendientes': next((i['total'] for i in inmuebles_por_estado if i['estado'] == 'pendiente'), 0),
-                'aprobados': next((i['total'] for i in inmuebles_por_estado if i['estado'] == 'aprobado'), 0),
-            },
-            'anuncios': {
-                'activos': anuncios_activos,
-            },
-            'contratos': {
-                'activos': contratos_activos,
-                'nuevos_mes': contratos_mes,
-            },
-            'ingresos': {
-                'mes_actual': float(ingresos_mes),
-                'total': float(ingresos_totales),
-            },
-            'usuarios': {
-                'agentes_activos': agentes_activos,
-                'clientes_activos': clientes_activos,
-                'solicitudes_pendientes': solicitudes_pendientes,
-            },
-            'alertas': {
-                'pendientes': alertas_pendientes,
-                'no_vistas': alertas_no_vistas,
-            },
-            'citas': {
-                'hoy': citas_hoy,
-                'proxima_semana': citas_semana,
-            },
-            'comunicacion': {
-                'chats_con_mensajes_sin_leer': chats_activos,
-            }
-        }
         # print("DATA", data)
         return Response({
             "status": 1,
@@ -330,79 +246,53 @@ def reporte_contratos(request):
     try:
         fecha_inicio, fecha_fin = parsear_fechas(request)
         
-        # Filtros
-        queryset = Contrato.objects.all()
+        # Filtros (en términos de las dimensiones del resumen diario)
+        filtros = {}
         
         tipo_contrato = request.GET.get('tipo_contrato')
         estado = request.GET.get('estado')
         agente_id = request.GET.get('agente_id')
         
         if tipo_contrato:
-            queryset = queryset.filter(tipo_contrato=tipo_contrato)
+            filtros['tipo'] = tipo_contrato
         if estado:
-            queryset = queryset.filter(estado=estado)
+            filtros['estado'] = estado
         if agente_id:
-            queryset = queryset.filter(agente_id=agente_id)
+            filtros['agente_id'] = int(agente_id)
         
-        queryset = queryset.filter(
-            fecha_creacion__date__gte=fecha_inicio,
-            fecha_creacion__date__lte=fecha_fin
+        # Una sola lectura de los resúmenes diarios (+ hoy en crudo) y el resto en memoria
+        filas = rollups.consultar(
+            'contratos', fecha_inicio, fecha_fin,
+            agrupar=('tipo', 'estado', 'agente_id'), periodo='mes', filtros=filtros
         )
+        total = rollups.totalizar(filas)
+        total = total[0] if total else {'cantidad': 0, 'cantidad_monto': 0, 'monto': 0}
         
         # Totales
-        total_contratos = queryset.count()
+        total_contratos = total['cantidad']
         
         # Por tipo
-        por_tipo = list(
-            queryset.values('tipo_contrato')
-            .annotate(total=Count('id'))
-        )
+        comisiones_por_tipo = rollups.totalizar(filas, 'tipo')
+        por_tipo = [{'tipo_contrato': t['tipo'], 'total': t['cantidad']} for t in comisiones_por_tipo]
         
         # Por estado
-        por_estado = list(
-            queryset.values('estado')
-            .annotate(total=Count('id'))
-        )
+        por_estado = [
+            {'estado': e['estado'], 'total': e['cantidad']}
+            for e in rollups.totalizar(filas, 'estado')
+        ]
         
         # Ingresos por comisiones
-        ingresos_totales = queryset.aggregate(
-            total=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField())
-        )['total']
-        
-        comision_promedio = queryset.aggregate(
-            promedio=Avg('comision_monto')
-        )['promedio'] or 0
-        
-        # Comisiones por tipo de contrato
-        comisiones_por_tipo = list(
-            queryset.values('tipo_contrato')
-            .annotate(
-                total=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField()),
-                promedio=Avg('comision_monto'),
-                cantidad=Count('id')
-            )
-        )
+        ingresos_totales = total['monto']
+        comision_promedio = rollups.promedio(total) or 0
         
         # Top agentes por comisiones
-        top_agentes_comisiones = list(
-            queryset.values('agente__nombre', 'agente__id')
-            .annotate(
-                total_comisiones=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField()),
-                cantidad_contratos=Count('id')
-            )
-            .order_by('-total_comisiones')[:10]
-        )
+        top_agentes_comisiones = sorted(
+            rollups.totalizar(filas, 'agente_id'), key=lambda a: a['monto'], reverse=True
+        )[:10]
+        nombres = nombres_usuarios(a['agente_id'] for a in top_agentes_comisiones)
         
         # Contratos por mes
-        contratos_por_mes = list(
-            queryset.annotate(mes=TruncMonth('fecha_creacion'))
-            .values('mes')
-            .annotate(
-                total=Count('id'),
-                ingresos=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField())
-            )
-            .order_by('mes')
-        )
+        contratos_por_mes = sorted(rollups.totalizar(filas, 'periodo'), key=lambda m: m['periodo'])
         
         # Contratos próximos a vencer (30 días)
         hoy = timezone.now().date()
@@ -431,27 +321,27 @@ def reporte_contratos(request):
             },
             'comisiones_por_tipo': [
                 {
-                    'tipo_contrato': item['tipo_contrato'],
-                    'total': float(item['total']),
-                    'promedio': float(item['promedio'] or 0),
+                    'tipo_contrato': item['tipo'],
+                    'total': float(item['monto']),
+                    'promedio': float(rollups.promedio(item) or 0),
                     'cantidad': item['cantidad'],
                 }
                 for item in comisiones_por_tipo
             ],
             'top_agentes': [
                 {
-                    'agente': item['agente__nombre'],
-                    'agente_id': item['agente__id'],
-                    'total_comisiones': float(item['total_comisiones']),
-                    'cantidad_contratos': item['cantidad_contratos'],
+                    'agente': nombres.get(item['agente_id']),
+                    'agente_id': item['agente_id'],
+                    'total_comisiones': float(item['monto']),
+                    'cantidad_contratos': item['cantidad'],
                 }
                 for item in top_agentes_comisiones
             ],
             'contratos_por_mes': [
                 {
-                    'mes': item['mes'].strftime('%Y-%m'),
-                    'total': item['total'],
-                    'ingresos': float(item['ingresos']),
+                    'mes': item['periodo'].strftime('%Y-%m'),
+                    'total': item['cantidad'],
+                    'ingresos': float(item['monto']),
                 }
                 for item in contratos_por_mes
             ],
@@ -500,84 +390,66 @@ def reporte_agentes(request):
         if agente_id:
             agentes_queryset = agentes_queryset.filter(id=agente_id)
         
-        agentes_data = []
+        agentes = list(agentes_queryset.values('id', 'nombre', 'correo', 'telefono'))
         
-        for agente in agentes_queryset:
-            # Inmuebles publicados
-            inmuebles_publicados = InmuebleModel.objects.filter(
-                agente=agente,
-                is_active=True
-            ).count()
-            
-            inmuebles_aprobados = InmuebleModel.objects.filter(
-                agente=agente,
-                estado='aprobado',
-                is_active=True
-            ).count()
-            
-            # Contratos cerrados
-            contratos = Contrato.objects.filter(
-                agente=agente,
+        # Una consulta agrupada por tabla (no por agente)
+        metricas = MetricasPorEntidad(a['id'] for a in agentes)
+        metricas.agregar(
+            InmuebleModel.objects.filter(is_active=True), 'agente_id',
+            inmuebles_publicados=Count('id'),
+            inmuebles_aprobados=Count('id', filter=Q(estado='aprobado')),
+        )
+        metricas.agregar(
+            Contrato.objects.filter(
                 fecha_creacion__date__gte=fecha_inicio,
                 fecha_creacion__date__lte=fecha_fin
-            )
-            
-            contratos_cerrados = contratos.count()
-            contratos_activos = contratos.filter(estado='activo').count()
-            
-            # Comisiones generadas
-            comisiones = contratos.aggregate(
-                total=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField())
-            )['total']
-            
-            # Tasa de conversión
-            tasa_conversion = (contratos_cerrados / inmuebles_aprobados * 100) if inmuebles_aprobados > 0 else 0
-            
-            # Citas
-            citas_totales = Cita.objects.filter(
-                agente=agente,
-                fecha_cita__gte=fecha_inicio,
-                fecha_cita__lte=fecha_fin
-            ).count()
-            
-            citas_realizadas = Cita.objects.filter(
-                agente=agente,
-                estado='REALIZADA',
-                fecha_cita__gte=fecha_inicio,
-                fecha_cita__lte=fecha_fin
-            ).count()
-            
-            citas_canceladas = Cita.objects.filter(
-                agente=agente,
-                estado='CANCELADA',
+            ), 'agente_id',
+            contratos_cerrados=Count('id'),
+            contratos_activos=Count('id', filter=Q(estado='activo')),
+            comisiones=Sum('comision_monto'),
+        )
+        metricas.agregar(
+            Cita.objects.filter(
                 fecha_cita__gte=fecha_inicio,
                 fecha_cita__lte=fecha_fin
-            ).count()
+            ), 'agente_id',
+            citas_totales=Count('id'),
+            citas_realizadas=Count('id', filter=Q(estado='REALIZADA')),
+            citas_canceladas=Count('id', filter=Q(estado='CANCELADA')),
+        )
+        metricas.agregar(ChatModel.objects.all(), 'agente_id', chats_atendidos=Count('id'))
+        
+        agentes_data = []
+        
+        for agente in agentes:
+            m = metricas.obtener(agente['id'])
             
-            # Chats
-            chats_atendidos = ChatModel.objects.filter(agente=agente).count()
+            # Tasa de conversión
+            tasa_conversion = (
+                m['contratos_cerrados'] / m['inmuebles_aprobados'] * 100
+            ) if m['inmuebles_aprobados'] > 0 else 0
             
             agentes_data.append({
-                'agente_id': agente.id,
-                'nombre': agente.nombre,
-                'correo': agente.correo,
-                'telefono': agente.telefono,
+                'agente_id': agente['id'],
+                'nombre': agente['nombre'],
+                'correo': agente['correo'],
+                'telefono': agente['telefono'],
                 'inmuebles': {
-                    'publicados': inmuebles_publicados,
-                    'aprobados': inmuebles_aprobados,
+                    'publicados': m['inmuebles_publicados'],
+                    'aprobados': m['inmuebles_aprobados'],
                 },
                 'contratos': {
-                    'cerrados': contratos_cerrados,
-                    'activos': contratos_activos,
+                    'cerrados': m['contratos_cerrados'],
+                    'activos': m['contratos_activos'],
                 },
-                'comisiones_generadas': float(comisiones),
+                'comisiones_generadas': a_float(m['comisiones']),
                 'tasa_conversion': round(tasa_conversion, 2),
                 'citas': {
-                    'totales': citas_totales,
-                    'realizadas': citas_realizadas,
-                    'canceladas': citas_canceladas,
+                    'totales': m['citas_totales'],
+                    'realizadas': m['citas_realizadas'],
+                    'canceladas': m['citas_canceladas'],
                 },
-                'chats_atendidos': chats_atendidos,
+                'chats_atendidos': m['chats_atendidos'],
             })
         
         # Ordenar por comisiones generadas
@@ -628,60 +500,40 @@ def reporte_financiero(request):
         tipo_contrato = request.GET.get('tipo_contrato')
         agrupacion = request.GET.get('agrupacion', 'mes')  # mes, semana, dia
         
-        queryset = Contrato.objects.filter(
-            fecha_creacion__date__gte=fecha_inicio,
-            fecha_creacion__date__lte=fecha_fin,
-            estado__in=['activo', 'finalizado']
-        )
+        filtros = {'estado__in': ['activo', 'finalizado']}
         
         if tipo_contrato:
-            queryset = queryset.filter(tipo_contrato=tipo_contrato)
-        
-        # Total de comisiones
-        total_comisiones = queryset.aggregate(
-            total=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField())
-        )['total']
-        
-        # Comisiones por tipo de contrato
-        comisiones_por_tipo = list(
-            queryset.values('tipo_contrato')
-            .annotate(
-                total=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField()),
-                cantidad=Count('id')
-            )
-        )
-        
-        # Comisiones por agente
-        comisiones_por_agente = list(
-            queryset.values('agente__nombre', 'agente__id')
-            .annotate(
-                total=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField()),
-                cantidad=Count('id')
-            )
-            .order_by('-total')[:10]
-        )
+            filtros['tipo'] = tipo_contrato
         
         # Evolución temporal
         if agrupacion == 'mes':
-            trunc_function = TruncMonth
             date_format = '%Y-%m'
         elif agrupacion == 'semana':
-            trunc_function = TruncWeek
             date_format = '%Y-W%W'
         else:  # dia
-            trunc_function = TruncDay
+            agrupacion = 'dia'
             date_format = '%Y-%m-%d'
         
-        evolucion = list(
-            queryset.annotate(periodo=trunc_function('fecha_creacion'))
-            .values('periodo')
-            .annotate(
-                total_comisiones=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField()),
-                cantidad_contratos=Count('id')
-            )
-            .order_by('periodo')
+        # Resúmenes diarios (+ hoy en crudo) agrupados una vez; el resto en memoria
+        filas = rollups.consultar(
+            'contratos', fecha_inicio, fecha_fin,
+            agrupar=('tipo', 'agente_id', 'ciudad'), periodo=agrupacion, filtros=filtros
         )
         
+        # Total de comisiones
+        total_comisiones = sum((f['monto'] for f in filas), Decimal(0))
+        
+        # Comisiones por tipo de contrato
+        comisiones_por_tipo = rollups.totalizar(filas, 'tipo')
+        
+        # Comisiones por agente
+        comisiones_por_agente = sorted(
+            rollups.totalizar(filas, 'agente_id'), key=lambda a: a['monto'], reverse=True
+        )[:10]
+        nombres = nombres_usuarios(a['agente_id'] for a in comisiones_por_agente)
+        
+        evolucion = sorted(rollups.totalizar(filas, 'periodo'), key=lambda p: p['periodo'])
+        
         # Proyección de ingresos (contratos activos)
         contratos_activos = Contrato.objects.filter(estado='activo')
         proyeccion_ingresos = contratos_activos.aggregate(
@@ -689,31 +541,26 @@ def reporte_financiero(request):
         )['total']
         
         # Comisiones por ciudad
-        comisiones_por_ciudad = list(
-            queryset.values('ciudad')
-            .annotate(
-                total=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField()),
-                cantidad=Count('id')
-            )
-            .order_by('-total')[:10]
-        )
+        comisiones_por_ciudad = sorted(
+            rollups.totalizar(filas, 'ciudad'), key=lambda c: c['monto'], reverse=True
+        )[:10]
         
         data = {
             'periodo': f'{fecha_inicio.isoformat()} a {fecha_fin.isoformat()}',
             'total_comisiones': float(total_comisiones),
             'comisiones_por_tipo': [
                 {
-                    'tipo': item['tipo_contrato'],
-                    'total': float(item['total']),
+                    'tipo': item['tipo'],
+                    'total': float(item['monto']),
                     'cantidad': item['cantidad'],
                 }
                 for item in comisiones_por_tipo
             ],
             'top_10_agentes': [
                 {
-                    'agente': item['agente__nombre'],
-                    'agente_id': item['agente__id'],
-                    'total': float(item['total']),
+                    'agente': nombres.get(item['agente_id']),
+                    'agente_id': item['agente_id'],
+                    'total': float(item['monto']),
                     'cantidad': item['cantidad'],
                 }
                 for item in comisiones_por_agente
@@ -721,8 +568,8 @@ def reporte_financiero(request):
             'evolucion_temporal': [
                 {
                     'periodo': item['periodo'].strftime(date_format),
-                    'total_comisiones': float(item['total_comisiones']),
-                    'cantidad_contratos': item['cantidad_contratos'],
+                    'total_comisiones': float(item['monto']),
+                    'cantidad_contratos': item['cantidad'],
                 }
                 for item in evolucion
             ],
@@ -730,7 +577,7 @@ def reporte_financiero(request):
             'comisiones_por_ciudad': [
                 {
                     'ciudad': item['ciudad'],
-                    'total': float(item['total']),
+                    'total': float(item['monto']),
                     'cantidad': item['cantidad'],
                 }
                 for item in comisiones_por_ciudad
@@ -824,12 +671,11 @@ def reporte_alertas(request):
         
         # Alertas por mes (últimos 6 meses)
         hace_6_meses = hoy - timedelta(days=180)
-        alertas_por_mes = list(
-            AlertaModel.objects.filter(fecha_programada__gte=hace_6_meses)
-            .annotate(mes=TruncMonth('fecha_programada'))
-            .values('mes', 'tipo_alerta')
-            .annotate(total=Count('id'))
-            .order_by('mes', 'tipo_alerta')
+        alertas_por_mes = sorted(
+            rollups.consultar(
+                'alertas', timezone.localdate(hace_6_meses), None, agrupar=('tipo',), periodo='mes'
+            ),
+            key=lambda item: (item['periodo'], item['tipo'])
         )
         
         data = {
@@ -848,9 +694,9 @@ def reporte_alertas(request):
             },
             'historial_mensual': [
                 {
-                    'mes': item['mes'].strftime('%Y-%m'),
-                    'tipo': item['tipo_alerta'],
-                    'total': item['total'],
+                    'mes': item['periodo'].strftime('%Y-%m'),
+                    'tipo': item['tipo'],
+                    'total': item['cantidad'],
                 }
                 for item in alertas_por_mes
             ],
@@ -908,33 +754,28 @@ def reporte_usuarios(request):
         )
         
         # Nuevos registros en el período
-        nuevos_registros = Usuario.objects.filter(
-            date_joined__date__gte=fecha_inicio,
-            date_joined__date__lte=fecha_fin
-        ).count()
+        nuevos_registros = sum(
+            item['cantidad'] for item in rollups.consultar('usuarios', fecha_inicio, fecha_fin)
+        )
         
         # Registros por mes (últimos 12 meses)
-        hace_12_meses = timezone.now() - timedelta(days=365)
-        registros_por_mes = list(
-            Usuario.objects.filter(date_joined__gte=hace_12_meses)
-            .annotate(mes=TruncMonth('date_joined'))
-            .values('mes')
-            .annotate(total=Count('id'))
-            .order_by('mes')
+        hace_12_meses = timezone.localdate() - timedelta(days=365)
+        registros_por_mes = sorted(
+            rollups.consultar('usuarios', hace_12_meses, None, periodo='mes'),
+            key=lambda item: item['periodo']
         )
         
         # Solicitudes de agentes
         solicitudes_totales = SolicitudAgente.objects.count()
         solicitudes_por_estado = list(
             SolicitudAgente.objects.values('estado')
-            .annotate(total=Count('id'))
+            .annotate(total=Count('idSolicitud'))
         )
         
         # Solicitudes recientes
-        solicitudes_recientes = SolicitudAgente.objects.filter(
-            fecha_solicitud__date__gte=fecha_inicio,
-            fecha_solicitud__date__lte=fecha_fin
-        ).count()
+        solicitudes_recientes = sum(
+            item['cantidad'] for item in rollups.consultar('solicitudes', fecha_inicio, fecha_fin)
+        )
         
         # Distribución geográfica (top 10 ubicaciones)
         distribucion_geografica = list(
@@ -954,8 +795,8 @@ def reporte_usuarios(request):
             'nuevos_registros': nuevos_registros,
             'registros_por_mes': [
                 {
-                    'mes': item['mes'].strftime('%Y-%m'),
-                    'total': item['total'],
+                    'mes': item['periodo'].strftime('%Y-%m'),
+                    'total': item['cantidad'],
                 }
                 for item in registros_por_mes
             ],
@@ -1134,7 +975,12 @@ def reporte_comunicacion(request):
         fecha_inicio, fecha_fin = parsear_fechas(request)
         agente_id = request.GET.get('agente_id')
         
+        filtros = {'agente_id': agente_id} if agente_id else {}
+        
         # Chats
+        total_chats = sum(
+            item['cantidad'] for item in rollups.consultar('chats', fecha_inicio, fecha_fin, filtros=filtros)
+        )
         chats_queryset = ChatModel.objects.filter(
             fecha_creacion__date__gte=fecha_inicio,
             fecha_creacion__date__lte=fecha_fin
@@ -1143,12 +989,17 @@ def reporte_comunicacion(request):
         if agente_id:
             chats_queryset = chats_queryset.filter(agente_id=agente_id)
         
-        total_chats = chats_queryset.count()
         chats_activos = chats_queryset.filter(
             mensajes__leido=False
         ).distinct().count()
         
-        # Mensajes
+        # Mensajes (por día, agente del chat y remitente)
+        filas_mensajes = rollups.consultar(
+            'mensajes', fecha_inicio, fecha_fin, agrupar=('agente_id', 'tipo'), periodo='dia', filtros=filtros
+        )
+        total_mensajes = sum(item['cantidad'] for item in filas_mensajes)
+        
+        # El estado de lectura cambia con el tiempo: se cuenta en crudo
         mensajes_queryset = MensajeModel.objects.filter(
             fecha_envio__date__gte=fecha_inicio,
             fecha_envio__date__lte=fecha_fin
@@ -1157,51 +1008,49 @@ def reporte_comunicacion(request):
         if agente_id:
             mensajes_queryset = mensajes_queryset.filter(chat__agente_id=agente_id)
         
-        total_mensajes = mensajes_queryset.count()
         mensajes_sin_leer = mensajes_queryset.filter(leido=False).count()
         
         # Mensajes por día
-        mensajes_por_dia = list(
-            mensajes_queryset.annotate(dia=TruncDay('fecha_envio'))
-            .values('dia')
-            .annotate(total=Count('id'))
-            .order_by('dia')
-        )
+        mensajes_por_dia = sorted(rollups.totalizar(filas_mensajes, 'periodo'), key=lambda item: item['periodo'])
         
         # Tiempo promedio de respuesta de agentes (aproximado)
         # Esto requeriría lógica más compleja para calcular exactamente
         
-        # Top agentes por mensajes
-        top_agentes_mensajes = list(
-            MensajeModel.objects.filter(
-                fecha_envio__date__gte=fecha_inicio,
-                fecha_envio__date__lte=fecha_fin,
-                usuario__grupo__nombre='Agente'
-            )
-            .values('usuario__nombre', 'usuario__id')
-            .annotate(total=Count('id'))
-            .order_by('-total')[:10]
-        )
+        # Top agentes por mensajes (enviados por el agente en sus chats)
+        top_agentes_mensajes = sorted(
+            rollups.totalizar(
+                rollups.consultar(
+                    'mensajes', fecha_inicio, fecha_fin, agrupar=('agente_id',), filtros={'tipo': 'agente'}
+                ),
+                'agente_id'
+            ),
+            key=lambda item: item['cantidad'], reverse=True
+        )[:10]
+        nombres = nombres_usuarios(item['agente_id'] for item in top_agentes_mensajes)
+        top_agentes_mensajes = [
+            {
+                'usuario__nombre': nombres.get(item['agente_id']),
+                'usuario__id': item['agente_id'],
+                'total': item['cantidad'],
+            }
+            for item in top_agentes_mensajes
+        ]
         
         # Citas
-        citas_queryset = Cita.objects.filter(
-            fecha_cita__gte=fecha_inicio,
-            fecha_cita__lte=fecha_fin
-        )
-        
-        if agente_id:
-            citas_queryset = citas_queryset.filter(agente_id=agente_id)
+        citas_por_estado = [
+            {'estado': item['estado'], 'total': item['cantidad']}
+            for item in rollups.consultar(
+                'citas', fecha_inicio, fecha_fin, agrupar=('estado',), filtros=filtros
+            )
+        ]
+        total_citas = sum(item['total'] for item in citas_por_estado)
         
-        total_citas = citas_queryset.count()
+        def citas_en(estado):
+            return next((item['total'] for item in citas_por_estado if item['estado'] == estado), 0)
         
-        citas_por_estado = list(
-            citas_queryset.values('estado')
-            .annotate(total=Count('id'))
-        )
-        
-        citas_realizadas = citas_queryset.filter(estado='REALIZADA').count()
-        citas_canceladas = citas_queryset.filter(estado='CANCELADA').count()
-        citas_pendientes = citas_queryset.filter(estado='PENDIENTE').count()
+        citas_realizadas = citas_en('REALIZADA')
+        citas_canceladas = citas_en('CANCELADA')
+        citas_pendientes = citas_en('PENDIENTE')
         
         # Tasa de efectividad de citas
         tasa_efectividad = (citas_realizadas / total_citas * 100) if total_citas > 0 else 0
@@ -1217,8 +1066,8 @@ def reporte_comunicacion(request):
                 'sin_leer': mensajes_sin_leer,
                 'por_dia': [
                     {
-                        'dia': item['dia'].strftime('%Y-%m-%d'),
-                        'total': item['total'],
+                        'dia': item['periodo'].strftime('%Y-%m-%d'),
+                        'total': item['cantidad'],
                     }
                     for item in mensajes_por_dia
                 ],
@@ -1255,115 +1104,85 @@ def reporte_comunicacion(request):
 # ============================================
 
 @api_view(['GET'])
-# @permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated])
 def reporte_comparativo(request):
     """
     GET /api/reportes/comparativo/
-    Query params: fecha_inicio_1, fecha_fin_1, fecha_inicio_2, fecha_fin_2
-    Compara dos períodos de tiempo
+    Query params (una de las tres formas):
+      - granularidad (dia/semana/mes), cantidad, hasta: últimos N períodos consecutivos
+      - periodos: rangos arbitrarios "2024-01-01:2024-01-31,2024-03-01:2024-03-31"
+      - fecha_inicio_1, fecha_fin_1, fecha_inicio_2, fecha_fin_2: compara dos períodos
+    Todas las métricas se calculan con una consulta agrupada por tabla,
+    sin importar cuántos períodos se pidan.
     """
     
+    granularidad = request.GET.get('granularidad')
+    rangos = request.GET.get('periodos')
+    max_periodos = getattr(settings, 'REPORTES_COMPARATIVO_MAX_PERIODOS', 24)
+    legado = not (granularidad or rangos)
+
+    # Los períodos se validan (cantidad y fechas) antes de construirlos
     try:
-        # Período 1
-        fecha_inicio_1 = request.GET.get('fecha_inicio_1')
-        fecha_fin_1 = request.GET.get('fecha_fin_1')
-        
-        # Período 2
-        fecha_inicio_2 = request.GET.get('fecha_inicio_2')
-        fecha_fin_2 = request.GET.get('fecha_fin_2')
-        
-        # Validar fechas
-        if not all([fecha_inicio_1, fecha_fin_1, fecha_inicio_2, fecha_fin_2]):
-            return Response({
-                "status": 0,
-                "error": 1,
-                "message": "Debe proporcionar ambos períodos completos",
-                "values": {}
-            })
-        
-        fecha_inicio_1 = datetime.strptime(fecha_inicio_1, '%Y-%m-%d').date()
-        fecha_fin_1 = datetime.strptime(fecha_fin_1, '%Y-%m-%d').date()
-        fecha_inicio_2 = datetime.strptime(fecha_inicio_2, '%Y-%m-%d').date()
-        fecha_fin_2 = datetime.strptime(fecha_fin_2, '%Y-%m-%d').date()
-        
-        def obtener_metricas_periodo(inicio, fin):
-            """Calcula métricas para un período específico"""
-            # Inmuebles
-            inmuebles = InmuebleModel.objects.filter(
-                fecha_creacion__date__gte=inicio,
-                fecha_creacion__date__lte=fin
-            ).count()
-            
-            # Contratos
-            contratos = Contrato.objects.filter(
-                fecha_creacion__date__gte=inicio,
-                fecha_creacion__date__lte=fin
-            )
-            total_contratos = contratos.count()
-            
-            # Ingresos
-            ingresos = contratos.aggregate(
-                total=Coalesce(Sum('comision_monto'), 0, output_field=DecimalField())
-            )['total']
-            
-            # Usuarios nuevos
-            usuarios_nuevos = Usuario.objects.filter(
-                date_joined__date__gte=inicio,
-                date_joined__date__lte=fin
-            ).count()
-            
-            # Anuncios
-            anuncios = AnuncioModel.objects.filter(
-                fecha_publicacion__date__gte=inicio,
-                fecha_publicacion__date__lte=fin
-            ).count()
-            
-            # Citas
-            citas = Cita.objects.filter(
-                fecha_cita__gte=inicio,
-                fecha_cita__lte=fin
-            ).count()
-            
-            return {
-                'inmuebles': inmuebles,
-                'contratos': total_contratos,
-                'ingresos': float(ingresos),
-                'usuarios_nuevos': usuarios_nuevos,
-                'anuncios': anuncios,
-                'citas': citas,
-            }
-        
-        metricas_1 = obtener_metricas_periodo(fecha_inicio_1, fecha_fin_1)
-        metricas_2 = obtener_metricas_periodo(fecha_inicio_2, fecha_fin_2)
-        
-        # Calcular variaciones porcentuales
-        def calcular_variacion(valor1, valor2):
-            if valor2 == 0:
-                return 0 if valor1 == 0 else 100
-            return ((valor1 - valor2) / valor2) * 100
-        
-        variaciones = {
-            'inmuebles': round(calcular_variacion(metricas_1['inmuebles'], metricas_2['inmuebles']), 2),
-            'contratos': round(calcular_variacion(metricas_1['contratos'], metricas_2['contratos']), 2),
-            'ingresos': round(calcular_variacion(metricas_1['ingresos'], metricas_2['ingresos']), 2),
-            'usuarios_nuevos': round(calcular_variacion(metricas_1['usuarios_nuevos'], metricas_2['usuarios_nuevos']), 2),
-            'anuncios': round(calcular_variacion(metricas_1['anuncios'], metricas_2['anuncios']), 2),
-            'citas': round(calcular_variacion(metricas_1['citas'], metricas_2['citas']), 2),
-        }
-        
-        data = {
-            'periodo_1': {
-                'inicio': fecha_inicio_1.isoformat(),
-                'fin': fecha_fin_1.isoformat(),
-                'metricas': metricas_1,
-            },
-            'periodo_2': {
-                'inicio': fecha_inicio_2.isoformat(),
-                'fin': fecha_fin_2.isoformat(),
-                'metricas': metricas_2,
-            },
-            'variaciones_porcentuales': variaciones,
-        }
+        if granularidad:
+            try:
+                cantidad = int(request.GET.get('cantidad', 2))
+            except ValueError:
+                raise comparativo.PeriodosInvalidos("cantidad debe ser un número entero")
+            comparativo.validar_cantidad(cantidad, max_periodos)
+            hasta = request.GET.get('hasta')
+            hasta = datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else timezone.localdate()
+            periodos = comparativo.periodos_consecutivos(granularidad, cantidad, hasta)
+        elif rangos:
+            rangos = rangos.split(',')
+            comparativo.validar_cantidad(len(rangos), max_periodos)
+            periodos = []
+            for rango in rangos:
+                inicio, _, fin = rango.partition(':')
+                periodos.append(comparativo.periodo_rango(
+                    datetime.strptime(inicio.strip(), '%Y-%m-%d').date(),
+                    datetime.strptime(fin.strip(), '%Y-%m-%d').date(),
+                ))
+        else:
+            fechas = [
+                request.GET.get(nombre)
+                for nombre in ('fecha_inicio_1', 'fecha_fin_1', 'fecha_inicio_2', 'fecha_fin_2')
+            ]
+            if not all(fechas):
+                return Response({
+                    "status": 0,
+                    "error": 1,
+                    "message": "Debe proporcionar ambos períodos completos",
+                    "values": {}
+                })
+            fechas = [datetime.strptime(f, '%Y-%m-%d').date() for f in fechas]
+            # El período 2 es la base de comparación del período 1
+            periodos = [
+                comparativo.periodo_rango(fechas[2], fechas[3], 'periodo_2'),
+                comparativo.periodo_rango(fechas[0], fechas[1], 'periodo_1'),
+            ]
+        comparativo.validar_periodos(periodos, max_periodos)
+    except (ValueError, OverflowError) as e:
+        # PeriodosInvalidos, fechas mal formadas o fuera de rango
+        return Response({
+            "status": 0,
+            "error": 1,
+            "message": str(e),
+            "values": {}
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        resultados = comparativo.comparar_periodos(periodos)
+        data = {'periodos': resultados}
+        
+        if legado:
+            periodo_2, periodo_1 = resultados
+            for periodo in (periodo_1, periodo_2):
+                data[periodo['etiqueta']] = {
+                    'inicio': periodo['inicio'],
+                    'fin': periodo['fin'],
+                    'metricas': periodo['metricas'],
+                }
+            data['variaciones_porcentuales'] = periodo_1['variaciones_porcentuales']
         
         return Response({
             "status": 1,
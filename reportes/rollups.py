@@ -0,0 +1,274 @@
+# reportes/rollups.py
+"""
+Resúmenes diarios (MetricaDiaria) para los reportes gerenciales.
+
+Cada métrica se define con una `Fuente` (modelo, campo de fecha, campo de
+modificación y dimensiones). La misma definición sirve para:
+
+- llenar los resúmenes (`manage.py actualizar_metricas_diarias`), reprocesando
+  solo los días nuevos o con filas modificadas (campo auto_now de cada modelo)
+  desde la última marca de agua. Los borrados no dejan rastro: tras eliminar
+  registros se usa `--reconstruir`;
+- responder consultas por rango de fechas con `consultar()`, que lee los días ya
+  resumidos de MetricaDiaria y calcula en crudo solo los días posteriores a la
+  marca (normalmente solo hoy).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import Count, Sum, F, Value, Case, When
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek, Coalesce
+from django.utils import timezone
+
+from .models import MetricaDiaria, MarcaMetrica
+
+
+DIMENSIONES = ('agente_id', 'tipo', 'estado', 'ciudad')
+
+
+class Fuente:
+    def __init__(self, nombre, modelo, campo_fecha, campo_cambio, dimensiones=None, monto=None):
+        self.nombre = nombre
+        self.modelo_label = modelo
+        self.campo_fecha = campo_fecha
+        # Campo auto_now: se reprocesan los días de las filas modificadas
+        self.campo_cambio = campo_cambio
+        # dimensión del resumen -> ruta o expresión sobre el modelo
+        self.dimensiones = dimensiones or {}
+        self.monto = monto
+
+    @property
+    def modelo(self):
+        return apps.get_model(self.modelo_label)
+
+    def _es_datetime(self):
+        return isinstance(self.modelo._meta.get_field(self.campo_fecha), models.DateTimeField)
+
+    def _lookup_dia(self):
+        return f'{self.campo_fecha}__date' if self._es_datetime() else self.campo_fecha
+
+    def expr_dia(self):
+        return TruncDate(self.campo_fecha) if self._es_datetime() else F(self.campo_fecha)
+
+    def _expr_dimension(self, dimension):
+        expr = self.dimensiones[dimension]
+        return F(expr) if isinstance(expr, str) else expr
+
+    def dias_modificados(self, desde):
+        """Días (según campo_fecha) de las filas modificadas después de `desde`."""
+        return set(
+            self.modelo.objects.filter(**{f'{self.campo_cambio}__gt': desde})
+            .annotate(r_dia=self.expr_dia())
+            .order_by()
+            .values_list('r_dia', flat=True)
+            .distinct()
+        )
+
+    def todos_los_dias(self):
+        return set(
+            self.modelo.objects.annotate(r_dia=self.expr_dia())
+            .order_by()
+            .values_list('r_dia', flat=True)
+            .distinct()
+        )
+
+    def filas(self, filtro_fechas, filtros=None):
+        """
+        Agrega en crudo por día y dimensiones. `filtro_fechas` es un dict de
+        lookups sobre el día ({'__gte': d1, '__lte': d2} o {'__in': [...]}) y
+        `filtros` usa los nombres de dimensión del resumen ({'tipo': 'alquiler'}).
+        """
+        qs = self.modelo.objects.filter(
+            **{f'{self._lookup_dia()}{lookup}': valor for lookup, valor in filtro_fechas.items()}
+        ).annotate(
+            r_dia=self.expr_dia(),
+            **{f'd_{dim}': self._expr_dimension(dim) for dim in self.dimensiones}
+        )
+
+        for lookup, valor in (filtros or {}).items():
+            dimension = lookup.split('__')[0]
+            if dimension not in self.dimensiones:
+                # La métrica no tiene esa dimensión: en el resumen vale ''/NULL
+                vacio = None if dimension == 'agente_id' else ''
+                if lookup == dimension and valor != vacio:
+                    return []
+                continue
+            qs = qs.filter(**{f'd_{lookup}': valor})
+
+        agregados = {'r_cantidad': Count('pk')}
+        if self.monto:
+            agregados['r_cantidad_monto'] = Count(self.monto)
+            agregados['r_monto'] = Coalesce(
+                Sum(self.monto), Value(Decimal(0)), output_field=models.DecimalField()
+            )
+
+        filas = []
+        columnas = ['r_dia'] + [f'd_{dim}' for dim in self.dimensiones]
+        for fila in qs.order_by().values(*columnas).annotate(**agregados):
+            datos = {
+                'dia': fila['r_dia'],
+                'cantidad': fila['r_cantidad'],
+                'cantidad_monto': fila.get('r_cantidad_monto', 0),
+                'monto': fila.get('r_monto', Decimal(0)),
+            }
+            for dim in DIMENSIONES:
+                valor = fila.get(f'd_{dim}')
+                datos[dim] = valor if dim == 'agente_id' else (valor or '')
+            filas.append(datos)
+        return filas
+
+
+FUENTES = {
+    f.nombre: f for f in [
+        Fuente(
+            'contratos', 'contrato.Contrato', 'fecha_creacion', 'fecha_actualizacion',
+            {'agente_id': 'agente_id', 'tipo': 'tipo_contrato', 'estado': 'estado', 'ciudad': 'ciudad'},
+            monto='comision_monto',
+        ),
+        Fuente('chats', 'contacto.ChatModel', 'fecha_creacion', 'fecha_actualizacion', {'agente_id': 'agente_id'}),
+        Fuente(
+            'mensajes', 'contacto.MensajeModel', 'fecha_envio', 'fecha_actualizacion',
+            {
+                'agente_id': 'chat__agente_id',
+                # Quién envió el mensaje dentro del chat
+                'tipo': Case(
+                    When(usuario_id=F('chat__agente_id'), then=Value('agente')),
+                    default=Value('cliente'),
+                    output_field=models.CharField(),
+                ),
+            },
+        ),
+        Fuente(
+            'citas', 'cita.Cita', 'fecha_cita', 'actualizado_en',
+            {'agente_id': 'agente_id', 'estado': 'estado'},
+        ),
+        Fuente(
+            'alertas', 'alertas.AlertaModel', 'fecha_programada', 'fecha_actualizacion',
+            {'agente_id': 'usuario_receptor_id', 'tipo': 'tipo_alerta'},
+        ),
+        Fuente('usuarios', 'usuario.Usuario', 'date_joined', 'updated_at'),
+        Fuente('solicitudes', 'usuario.SolicitudAgente', 'fecha_solicitud', 'updated_at', {'estado': 'estado'}),
+    ]
+}
+
+
+# ============================================
+# Llenado incremental
+# ============================================
+
+def actualizar_metrica(nombre, reconstruir=False, dias_por_lote=31):
+    """
+    Recalcula los días pendientes de una métrica hasta ayer (hoy siempre se lee
+    en crudo). Retorna la cantidad de días reprocesados.
+    """
+    fuente = FUENTES[nombre]
+    ahora = timezone.now()
+    ayer = timezone.localdate() - timedelta(days=1)
+    marca = MarcaMetrica.objects.filter(metrica=nombre).first()
+
+    if marca is None or reconstruir:
+        MetricaDiaria.objects.filter(metrica=nombre).delete()
+        dias = fuente.todos_los_dias()
+    else:
+        dias = fuente.dias_modificados(marca.procesado_hasta)
+        dia = marca.ultimo_dia + timedelta(days=1)
+        while dia <= ayer:
+            dias.add(dia)
+            dia += timedelta(days=1)
+
+    dias = sorted(d for d in dias if d is not None and d <= ayer)
+    for i in range(0, len(dias), dias_por_lote):
+        lote = dias[i:i + dias_por_lote]
+        with transaction.atomic():
+            MetricaDiaria.objects.filter(metrica=nombre, dia__in=lote).delete()
+            MetricaDiaria.objects.bulk_create(
+                [MetricaDiaria(metrica=nombre, **fila) for fila in fuente.filas({'__in': lote})],
+                batch_size=1000,
+            )
+
+    MarcaMetrica.objects.update_or_create(
+        metrica=nombre,
+        defaults={'ultimo_dia': ayer, 'procesado_hasta': ahora},
+    )
+    return len(dias)
+
+
+# ============================================
+# Consultas
+# ============================================
+
+TRUNC_PERIODO = {'mes': TruncMonth, 'semana': TruncWeek}
+
+
+def _truncar(dia, periodo):
+    if periodo == 'mes':
+        return dia.replace(day=1)
+    if periodo == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    return dia
+
+
+def consultar(nombre, inicio, fin, agrupar=(), periodo=None, filtros=None):
+    """
+    Totales de una métrica entre `inicio` y `fin` (fechas, inclusive; fin=None
+    sin límite superior), agrupados por las dimensiones de `agrupar` y
+    opcionalmente por periodo ('dia', 'semana', 'mes'). Cada fila trae
+    cantidad, cantidad_monto y monto.
+    """
+    filtros = filtros or {}
+    claves = tuple(agrupar) + (('periodo',) if periodo else ())
+    totales = defaultdict(lambda: {'cantidad': 0, 'cantidad_monto': 0, 'monto': Decimal(0)})
+
+    def acumular(clave, cantidad, cantidad_monto, monto):
+        t = totales[clave]
+        t['cantidad'] += cantidad or 0
+        t['cantidad_monto'] += cantidad_monto or 0
+        t['monto'] += monto or 0
+
+    marca = MarcaMetrica.objects.filter(metrica=nombre).values_list('ultimo_dia', flat=True).first()
+    inicio_crudo = inicio
+
+    # Días ya resumidos
+    if marca is not None and inicio <= marca:
+        qs = MetricaDiaria.objects.filter(
+            metrica=nombre, dia__gte=inicio, dia__lte=marca if fin is None else min(fin, marca), **filtros
+        )
+        if periodo:
+            qs = qs.annotate(periodo=TRUNC_PERIODO[periodo]('dia') if periodo in TRUNC_PERIODO else F('dia'))
+        filas = qs.order_by().values(*claves).annotate(
+            t_cantidad=Sum('cantidad'), t_cantidad_monto=Sum('cantidad_monto'), t_monto=Sum('monto'),
+        )
+        for fila in filas:
+            acumular(tuple(fila[c] for c in claves), fila['t_cantidad'], fila['t_cantidad_monto'], fila['t_monto'])
+        inicio_crudo = marca + timedelta(days=1)
+
+    # Días posteriores a la marca (hoy): en crudo
+    if fin is None or inicio_crudo <= fin:
+        filtro_fechas = {'__gte': inicio_crudo}
+        if fin is not None:
+            filtro_fechas['__lte'] = fin
+        for fila in FUENTES[nombre].filas(filtro_fechas, filtros):
+            if periodo:
+                fila['periodo'] = _truncar(fila['dia'], periodo)
+            acumular(tuple(fila[c] for c in claves), fila['cantidad'], fila['cantidad_monto'], fila['monto'])
+
+    return [dict(zip(claves, clave), **valores) for clave, valores in totales.items()]
+
+
+def totalizar(filas, *claves):
+    """Re-agrupa en memoria filas de consultar() por un subconjunto de claves."""
+    totales = defaultdict(lambda: {'cantidad': 0, 'cantidad_monto': 0, 'monto': Decimal(0)})
+    for fila in filas:
+        t = totales[tuple(fila[c] for c in claves)]
+        t['cantidad'] += fila['cantidad']
+        t['cantidad_monto'] += fila['cantidad_monto']
+        t['monto'] += fila['monto']
+    return [dict(zip(claves, clave), **valores) for clave, valores in totales.items()]
+
+
+def promedio(fila):
+    """Equivalente a Avg(monto): ignora filas con monto nulo."""
+    return fila['monto'] / fila['cantidad_monto'] if fila['cantidad_monto'] else None
@@ -0,0 +1,35 @@
+# reportes/signals.py
+# Invalida los resultados cacheados de los reportes dinámicos cuando cambian
+# los modelos de los que dependen (ver reportes/planes.py).
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from contrato.estados import transicion
+
+from . import planes
+
+
+def _invalidar(sender, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    # El login solo actualiza last_login: no cambia ningún reporte
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    label = sender._meta.label
+    # Al confirmar la transacción: antes, otra petición podría cachear datos viejos con la versión nueva
+    transaction.on_commit(lambda: planes.invalidar_modelo(label))
+
+
+for _label in planes.MODELOS_OBSERVADOS:
+    _modelo = apps.get_model(_label)
+    post_save.connect(_invalidar, sender=_modelo, dispatch_uid=f'reportes_invalidar_save_{_label}')
+    post_delete.connect(_invalidar, sender=_modelo, dispatch_uid=f'reportes_invalidar_delete_{_label}')
+
+
+def _invalidar_transicion(sender, **kwargs):
+    # Cambios de estado por lote (UPDATE sin post_save); la señal llega después del commit
+    planes.invalidar_modelo(sender._meta.label)
+
+
+transicion.connect(_invalidar_transicion, dispatch_uid='reportes_invalidar_transicion_contrato')
@@ -1,3 +1,71 @@
+from datetime import date, time
+from decimal import Decimal
+
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from cita.models import Cita
+from contacto.models import ChatModel
+from contrato.models import Contrato
+from inmueble.models import InmuebleModel
+from usuario.models import Grupo, Usuario
+
+from .reportes_gerenciales_views import reporte_agentes
+
+
+class ReporteAgentesConsultasTest(TestCase):
+    """reporte_agentes hace una consulta por tabla, no una por agente."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.grupo = Grupo.objects.create(nombre='Agente')
+        cls.cliente = Usuario.objects.create(username='cliente', nombre='Cliente', correo='cliente@test.com')
+        cls.admin = Usuario.objects.create(username='admin', nombre='Admin', correo='admin@test.com', is_staff=True)
+
+    def crear_agentes(self, cantidad):
+        for i in range(cantidad):
+            agente = Usuario.objects.create(
+                username=f'agente{i}', nombre=f'Agente {i}', correo=f'agente{i}@test.com', grupo=self.grupo,
+            )
+            inmueble = InmuebleModel.objects.create(
+                agente=agente, superficie=100, precio=1000, tipo_operacion='venta', estado='aprobado',
+            )
+            # bulk_create: sin las señales de post_save (alertas, PDFs)
+            Contrato.objects.bulk_create([
+                Contrato(
+                    agente=agente, inmueble=inmueble, tipo_contrato='venta', estado='activo',
+                    ciudad='La Paz', fecha_contrato=date.today(),
+                    parte_contratante_nombre='Propietario', parte_contratante_ci='1',
+                    parte_contratada_nombre='Comprador', comision_monto=Decimal('100.00'),
+                )
+            ])
+            Cita.objects.create(
+                titulo='Visita', fecha_cita=date.today(), hora_inicio=time(9), hora_fin=time(10),
+                estado='REALIZADA', cliente=self.cliente, agente=agente,
+            )
+            ChatModel.objects.create(cliente=self.cliente, agente=agente)
+
+    def consultar(self):
+        request = APIRequestFactory().get('/api/reportes/agentes/')
+        force_authenticate(request, user=self.admin)
+        with self.assertNumQueries(5):
+            response = reporte_agentes(request)
+        self.assertEqual(response.data['status'], 1)
+        return response.data['values']
+
+    def test_tres_agentes(self):
+        self.crear_agentes(3)
+        values = self.consultar()
+        self.assertEqual(values['totales']['total_agentes'], 3)
+        agente = values['agentes'][0]
+        self.assertEqual(agente['contratos']['cerrados'], 1)
+        self.assertEqual(agente['citas']['realizadas'], 1)
+        self.assertEqual(agente['chats_atendidos'], 1)
+        self.assertEqual(agente['comisiones_generadas'], 100.0)
 
-# Create your tests here.
+    def test_treinta_agentes(self):
+        self.crear_agentes(30)
+        values = self.consultar()
+        self.assertEqual(values['totales']['total_agentes'], 30)
+        self.assertEqual(values['totales']['total_contratos'], 30)
+        self.assertEqual(values['totales']['total_comisiones'], 3000.0)
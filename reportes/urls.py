@@ -1,7 +1,10 @@
 # reportes/urls.py
 from django.urls import path
 # ✅ --- IMPORTA LA NUEVA VISTA ---
-from .views import GenerarReporteView, ExportarDatosView, ReporteDirectoView
+from .views import (
+    GenerarReporteView, ExportarDatosView, ReporteDirectoView,
+    TrabajosExportacionView, TrabajoExportacionView, DescargarExportacionView,
+)
 from . import reportes_gerenciales_views
 
 urlpatterns = [
@@ -14,6 +17,12 @@ urlpatterns = [
     # Ruta de exportación (usada por ambos)
     path('exportar/', ExportarDatosView.as_view(), name='exportar_reporte_archivo'),
 
+    # Exportaciones en segundo plano (crear, consultar avance, descargar)
+    path('exportar/trabajos/', TrabajosExportacionView.as_view(), name='crear_trabajo_exportacion'),
+    path('exportar/trabajos/<int:trabajo_id>/', TrabajoExportacionView.as_view(), name='trabajo_exportacion'),
+    path('exportar/trabajos/<int:trabajo_id>/descargar/', DescargarExportacionView.as_view(),
+         name='descargar_trabajo_exportacion'),
+
     # Dashboard general
     path('dashboard/', reportes_gerenciales_views.dashboard_general, name='dashboard_general'),
     
@@ -2,7 +2,8 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.conf import settings
 
 import json
@@ -24,9 +25,15 @@ from usuario.models import Usuario, Grupo
 from inmueble.models import InmuebleModel, TipoInmuebleModel, AnuncioModel
 from contrato.models import Contrato
 from cita.models import Cita
+from inmobiliaria.permissions import es_administrador
+from utils import cursores
+from utils.archivos import servir_archivo
+from utils.flujos import flujo_asincrono
 
 from .permissions import IsAdminOrAgente
-from .generators import generar_reporte_pdf, generar_reporte_excel
+from .models import TrabajoExportacion
+from . import exportaciones, planes
+from .generators import generar_reporte_pdf, generar_reporte_excel, generar_reporte_csv
 
 # --- (Imports de dateutil y decouple) ---
 try:
@@ -57,7 +64,31 @@ DJANGO_LOOKUP_OPERATORS = [
     'istartswith', 'endswith', 'iendswith'
 ]
 ALLOWED_AGGREGATIONS = {'Sum': Sum, 'Count': Count}
-MAX_ROWS = 1000
+# Filas por página de los reportes en pantalla (se sigue con el cursor) y filas por bloque enviado
+MAX_ROWS = getattr(settings, 'REPORTES_MAX_ROWS', 1000)
+JSON_CHUNK_SIZE = getattr(settings, 'REPORTES_JSON_CHUNK_SIZE', 500)
+
+# Exportación desde consulta: filas por bloque del cursor y tope opcional de filas
+EXPORT_CHUNK_SIZE = getattr(settings, 'REPORTES_EXPORT_CHUNK_SIZE', 2000)
+EXPORT_MAX_ROWS = getattr(settings, 'REPORTES_EXPORT_MAX_ROWS', None)
+
+GENERADORES = {
+    'pdf': generar_reporte_pdf,
+    'excel': generar_reporte_excel,
+    'csv': generar_reporte_csv,
+}
+
+# Columnas por defecto de cada tipo de reporte (sin agrupación)
+# (_CAMPOS_VALIDOS guarda las que pasaron la validación, por tipo)
+CAMPOS_POR_TIPO = {
+    "inmuebles": ['id', 'titulo', 'agente__nombre', 'tipo_inmueble__nombre', 'ciudad', 'zona', 'precio', 'tipo_operacion', 'estado'],
+    "contratos": ['id', 'tipo_contrato', 'agente__nombre', 'inmueble__titulo', 'fecha_contrato', 'monto', 'comision_monto', 'estado'],
+    "agentes": ['id', 'nombre', 'correo', 'telefono', 'ci', 'grupo__nombre'],
+    "clientes": ['id', 'nombre', 'correo', 'telefono', 'ci', 'grupo__nombre'],
+    "citas": ['id', 'titulo', 'agente__nombre', 'cliente__nombre', 'fecha_cita', 'hora_inicio', 'estado'],
+    "anuncios": ['id', 'inmueble__titulo', 'fecha_publicacion', 'estado', 'prioridad'],
+}
+_CAMPOS_VALIDOS = {}
 
 _GEMINI_API_KEY = getattr(settings, 'GEMINI_API_KEY', None) \
     or os.getenv('GEMINI_API_KEY') \
@@ -79,6 +110,35 @@ def _json_converter(o):
     if isinstance(o, Decimal): return f"{o:.2f}"
     raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
 
+def _limite_filas(valor):
+    try: limite = int(valor)
+    except (TypeError, ValueError): return MAX_ROWS
+    return max(1, min(limite, MAX_ROWS))
+
+SALT_CURSOR = "reportes.cursor"
+
+def _crear_cursor(interpretacion, offset):
+    """
+    Cursor de continuación firmado (utils/cursores.py): la interpretación y
+    la fila desde la que seguir. El orden de un reporte depende de la
+    interpretación (agrupaciones, campos), por eso se sigue por posición y no
+    por keyset como en contrato/listado.py; la firma impide pedir con el
+    cursor una interpretación u offset distintos de los que entregó el servidor.
+    """
+    datos = json.loads(json.dumps(interpretacion, default=_json_converter))
+    return cursores.crear({"i": datos, "o": offset}, SALT_CURSOR)
+
+def _leer_cursor(cursor):
+    """(interpretación, offset) del cursor; (None, 0) si no se envió."""
+    if not cursor: return None, 0
+    datos = cursores.leer(cursor, SALT_CURSOR)
+    try:
+        offset = int(datos["o"])
+        if offset < 0: raise ValueError("offset negativo")
+        return _normalize_interpretacion(datos["i"]), offset
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {e}")
+
 def _safe_decimal(value):
     try: return Decimal(value)
     except (InvalidOperation, TypeError, ValueError): return None
@@ -248,6 +308,20 @@ class ReporteBaseView(APIView):
             raise ValueError(f"Valor '{value}' inválido para filtro '{lookup}': {e}")
 
     def _build_queryset(self, interpretacion):
+        """
+        Queryset de la interpretación, reutilizando el plan ya validado si la
+        misma interpretación (canónica) se compiló antes en este proceso.
+        """
+        clave = planes.clave_spec(interpretacion)
+        plan = planes.planes.obtener(clave)
+        if plan is None:
+            plan = self._compilar_queryset(interpretacion)
+            planes.planes.guardar(clave, plan)
+        queryset, hubo_agrupacion = plan
+        # Clon sin evaluar: el plan cacheado nunca guarda resultados
+        return queryset.all(), hubo_agrupacion
+
+    def _compilar_queryset(self, interpretacion):
         """
         Construye el queryset según la interpretación. Incluye:
         - Sanitizado defensivo de filtros para 'inmuebles' (fechas -> anuncio__fecha_publicacion).
@@ -384,6 +458,155 @@ class ReporteBaseView(APIView):
 
         return queryset, hubo_agrupacion
 
+    def _traducir_builder_a_interpretacion(self, builder):
+        """
+        Convierte el JSON simple del "Reporte Rápido" al formato esperado por _build_queryset.
+        Incluye filtros de MONTO y mapea fechas al campo correcto por tipo.
+        """
+        tipo = (builder or {}).get("tipo", "inmuebles")
+        filtros_in = (builder or {}).get("filtros", {})
+
+        filtros_out = {}
+
+        # 1) Estado
+        if filtros_in.get("estado"):
+            filtros_out["estado__exact"] = filtros_in["estado"]
+
+        # 2) Ciudad
+        if filtros_in.get("ciudad"):
+            filtros_out["ciudad__icontains"] = filtros_in["ciudad"]
+
+        # 3) Fechas
+        fecha_desde = filtros_in.get("fechaDesde")
+        fecha_hasta = filtros_in.get("fechaHasta")
+
+        DATE_FIELD_MAP = {
+            "inmuebles": "anuncio__fecha_publicacion",
+            "contratos": "fecha_contrato",
+            "citas": "fecha_cita",
+            "anuncios": "fecha_publicacion",
+            "agentes": "date_joined",
+            "clientes": "date_joined"
+        }
+        date_field = DATE_FIELD_MAP.get(tipo, "id")
+
+        if fecha_desde and fecha_hasta:
+            filtros_out[f"{date_field}__range"] = [fecha_desde, fecha_hasta]
+        elif fecha_desde:
+            filtros_out[f"{date_field}__gte"] = fecha_desde
+        elif fecha_hasta:
+            filtros_out[f"{date_field}__lte"] = fecha_hasta
+
+        # 4) Monto
+        monto_op = filtros_in.get("montoOp", "gte")  # gte por defecto
+        monto_valor = filtros_in.get("montoValor")
+
+        MONTO_FIELD_MAP = {
+            "inmuebles": "precio",
+            "contratos": "monto",
+            "anuncios": "inmueble__precio",
+        }
+        monto_field = MONTO_FIELD_MAP.get(tipo)
+
+        if monto_field and (monto_valor is not None and str(monto_valor) != ""):
+            lookup = f"{monto_field}__{monto_op}"
+            filtros_out[lookup] = monto_valor
+
+        interpretacion = {
+            "tipo_reporte": tipo,
+            "formato": "pantalla",
+            "filtros": filtros_out if tipo != "inmuebles" else _sanitize_inmueble_filters(filtros_out),
+            "agrupacion": [],
+            "calculos": {},
+            "orden": [],
+            "error": None
+        }
+
+        print(f"[Direct Report] Interpretacion generada: {interpretacion}")
+        return interpretacion
+
+    def _proyectar(self, queryset, hubo_agrupacion, tipo_reporte):
+        """
+        Devuelve el queryset como .values() con las columnas por defecto del
+        tipo de reporte (o las de la agrupación, que ya vienen proyectadas).
+        """
+        if hubo_agrupacion:
+            return queryset
+
+        campos = CAMPOS_POR_TIPO.get(tipo_reporte)
+        if not campos:
+            return queryset.values()
+
+        valid_fields = _CAMPOS_VALIDOS.get(tipo_reporte)
+        if valid_fields is None:
+            ModelClass = queryset.model
+            valid_fields = []
+            for f in campos:
+                try:
+                    self._validate_and_convert_value(ModelClass, f, None)
+                    valid_fields.append(f)
+                except (FieldDoesNotExist, ValueError):
+                    print(f"[WARN] Campo por defecto no encontrado, se omite: {f}")
+            _CAMPOS_VALIDOS[tipo_reporte] = valid_fields
+        return queryset.values(*valid_fields)
+
+    def _respuesta_json(self, request, interpretacion, queryset, hubo_agrupacion, offset=0):
+        """
+        Arreglo JSON con hasta `limite` filas (tope MAX_ROWS) desde `offset`,
+        enviado por bloques a medida que llegan del cursor. Si hay más filas,
+        el header X-Cursor-Siguiente trae el cursor para pedir la página
+        siguiente. Las páginas se cachean por interpretación y versión de
+        los datos (ver reportes/planes.py).
+        """
+        limite = _limite_filas(request.data.get('limite'))
+        filas = self._proyectar(queryset, hubo_agrupacion, interpretacion.get("tipo_reporte"))
+        clave = planes.clave_resultado(interpretacion, f"{offset}:{limite}")
+
+        cacheado = planes.resultados.obtener(clave)
+        if cacheado is not None:
+            json_output, siguiente = cacheado
+            response = HttpResponse(json_output, content_type='application/json', status=status.HTTP_200_OK)
+        else:
+            fin = offset + limite
+            siguiente = _crear_cursor(interpretacion, fin) if filas[fin:fin + 1].exists() else None
+            response = StreamingHttpResponse(
+                flujo_asincrono(self._json_en_bloques(filas[offset:fin], clave, siguiente)),
+                content_type='application/json', status=status.HTTP_200_OK,
+            )
+
+        if siguiente:
+            response['X-Cursor-Siguiente'] = siguiente
+        return response
+
+    def _json_en_bloques(self, filas, clave, siguiente):
+        """
+        Genera el arreglo JSON de a JSON_CHUNK_SIZE filas (mismo formato que
+        json.dumps con _json_converter). Si el total no supera
+        RESULTADO_MAX_BYTES, lo deja en la caché de resultados.
+        """
+        partes, tamano = [], 0
+        bloque = ["["]
+        separador = ""
+        for fila in filas.iterator(chunk_size=JSON_CHUNK_SIZE):
+            bloque.append(separador + json.dumps(fila, default=_json_converter))
+            separador = ","
+            if len(bloque) >= JSON_CHUNK_SIZE:
+                texto = "".join(bloque)
+                bloque = []
+                if partes is not None:
+                    tamano += len(texto)
+                    if tamano <= planes.RESULTADO_MAX_BYTES:
+                        partes.append(texto)
+                    else:
+                        partes = None
+                yield texto
+        bloque.append("]")
+        texto = "".join(bloque)
+        yield texto
+
+        if partes is not None and tamano + len(texto) <= planes.RESULTADO_MAX_BYTES:
+            planes.resultados.guardar(clave, ("".join(partes) + texto, siguiente))
+
 # ===================================================================
 # VISTA #1: GenerarReporteView (IA)
 # ===================================================================
@@ -503,17 +726,24 @@ Reglas:
             return _naive_interpret(user_prompt)
 
     def post(self, request, *args, **kwargs):
-        prompt = (request.data.get('prompt') or "").strip()
-        if not prompt:
-            interpretacion = _naive_interpret(prompt)
-        else:
-            interpretacion = self._call_gemini_api(prompt)
+        # Continuación: el cursor trae la interpretación, no se vuelve a llamar a Gemini
+        try:
+            interpretacion, offset = _leer_cursor(request.data.get('cursor'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Asegura estructura y limpia error para no bloquear UX
-        if interpretacion.get("error") and not interpretacion.get("tipo_reporte"):
-            interpretacion = _normalize_interpretacion({}, default_tipo="inmuebles")
-        interpretacion["error"] = None
-        interpretacion["prompt"] = prompt
+        if interpretacion is None:
+            prompt = (request.data.get('prompt') or "").strip()
+            if not prompt:
+                interpretacion = _naive_interpret(prompt)
+            else:
+                interpretacion = self._call_gemini_api(prompt)
+
+            # Asegura estructura y limpia error para no bloquear UX
+            if interpretacion.get("error") and not interpretacion.get("tipo_reporte"):
+                interpretacion = _normalize_interpretacion({}, default_tipo="inmuebles")
+            interpretacion["error"] = None
+            interpretacion["prompt"] = prompt
 
         try:
             queryset, hubo_agrupacion = self._build_queryset(interpretacion)
@@ -527,42 +757,7 @@ Reglas:
             return Response({"error": "Error interno al procesar."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         try:
-            tipo_reporte = interpretacion.get("tipo_reporte")
-            if hubo_agrupacion:
-                data_para_reporte = list(queryset[:MAX_ROWS])
-            else:
-                fields_to_select = []
-                ModelClass = None
-                if tipo_reporte == "inmuebles":
-                    ModelClass = InmuebleModel
-                    fields_to_select = ['id', 'titulo', 'agente__nombre', 'tipo_inmueble__nombre', 'ciudad', 'zona', 'precio', 'tipo_operacion', 'estado']
-                elif tipo_reporte == "contratos":
-                    ModelClass = Contrato
-                    fields_to_select = ['id', 'tipo_contrato', 'agente__nombre', 'inmueble__titulo', 'fecha_contrato', 'monto', 'comision_monto', 'estado']
-                elif tipo_reporte in ("agentes", "clientes"):
-                    ModelClass = Usuario
-                    fields_to_select = ['id', 'nombre', 'correo', 'telefono', 'ci', 'grupo__nombre']
-                elif tipo_reporte == "citas":
-                    ModelClass = Cita
-                    fields_to_select = ['id', 'titulo', 'agente__nombre', 'cliente__nombre', 'fecha_cita', 'hora_inicio', 'estado']
-                elif tipo_reporte == "anuncios":
-                    ModelClass = AnuncioModel
-                    fields_to_select = ['id', 'inmueble__titulo', 'fecha_publicacion', 'estado', 'prioridad']
-
-                if ModelClass and fields_to_select:
-                    valid_fields = []
-                    for f in fields_to_select:
-                        try:
-                            self._validate_and_convert_value(ModelClass, f, None)
-                            valid_fields.append(f)
-                        except (FieldDoesNotExist, ValueError):
-                            print(f"[WARN] Campo por defecto no encontrado, se omite: {f}")
-                    data_para_reporte = list(queryset.values(*valid_fields)[:MAX_ROWS])
-                else:
-                    data_para_reporte = list(queryset.values()[:MAX_ROWS])
-
-            json_output = json.dumps(data_para_reporte, default=_json_converter)
-            return HttpResponse(json_output, content_type='application/json', status=status.HTTP_200_OK)
+            return self._respuesta_json(request, interpretacion, queryset, hubo_agrupacion, offset)
 
         except Exception as e:
             print(f"[ERROR] Exception during data preparation: {e}")
@@ -581,12 +776,18 @@ class ReporteDirectoView(ReporteBaseView):
         builder_data = request.data
         print(f"[Direct Report] Received builder data: {builder_data}")
 
-        # 1) Traducir JSON simple al formato de interpretación
+        # 1) Traducir JSON simple al formato de interpretación (o tomarla del cursor)
         try:
-            interpretacion = self._traducir_builder_a_interpretacion(builder_data)
-        except Exception as e:
-            print(f"[ERROR] Error traduciendo el builder JSON: {e}")
-            return Response({"error": f"Error en el formato del builder: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+            interpretacion, offset = _leer_cursor(builder_data.get('cursor'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if interpretacion is None:
+            try:
+                interpretacion = self._traducir_builder_a_interpretacion(builder_data)
+            except Exception as e:
+                print(f"[ERROR] Error traduciendo el builder JSON: {e}")
+                return Response({"error": f"Error en el formato del builder: {e}"}, status=status.HTTP_400_BAD_REQUEST)
 
         # 2) Construir queryset
         try:
@@ -600,143 +801,147 @@ class ReporteDirectoView(ReporteBaseView):
 
         # 3) Preparar datos
         try:
-            tipo_reporte = interpretacion.get("tipo_reporte")
-            if hubo_agrupacion:
-                data_para_reporte = list(queryset[:MAX_ROWS])
-            else:
-                fields_to_select = []
-                ModelClass = None
-                if tipo_reporte == "inmuebles":
-                    ModelClass = InmuebleModel
-                    fields_to_select = ['id', 'titulo', 'agente__nombre', 'tipo_inmueble__nombre', 'ciudad', 'zona', 'precio', 'tipo_operacion', 'estado']
-                elif tipo_reporte == "contratos":
-                    ModelClass = Contrato
-                    fields_to_select = ['id', 'tipo_contrato', 'agente__nombre', 'inmueble__titulo', 'fecha_contrato', 'monto', 'comision_monto', 'estado']
-                elif tipo_reporte in ("agentes", "clientes"):
-                    ModelClass = Usuario
-                    fields_to_select = ['id', 'nombre', 'correo', 'telefono', 'ci', 'grupo__nombre']
-                elif tipo_reporte == "citas":
-                    ModelClass = Cita
-                    fields_to_select = ['id', 'titulo', 'agente__nombre', 'cliente__nombre', 'fecha_cita', 'hora_inicio', 'estado']
-                elif tipo_reporte == "anuncios":
-                    ModelClass = AnuncioModel
-                    fields_to_select = ['id', 'inmueble__titulo', 'fecha_publicacion', 'estado', 'prioridad']
-
-                if ModelClass and fields_to_select:
-                    valid_fields = []
-                    for f in fields_to_select:
-                        try:
-                            self._validate_and_convert_value(ModelClass, f, None)
-                            valid_fields.append(f)
-                        except (FieldDoesNotExist, ValueError):
-                            print(f"[WARN] Campo por defecto no encontrado, se omite: {f}")
-                    data_para_reporte = list(queryset.values(*valid_fields)[:MAX_ROWS])
-                else:
-                    data_para_reporte = list(queryset.values()[:MAX_ROWS])
-
-            json_output = json.dumps(data_para_reporte, default=_json_converter)
-            return HttpResponse(json_output, content_type='application/json', status=status.HTTP_200_OK)
+            return self._respuesta_json(request, interpretacion, queryset, hubo_agrupacion, offset)
 
         except Exception as e:
             print(f"[ERROR] Exception during data preparation: {e}")
             traceback.print_exc()
             return Response({"error": "Error al preparar los datos del reporte."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    def _traducir_builder_a_interpretacion(self, builder):
-        """
-        Convierte el JSON simple del "Reporte Rápido" al formato esperado por _build_queryset.
-        Incluye filtros de MONTO y mapea fechas al campo correcto por tipo.
-        """
-        tipo = (builder or {}).get("tipo", "inmuebles")
-        filtros_in = (builder or {}).get("filtros", {})
-
-        filtros_out = {}
-
-        # 1) Estado
-        if filtros_in.get("estado"):
-            filtros_out["estado__exact"] = filtros_in["estado"]
-
-        # 2) Ciudad
-        if filtros_in.get("ciudad"):
-            filtros_out["ciudad__icontains"] = filtros_in["ciudad"]
-
-        # 3) Fechas
-        fecha_desde = filtros_in.get("fechaDesde")
-        fecha_hasta = filtros_in.get("fechaHasta")
-
-        DATE_FIELD_MAP = {
-            "inmuebles": "anuncio__fecha_publicacion",
-            "contratos": "fecha_contrato",
-            "citas": "fecha_cita",
-            "anuncios": "fecha_publicacion",
-            "agentes": "date_joined",
-            "clientes": "date_joined"
-        }
-        date_field = DATE_FIELD_MAP.get(tipo, "id")
-
-        if fecha_desde and fecha_hasta:
-            filtros_out[f"{date_field}__range"] = [fecha_desde, fecha_hasta]
-        elif fecha_desde:
-            filtros_out[f"{date_field}__gte"] = fecha_desde
-        elif fecha_hasta:
-            filtros_out[f"{date_field}__lte"] = fecha_hasta
-
-        # 4) Monto
-        monto_op = filtros_in.get("montoOp", "gte")  # gte por defecto
-        monto_valor = filtros_in.get("montoValor")
-
-        MONTO_FIELD_MAP = {
-            "inmuebles": "precio",
-            "contratos": "monto",
-            "anuncios": "inmueble__precio",
-        }
-        monto_field = MONTO_FIELD_MAP.get(tipo)
-
-        if monto_field and (monto_valor is not None and str(monto_valor) != ""):
-            lookup = f"{monto_field}__{monto_op}"
-            filtros_out[lookup] = monto_valor
-
-        interpretacion = {
-            "tipo_reporte": tipo,
-            "formato": "pantalla",
-            "filtros": filtros_out if tipo != "inmuebles" else _sanitize_inmueble_filters(filtros_out),
-            "agrupacion": [],
-            "calculos": {},
-            "orden": [],
-            "error": None
-        }
-
-        print(f"[Direct Report] Interpretacion generada: {interpretacion}")
-        return interpretacion
-
 # ===================================================================
 # VISTA #3: ExportarDatosView
 # ===================================================================
 class ExportarDatosView(ReporteBaseView):
+    """
+    Exporta a PDF, Excel o CSV. Acepta:
+    - 'builder': el mismo JSON de ReporteDirectoView, o
+    - 'interpretacion': la interpretación de GenerarReporteView;
+      en ambos casos el servidor vuelve a ejecutar la consulta y recorre
+      el queryset por bloques (sin el tope de MAX_ROWS de la vista en pantalla).
+    - 'data': (compatibilidad) las filas ya obtenidas por el cliente.
+    """
 
     def post(self, request, *args, **kwargs):
         data = request.data.get('data')
+        builder = request.data.get('builder')
+        interpretacion_in = request.data.get('interpretacion')
         formato = (request.data.get('formato') or "").lower()
         prompt = request.data.get('prompt', 'Reporte')
 
-        if not data or not isinstance(data, list):
-            return Response({"error": "No se proporcionaron datos válidos para exportar."},
+        if formato not in GENERADORES:
+            return Response({"error": "Formato no válido. Debe ser 'pdf', 'excel' o 'csv'."},
                             status=status.HTTP_400_BAD_REQUEST)
-        if formato not in ['pdf', 'excel']:
-            return Response({"error": "Formato no válido. Debe ser 'pdf' o 'excel'."},
+
+        if builder or interpretacion_in:
+            try:
+                filas = self._queryset_desde_spec(builder, interpretacion_in).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            except ValueError as e:
+                return Response({"error": f"Error al procesar solicitud: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+            except Exception as e:
+                print(f"[ERROR] Unexpected error building queryset: {e}")
+                traceback.print_exc()
+                return Response({"error": "Error interno al procesar."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            print(f"[Export] Exportación desde consulta. Formato: {formato}.")
+        elif not data or not isinstance(data, list):
+            return Response({"error": "No se proporcionaron datos válidos para exportar."},
                             status=status.HTTP_400_BAD_REQUEST)
+        else:
+            filas = data
+            print(f"[Export] Solicitud de exportación recibida. Formato: {formato}. Filas: {len(data)}")
 
         interpretacion = {'prompt': prompt, 'formato': formato}
-        print(f"[Export] Solicitud de exportación recibida. Formato: {formato}. Filas: {len(data)}")
         try:
-            if formato == "pdf":
-                print("[Export] Llamando a generar_reporte_pdf...")
-                return generar_reporte_pdf(data, interpretacion)
-            else:
-                print("[Export] Llamando a generar_reporte_excel...")
-                return generar_reporte_excel(data, interpretacion)
+            return GENERADORES[formato](filas, interpretacion)
         except Exception as e:
             print(f"[ERROR] Falló la generación del archivo: {e}")
             traceback.print_exc()
             return Response({"error": "Error interno al generar el archivo."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _queryset_desde_spec(self, builder, interpretacion_in):
+        """Queryset .values() de la consulta descrita por el builder o la interpretación."""
+        if builder:
+            if not isinstance(builder, dict):
+                raise ValueError("El builder debe ser un objeto JSON.")
+            interpretacion = self._traducir_builder_a_interpretacion(builder)
+        else:
+            interpretacion = _normalize_interpretacion(interpretacion_in)
+
+        queryset, hubo_agrupacion = self._build_queryset(interpretacion)
+        filas = self._proyectar(queryset, hubo_agrupacion, interpretacion.get("tipo_reporte"))
+        if EXPORT_MAX_ROWS:
+            filas = filas[:EXPORT_MAX_ROWS]
+        return filas
+
+# ===================================================================
+# VISTA #4: Exportaciones asíncronas
+# ===================================================================
+class TrabajosExportacionView(ReporteBaseView):
+    """
+    Crea un trabajo de exportación en segundo plano con la misma especificación
+    que ExportarDatosView ('builder' o 'interpretacion', 'formato', 'prompt').
+    Pedidos idénticos reutilizan el trabajo en curso o el archivo vigente.
+    """
+
+    def post(self, request, *args, **kwargs):
+        builder = request.data.get('builder')
+        interpretacion_in = request.data.get('interpretacion')
+        formato = (request.data.get('formato') or "").lower()
+        prompt = request.data.get('prompt') or 'Reporte'
+
+        if formato not in GENERADORES:
+            return Response({"error": "Formato no válido. Debe ser 'pdf', 'excel' o 'csv'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not (builder or interpretacion_in):
+            return Response({"error": "Debe enviar 'builder' o 'interpretacion'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Valida la especificación antes de encolar (no ejecuta la consulta)
+        try:
+            ExportarDatosView()._queryset_desde_spec(builder, interpretacion_in)
+        except ValueError as e:
+            return Response({"error": f"Error al procesar solicitud: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        spec = {'builder': builder} if builder else {'interpretacion': interpretacion_in}
+        trabajo, creado = exportaciones.encolar(request.user, formato, prompt, spec)
+        print(f"[Export] Trabajo {trabajo.id} ({formato}) {'creado' if creado else 'reutilizado'}.")
+        return Response(exportaciones.a_dict(trabajo), status=status.HTTP_202_ACCEPTED)
+
+
+def _trabajo_visible(request, trabajo_id):
+    """El trabajo si es del usuario (administración ve todos); si no, None (404)."""
+    trabajos = TrabajoExportacion.objects.filter(pk=trabajo_id)
+    if not es_administrador(request.user):
+        trabajos = trabajos.filter(usuario=request.user)
+    return trabajos.first()
+
+
+class TrabajoExportacionView(ReporteBaseView):
+    """Estado y avance (filas procesadas / totales) de un trabajo de exportación."""
+
+    def get(self, request, trabajo_id, *args, **kwargs):
+        trabajo = _trabajo_visible(request, trabajo_id)
+        if not trabajo:
+            return Response({"error": "Trabajo de exportación no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        data = exportaciones.a_dict(trabajo)
+        if trabajo.estado == 'completado':
+            data['descarga'] = request.build_absolute_uri(
+                reverse('descargar_trabajo_exportacion', args=[trabajo.id])
+            )
+        return Response(data)
+
+
+class DescargarExportacionView(ReporteBaseView):
+
+    def get(self, request, trabajo_id, *args, **kwargs):
+        trabajo = _trabajo_visible(request, trabajo_id)
+        if not trabajo:
+            return Response({"error": "Trabajo de exportación no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        if trabajo.estado != 'completado':
+            return Response({"error": f"La exportación no está disponible (estado: {trabajo.estado})."},
+                            status=status.HTTP_409_CONFLICT)
+
+        ruta = exportaciones.ruta_absoluta(trabajo)
+        if not os.path.exists(ruta):
+            return Response({"error": "El archivo de la exportación ya no existe."}, status=status.HTTP_410_GONE)
+        return servir_archivo(request, ruta)
@@ -1,6 +1,6 @@
 # suscripciones/admin.py
 from django.contrib import admin
-from .models import Plan, Suscripcion
+from .models import Plan, Suscripcion, UsoAgente
 
 @admin.register(Plan)
 class PlanAdmin(admin.ModelAdmin):
@@ -11,4 +11,9 @@ class PlanAdmin(admin.ModelAdmin):
 class SuscripcionAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'plan', 'estado', 'fecha_fin')
     list_filter = ('estado', 'plan')
-    search_fields = ('usuario__username', 'usuario__email')
\ No newline at end of file
+    search_fields = ('usuario__username', 'usuario__email')
+
+@admin.register(UsoAgente)
+class UsoAgenteAdmin(admin.ModelAdmin):
+    list_display = ('agente', 'inmuebles', 'chats')
+    search_fields = ('agente__username',)
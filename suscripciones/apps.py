@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SuscripcionesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'suscripciones'
+
+    # Conecta las señales que mantienen los contadores de UsoAgente
+    def ready(self):
+        import suscripciones.signals
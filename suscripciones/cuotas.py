@@ -0,0 +1,123 @@
+# suscripciones/cuotas.py
+
+import contextvars
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import UsoAgente
+
+
+RECURSOS = ("inmuebles", "chats")
+
+# Reservas hechas con reservar_cupo() que todavía no consumió la señal post_save.
+# {(agente_id, recurso): pendientes}
+_reservas = contextvars.ContextVar("reservas_cuota", default=None)
+
+
+class LimitePlanAlcanzado(Exception):
+    def __init__(self, recurso, limite):
+        self.recurso = recurso
+        self.limite = limite
+        super().__init__(f"Límite de {recurso} alcanzado ({limite}).")
+
+
+def _contar_actual(agente_id, recurso):
+    """COUNT de respaldo: solo se usa una vez por agente, al crear su fila de uso."""
+    if recurso == "inmuebles":
+        modelo = apps.get_model("inmueble", "InmuebleModel")
+        return modelo.objects.filter(agente_id=agente_id, is_active=True).count()
+    modelo = apps.get_model("contacto", "ChatModel")
+    return modelo.objects.filter(agente_id=agente_id).count()
+
+
+def _asegurar_fila(agente_id):
+    """
+    Crea la fila de uso inicializada con los conteos reales si no existe.
+    Retorna True si la creó (en ese caso ya refleja el estado actual de la BD).
+    """
+    if UsoAgente.objects.filter(agente_id=agente_id).exists():
+        return False
+    try:
+        with transaction.atomic():
+            UsoAgente.objects.create(
+                agente_id=agente_id,
+                **{recurso: _contar_actual(agente_id, recurso) for recurso in RECURSOS}
+            )
+        return True
+    except IntegrityError:
+        # Otro proceso la creó en paralelo
+        return False
+
+
+def obtener_uso(agente_id, recurso):
+    """Lectura O(1) del contador."""
+    _asegurar_fila(agente_id)
+    return UsoAgente.objects.filter(agente_id=agente_id).values_list(recurso, flat=True).first() or 0
+
+
+def _incrementar_si_cabe(agente_id, recurso, limite):
+    """UPDATE condicional: suma 1 solo si el contador está por debajo del límite."""
+    filtro = {"agente_id": agente_id, f"{recurso}__lt": limite}
+    if UsoAgente.objects.filter(**filtro).update(**{recurso: F(recurso) + 1}):
+        return True
+    if _asegurar_fila(agente_id):
+        return bool(UsoAgente.objects.filter(**filtro).update(**{recurso: F(recurso) + 1}))
+    return False
+
+
+def ajustar(agente_id, recurso, delta):
+    """Suma `delta` al contador (usado por las señales de alta/baja)."""
+    if not agente_id or not delta:
+        return
+    qs = UsoAgente.objects.filter(agente_id=agente_id)
+    if delta < 0:
+        qs = qs.filter(**{f"{recurso}__gte": -delta})
+    # Si la fila aún no existe no se crea aquí: se inicializará con el COUNT real
+    # (que ya incluye este cambio) la próxima vez que se consulte el cupo.
+    qs.update(**{recurso: F(recurso) + delta})
+
+
+@contextmanager
+def reservar_cupo(agente_id, recurso, limite):
+    """
+    Reserva un cupo del plan con un UPDATE condicional (sin COUNT y sin carreras
+    entre peticiones concurrentes). El alta debe hacerse dentro del bloque:
+
+        with reservar_cupo(usuario.id, "inmuebles", plan.limite_inmuebles):
+            serializer.save()
+
+    La señal post_save consume la reserva en lugar de volver a sumar. Si el bloque
+    no llega a crear el objeto (p. ej. serializer inválido) el cupo se libera.
+    Lanza LimitePlanAlcanzado si no hay cupo.
+    """
+    clave = (agente_id, recurso)
+    with transaction.atomic():
+        if not _incrementar_si_cabe(agente_id, recurso, limite):
+            raise LimitePlanAlcanzado(recurso, limite)
+
+        reservas = dict(_reservas.get() or {})
+        reservas[clave] = reservas.get(clave, 0) + 1
+        token = _reservas.set(reservas)
+        try:
+            yield
+        finally:
+            _reservas.reset(token)
+            if reservas.get(clave):
+                ajustar(agente_id, recurso, -1)
+
+
+def registrar_alta(agente_id, recurso):
+    """Llamado desde post_save: consume una reserva pendiente o suma 1."""
+    reservas = _reservas.get()
+    clave = (agente_id, recurso)
+    if reservas and reservas.get(clave):
+        reservas[clave] -= 1
+        return
+    ajustar(agente_id, recurso, 1)
+
+
+def registrar_baja(agente_id, recurso):
+    ajustar(agente_id, recurso, -1)
@@ -47,4 +47,20 @@ class Suscripcion(models.Model):
     def esta_activa(self):
         # Si no tiene fecha fin, no está activa
         if not self.fecha_fin: return False
-        return self.estado == 'activa' and self.fecha_fin > timezone.now()
\ No newline at end of file
+        return self.estado == 'activa' and self.fecha_fin > timezone.now()
+
+class UsoAgente(models.Model):
+    """
+    Contadores de uso por agente (inmuebles activos, chats).
+    Se mantienen con F() en altas/bajas (ver suscripciones/cuotas.py) para
+    validar los límites del plan sin hacer COUNT(*) sobre el historial.
+    """
+    agente = models.OneToOneField(Usuario, on_delete=models.CASCADE, primary_key=True, related_name='uso')
+    inmuebles = models.PositiveIntegerField(default=0)
+    chats = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Uso de {self.agente}: {self.inmuebles} inmuebles, {self.chats} chats"
+
+    class Meta:
+        db_table = "uso_agente"
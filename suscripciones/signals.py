@@ -0,0 +1,56 @@
+# suscripciones/signals.py
+# Mantiene los contadores de UsoAgente al crear/eliminar inmuebles y chats.
+
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from contacto.models import ChatModel
+from inmueble.models import InmuebleModel
+from . import cuotas
+
+
+# ---------------- Inmuebles (solo cuentan los activos) ----------------
+def _aporte_inmueble(agente_id, is_active):
+    return (agente_id, 1 if is_active else 0)
+
+
+@receiver(post_init, sender=InmuebleModel)
+def recordar_estado_inmueble(sender, instance, **kwargs):
+    # Se lee de __dict__ para no disparar queries con campos diferidos (.only()/.defer())
+    datos = instance.__dict__
+    if "agente_id" in datos and "is_active" in datos:
+        instance._uso_inicial = _aporte_inmueble(datos["agente_id"], datos["is_active"])
+    else:
+        instance._uso_inicial = None
+
+
+@receiver(post_save, sender=InmuebleModel)
+def contar_inmueble_guardado(sender, instance, created, **kwargs):
+    nuevo = _aporte_inmueble(instance.agente_id, instance.is_active)
+    if created:
+        if nuevo[1]:
+            cuotas.registrar_alta(instance.agente_id, "inmuebles")
+    else:
+        anterior = getattr(instance, "_uso_inicial", None)
+        if anterior is not None and anterior != nuevo:
+            cuotas.ajustar(anterior[0], "inmuebles", -anterior[1])
+            cuotas.ajustar(nuevo[0], "inmuebles", nuevo[1])
+    instance._uso_inicial = nuevo
+
+
+@receiver(post_delete, sender=InmuebleModel)
+def contar_inmueble_eliminado(sender, instance, **kwargs):
+    if instance.is_active:
+        cuotas.registrar_baja(instance.agente_id, "inmuebles")
+
+
+# ---------------- Chats ----------------
+@receiver(post_save, sender=ChatModel)
+def contar_chat_creado(sender, instance, created, **kwargs):
+    if created:
+        cuotas.registrar_alta(instance.agente_id, "chats")
+
+
+@receiver(post_delete, sender=ChatModel)
+def contar_chat_eliminado(sender, instance, **kwargs):
+    cuotas.registrar_baja(instance.agente_id, "chats")
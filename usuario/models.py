@@ -39,6 +39,7 @@ class Usuario(AbstractUser):
     # Flags mínimos
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)  # Para poder entrar al admin si quieres
+    updated_at = models.DateTimeField(auto_now=True)
 
     def get_plan_actual(self):
         """Devuelve el objeto Plan activo del usuario, o None si no tiene."""
@@ -50,6 +51,10 @@ class Usuario(AbstractUser):
         """
         Verifica si el usuario puede crear un inmueble según su plan.
         Retorna: (True, "") o (False, "Mensaje de error")
+
+        Lee el contador de uso (inmuebles activos, igual que el registro). Es
+        solo una consulta previa: el alta se hace con reservar_cupo(), que
+        vuelve a comprobar el límite con un UPDATE condicional.
         """
         # 1. Si es admin o staff, pase libre
         if self.is_staff or self.is_superuser:
@@ -62,12 +67,12 @@ class Usuario(AbstractUser):
         if not self.suscripcion.esta_activa:
             return False, "Tu suscripción ha vencido o está inactiva."
 
-        # 3. Verificar límite de inmuebles
+        # 3. Verificar límite de inmuebles (contador de uso, sin COUNT sobre inmuebles)
         # Importamos aquí para evitar referencia circular
-        from inmueble.models import InmuebleModel 
-        
+        from suscripciones.cuotas import obtener_uso
+
         limite = self.suscripcion.plan.limite_inmuebles
-        actuales = InmuebleModel.objects.filter(agente=self).count()
+        actuales = obtener_uso(self.id, "inmuebles")
         
         if actuales >= limite:
             return False, f"Has alcanzado el límite de tu plan ({actuales}/{limite} inmuebles)."
@@ -80,6 +85,11 @@ class Usuario(AbstractUser):
         return self.nombre
     class Meta:
         db_table = "usuario"
+        indexes = [
+            # Búsqueda por CI al vincular clientes a contratos (sin los vacíos)
+            models.Index(fields=["ci"], condition=models.Q(ci__isnull=False) & ~models.Q(ci=""),
+                         name="usuario_ci_idx"),
+        ]
 
 # --------------------------
 # Modelo de Componente
@@ -12,19 +12,14 @@ from django.contrib.auth.models import User
 from .models import PasswordResetCode, Usuario, PasswordResetCode, Grupo, SolicitudAgente, Privilegio, Componente, Dispositivo
 from inmueble.models import InmuebleModel as Inmueble
 from contrato.models import Contrato
+from contrato import documentos
 from rest_framework.views import APIView 
 from django.conf import settings
-from reportlab.lib.pagesizes import LETTER
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, HRFlowable
-from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_LEFT, TA_RIGHT  # Agregar TA_LEFT y TA_RIGHT aquí
-from reportlab.lib import colors
 from django.http import HttpResponse
 from decimal import Decimal, InvalidOperation
 from inmobiliaria.permissions import requiere_actualizacion,requiere_creacion, requiere_eliminacion, requiere_lectura, requiere_permiso
 from utils.encrypted_logger import registrar_accion, leer_logs
 import os
-import io
 # Create your views here.
 
 @api_view(['POST']) 
@@ -598,13 +593,8 @@ class ContratoAgenteView(APIView):
     def post(self, request):
         data = request.data
         print("DATA", data)
-        # Ruta del archivo de plantilla
-        plantilla_path = os.path.join(settings.BASE_DIR, "usuario/contratoPDF/contrato_agente.txt")
-        with open(plantilla_path, "r", encoding="utf-8") as f:
-            contrato_text = f.read()
-
-        # Reemplazar variables
-        contrato_text = contrato_text.format(
+        # Variables de la plantilla
+        contexto = dict(
             ciudad=data.get("ciudad", "________________"),
             fecha=data.get("fecha", "____/____/______"),
             inmobiliaria_nombre=data.get("inmobiliaria_nombre", "________________"),
@@ -618,78 +608,10 @@ class ContratoAgenteView(APIView):
             duracion=data.get("duracion", "____"),
         )
 
-        # Crear buffer en memoria
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=LETTER,
-            rightMargin=50,
-            leftMargin=50,
-            topMargin=50,
-            bottomMargin=50
-        )
-
-        # Estilos
-        styles = getSampleStyleSheet()
-        titulo_style = ParagraphStyle(
-            'Titulo',
-            fontSize=18,
-            leading=22,
-            alignment=TA_CENTER,
-            spaceAfter=20,
-            textColor=colors.darkblue,
-        )
-        clausula_style = ParagraphStyle(
-            'Clausula',
-            fontSize=12,
-            leading=18,
-            alignment=TA_JUSTIFY,
-        )
-        firma_style = ParagraphStyle(
-            'Firma',
-            fontSize=12,
-            leading=6,
-            alignment=TA_CENTER,
-        )
-
-        story = []
-
-        # Título
-        story.append(Paragraph("CONTRATO DE VINCULACIÓN INMOBILIARIA", titulo_style))
-        story.append(Spacer(1, 10))
-
-        # Separar por párrafos usando doble salto de línea
-        lineas = contrato_text.strip().split("\n\n")
-
-        # Última línea que dice "Las partes aceptan..."
-        aceptacion_texto = lineas[-1]
-        clausulas = lineas[:-1]
-
-        # Agregar cláusulas con separador
-        for i, p in enumerate(clausulas):
-            story.append(Paragraph(p.strip(), clausula_style))
-            if i != len(clausulas) - 1:
-                story.append(Spacer(1, 6))
-                story.append(HRFlowable(width="100%", thickness=0.5, color=colors.grey))
-                story.append(Spacer(1, 6))
-
-        # Frase de aceptación
-        story.append(Spacer(1, 6))
-        story.append(Paragraph(aceptacion_texto.strip(), clausula_style))
-        # Firmas compactas
-        firmas_texto = f"""__________________________  <br/><br/><br/>
-        INMOBILIARIA ({data.get('inmobiliaria_nombre','________')})<br/><br/>
-        __________________________  <br/><br/><br/>
-        AGENTE INMOBILIARIO ({data.get('agente_nombre','________')})
-        """
-        story.append(Paragraph(firmas_texto, firma_style))
-
-        # Generar PDF
-        doc.build(story)
-        buffer.seek(0)
+        pdf = documentos.renderizar("agente", contexto, datos=data)
 
         # Devolver PDF
-        response = HttpResponse(buffer, content_type='application/pdf')
+        response = HttpResponse(pdf, content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="contrato_{data.get("agente_nombre","agente")}.pdf"'
         return response
 
@@ -1160,13 +1082,8 @@ class ContratoServiciosInmobiliariosView(APIView):
             print(f"🔍 Traceback: {traceback.format_exc()}")
             return Response({"error": f"Error al procesar contrato: {str(e)}"}, status=500)
         
-        # Ruta del archivo de plantilla
-        plantilla_path = os.path.join(settings.BASE_DIR, "usuario/contratoPDF/contrato_servicios_inmobiliarios.txt")
-        with open(plantilla_path, "r", encoding="utf-8") as f:
-            contrato_text = f.read()
-
-        # Reemplazar variables
-        contrato_text = contrato_text.format(
+        # Variables de la plantilla
+        contexto = dict(
             ciudad=data.get("ciudad", "________________"),
             fecha=data.get("fecha", "____/____/______"),
             empresa_nombre=data.get("empresa_nombre", "________________"),
@@ -1200,122 +1117,10 @@ class ContratoServiciosInmobiliariosView(APIView):
             email_oficina=data.get("email_oficina", "________________"),
         )
 
-        # Crear buffer en memoria
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=LETTER,
-            rightMargin=40,
-            leftMargin=40,
-            topMargin=40,
-            bottomMargin=40
-        )
-
-        # Estilos
-        styles = getSampleStyleSheet()
-        titulo_style = ParagraphStyle(
-            'Titulo',
-            parent=styles['Heading1'],
-            fontSize=14,
-            leading=18,
-            alignment=TA_CENTER,
-            spaceAfter=20,
-            textColor=colors.black,
-            fontName='Helvetica-Bold'
-        )
-        clausula_titulo_style = ParagraphStyle(
-            'ClausulaTitulo',
-            parent=styles['Normal'],
-            fontSize=11,
-            leading=14,
-            alignment=TA_LEFT,
-            spaceAfter=6,
-            textColor=colors.black,
-            fontName='Helvetica-Bold'
-        )
-        clausula_style = ParagraphStyle(
-            'Clausula',
-            fontSize=10,
-            leading=13,
-            alignment=TA_JUSTIFY,
-            spaceAfter=8,
-        )
-        firma_style = ParagraphStyle(
-            'Firma',
-            fontSize=10,
-            leading=12,
-            alignment=TA_CENTER,
-        )
-        footer_style = ParagraphStyle(
-            'Footer',
-            fontSize=8,
-            leading=10,
-            alignment=TA_CENTER,
-            textColor=colors.grey,
-        )
-
-        story = []
-
-        # Título
-        story.append(Paragraph("CONTRATO PRIVADO DE PRESTACIÓN DE SERVICIOS INMOBILIARIOS", titulo_style))
-        story.append(Spacer(1, 10))
-
-        # Introducción
-        intro_text = f"""Conste por el presente Contrato Privado de Servicios Inmobiliarios, que con el sólo reconocimiento de firmas surtirá los efectos de documento público, conforme al tenor de las siguientes cláusulas y condiciones:"""
-        story.append(Paragraph(intro_text, clausula_style))
-        story.append(Spacer(1, 15))
-
-        # Separar por párrafos usando doble salto de línea
-        lineas = contrato_text.strip().split("\n\n")
-
-        # Agregar cláusulas
-        for i, p in enumerate(lineas):
-            if p.strip().startswith("PRIMERA:") or p.strip().startswith("SEGUNDA:") or p.strip().startswith("TERCERA:") or p.strip().startswith("CUARTA:") or p.strip().startswith("QUINTA:") or p.strip().startswith("SEXTA:") or p.strip().startswith("SÉPTIMA:") or p.strip().startswith("OCTAVA:") or p.strip().startswith("NOVENA:") or p.strip().startswith("DÉCIMA:") or p.strip().startswith("DÉCIMA PRIMERA:") or p.strip().startswith("DÉCIMA SEGUNDA:") or p.strip().startswith("DÉCIMA TERCERA:") or p.strip().startswith("DÉCIMA CUARTA:"):
-                story.append(Paragraph(p.strip(), clausula_titulo_style))
-            else:
-                story.append(Paragraph(p.strip(), clausula_style))
-            
-            if i != len(lineas) - 1:
-                story.append(Spacer(1, 8))
-
-        # Fecha y lugar
-        story.append(Spacer(1, 20))
-        fecha_lugar = Paragraph(f"{data.get('ciudad', 'Trinidad')}, {data.get('fecha', '____/____/______')}.", clausula_titulo_style)
-        story.append(fecha_lugar)
-        story.append(Spacer(1, 25))
-
-        # Firmas
-        firmas_texto = f"""
-        __________________________<br/>
-        <b>{data.get('empresa_representante', '________________')}</b><br/>
-        <i>{data.get('empresa_nombre', '________________')}</i><br/><br/><br/>
-
-        __________________________<br/>
-        <b>{data.get('cliente_nombre', '________________')}</b><br/>
-        <i>PROPIETARIO/A</i><br/><br/><br/>
-
-        __________________________<br/>
-        <b>{data.get('agente_nombre', '________________')}</b><br/>
-        <i>AGENTE ASOCIADO</i>
-        """
-        story.append(Paragraph(firmas_texto, firma_style))
-
-        # Footer
-        story.append(Spacer(1, 20))
-        footer_text = f"""
-        {data.get('direccion_oficina', '________________')}<br/>
-        {data.get('telefono_oficina', '________________')}<br/>
-        {data.get('email_oficina', '________________')}<br/>
-        <i>Cada oficina es de propiedad y operación independiente</i>
-        """
-        story.append(Paragraph(footer_text, footer_style))
-
-        # Generar PDF
-        doc.build(story)
-        buffer.seek(0)
+        pdf = documentos.renderizar("servicios_inmobiliarios", contexto, datos=data)
 
         # Devolver PDF
-        response = HttpResponse(buffer, content_type='application/pdf')
+        response = HttpResponse(pdf, content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="contrato_servicios_inmobiliarios_{data.get("cliente_nombre","cliente")}.pdf"'
         return response
 
@@ -0,0 +1,131 @@
+"""
+Entrega de archivos guardados en MEDIA_ROOT (contratos, comprobantes).
+
+`servir_archivo()` arma la respuesta de descarga:
+
+- ETag con los datos de `stat` (inodo, mtime en ns y tamaño): no se lee el
+  archivo para calcularlo, y cambia si el archivo se reescribe o se
+  reemplaza. 304 si el cliente ya lo tiene.
+- Pedidos parciales (Range: bytes=inicio-fin) con 206 / 416, para visores
+  de PDF y descargas reanudables. If-Range se respeta con el ETag.
+- Modo de entrega según ARCHIVOS_ENTREGA:
+    'x-accel'     Nginx: X-Accel-Redirect a ARCHIVOS_X_ACCEL_PREFIJO + ruta
+                  relativa a MEDIA_ROOT (location `internal` en nginx)
+    'x-sendfile'  Apache/lighttpd: X-Sendfile con la ruta absoluta
+    'django'      el worker lee el archivo y lo envía por bloques
+  En los dos primeros el proxy envía los bytes (y resuelve los Range) y el
+  worker solo responde los headers: es lo recomendado en producción. Con
+  'django' no hay sendfile ni copia cero (la app corre con ASGI); el archivo
+  se envía bloque a bloque con utils/flujos.py, sin cargarlo entero en memoria.
+
+La autorización (quién puede ver cada objeto) la hace la vista antes de llamar.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from .flujos import flujo_asincrono, leer_archivo
+
+
+BLOQUE = 64 * 1024
+RANGO_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _modo():
+    return getattr(settings, 'ARCHIVOS_ENTREGA', 'django')
+
+
+def etag(stat):
+    """ETag fuerte a partir de `os.stat()` (sin leer el contenido)."""
+    return f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _rango(encabezado, tamano):
+    """(inicio, fin) inclusive; None si no hay rango utilizable; False si no se puede satisfacer."""
+    if not encabezado:
+        return None
+    coincide = RANGO_RE.match(encabezado.strip())
+    if not coincide:
+        return None  # Varios rangos u otra unidad: se responde el archivo completo
+    desde, hasta = coincide.groups()
+    if not desde and not hasta:
+        return None
+    if not desde:
+        # bytes=-N: los últimos N bytes
+        largo = int(hasta)
+        if largo == 0:
+            return False
+        return max(tamano - largo, 0), tamano - 1
+    inicio = int(desde)
+    fin = min(int(hasta), tamano - 1) if hasta else tamano - 1
+    if inicio >= tamano or inicio > fin:
+        return False
+    return inicio, fin
+
+
+def _etag_coincide(encabezado, etag):
+    if not encabezado:
+        return False
+    if encabezado.strip() == '*':
+        return True
+    return etag in [e.strip().removeprefix('W/') for e in encabezado.split(',')]
+
+
+def servir_archivo(request, ruta, nombre=None, descargar=True, content_type=None):
+    """
+    Respuesta HTTP con el archivo `ruta` (absoluta, dentro de MEDIA_ROOT).
+    `descargar` elige attachment (descarga) o inline (se muestra en el navegador).
+    """
+    stat = os.stat(ruta)
+    tamano = stat.st_size
+    nombre = nombre or os.path.basename(ruta)
+    content_type = content_type or mimetypes.guess_type(nombre)[0] or 'application/octet-stream'
+    valor_etag = etag(stat)
+
+    def encabezados(response):
+        response['ETag'] = valor_etag
+        response['Accept-Ranges'] = 'bytes'
+        response['Content-Disposition'] = content_disposition_header(descargar, nombre)
+        return response
+
+    if _etag_coincide(request.headers.get('If-None-Match'), valor_etag):
+        return encabezados(HttpResponse(status=304))
+
+    modo = _modo()
+    if modo == 'x-accel':
+        relativa = os.path.relpath(ruta, settings.MEDIA_ROOT).replace(os.sep, '/')
+        prefijo = getattr(settings, 'ARCHIVOS_X_ACCEL_PREFIJO', '/protegido/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = prefijo.rstrip('/') + '/' + relativa
+        return encabezados(response)
+    if modo == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = ruta
+        return encabezados(response)
+
+    # If-Range con otro ETag: el archivo cambió, se manda completo
+    if_range = request.headers.get('If-Range')
+    rango = _rango(request.headers.get('Range'), tamano) if not if_range or if_range == valor_etag else None
+
+    if rango is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{tamano}'
+        return encabezados(response)
+
+    inicio, fin = rango or (0, tamano - 1)
+    largo = fin - inicio + 1
+    archivo = open(ruta, 'rb')
+    archivo.seek(inicio)
+    response = StreamingHttpResponse(
+        flujo_asincrono(leer_archivo(archivo, BLOQUE, largo)),
+        status=206 if rango else 200,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(largo)
+    if rango:
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    return encabezados(response)
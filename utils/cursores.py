@@ -0,0 +1,24 @@
+"""
+Cursores de paginación firmados.
+
+Los listados paginados (contrato/listado.py, contrato/comisiones.py,
+reportes/views.py) devuelven un cursor opaco para pedir la página
+siguiente. El contenido va firmado con SECRET_KEY (django.core.signing):
+el cliente no puede armar uno a mano ni cambiar lo que trae (posición,
+filtros o interpretación del reporte). Cada uso tiene su `salt`, así un
+cursor de un listado no sirve en otro.
+"""
+from django.core import signing
+
+
+def crear(datos, salt):
+    """Cursor (texto apto para URL) con `datos` (serializable a JSON)."""
+    return signing.dumps(datos, salt=salt, compress=True)
+
+
+def leer(cursor, salt):
+    """Datos del cursor; ValueError si no es válido o fue modificado."""
+    try:
+        return signing.loads(str(cursor), salt=salt)
+    except signing.BadSignature:
+        raise ValueError("Cursor inválido")
@@ -0,0 +1,65 @@
+"""
+Respuestas por partes bajo ASGI.
+
+El proyecto corre con ASGI (ASGI_APPLICATION en settings). Ahí Django lee el
+contenido de una StreamingHttpResponse/FileResponse con un iterador síncrono
+juntándolo todo con `sync_to_async(list)` antes de enviar el primer byte: el
+"flujo" termina entero en memoria.
+
+`flujo_asincrono(iterador)` lo convierte en un iterador asíncrono que pide
+cada parte con `next()` en un hilo propio de la respuesta, así cada bloque
+sale apenas está listo. Es siempre el mismo hilo (no uno cualquiera del
+pool) porque los generadores suelen usar la base de datos y las conexiones
+de Django son por hilo; al terminar (o si el cliente corta) se cierra el
+generador y la conexión de ese hilo.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+
+_FIN = object()
+
+
+def _siguiente(iterador):
+    return next(iterador, _FIN)
+
+
+def _cerrar(iterador):
+    try:
+        cerrar = getattr(iterador, 'close', None)
+        if cerrar:
+            cerrar()
+    finally:
+        connections.close_all()
+
+
+async def flujo_asincrono(iterable):
+    """Iterador asíncrono con las partes de `iterable` (generador síncrono)."""
+    iterador = iter(iterable)
+    hilo = ThreadPoolExecutor(max_workers=1, thread_name_prefix='flujo')
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            parte = await loop.run_in_executor(hilo, _siguiente, iterador)
+            if parte is _FIN:
+                break
+            yield parte
+    finally:
+        await loop.run_in_executor(hilo, _cerrar, iterador)
+        hilo.shutdown(wait=False)
+
+
+def leer_archivo(archivo, bloque=64 * 1024, largo=None):
+    """Bloques de un archivo abierto (hasta `largo` bytes si se indica); lo cierra al final."""
+    try:
+        while largo is None or largo > 0:
+            datos = archivo.read(bloque if largo is None else min(bloque, largo))
+            if not datos:
+                break
+            if largo is not None:
+                largo -= len(datos)
+            yield datos
+    finally:
+        archivo.close()